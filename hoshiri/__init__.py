@@ -0,0 +1,3 @@
+# hoshiri/__init__.py
+# Support package for the Hoshiri chat in main.py.
+# It holds the components the chat loop is built from.
@@ -0,0 +1,78 @@
+# hoshiri/attachments.py
+
+import hashlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Tuple
+
+
+class AttachmentStore:
+    """Encode-once cache of prepared attachment blocks.
+
+    Files are hashed once per (path, size, mtime) and the prepared content
+    block is cached under the content hash, so an attachment that stays in
+    the conversation is neither re-read nor re-encoded on later turns. The
+    cache is an LRU bounded by the size of the encoded payloads.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._blocks: "OrderedDict[str, Tuple[Dict, int]]" = OrderedDict()
+        self._digests: Dict[Tuple[str, int, int], str] = {}
+
+    def digest(self, file_path: Path) -> str:
+        """Return the SHA-256 of a file, hashing it only when it changed."""
+        key = self._key(file_path)
+        digest = self._digests.get(key)
+        if digest is None:
+            with open(file_path, "rb") as f:
+                digest = hashlib.file_digest(f, "sha256").hexdigest()
+            self._digests[key] = digest
+        return digest
+
+    def remember(self, file_path: Path, digest: str):
+        """Record a hash computed elsewhere, e.g. by the upload store."""
+        self._digests[self._key(file_path)] = digest
+
+    def get(self, file_path: Path, prepare: Callable[[Path], Dict]) -> Dict:
+        """Return the prepared block for a file, calling `prepare` on a miss."""
+        digest = self.digest(file_path)
+
+        cached = self._blocks.get(digest)
+        if cached is not None:
+            self._blocks.move_to_end(digest)
+            self.hits += 1
+            return cached[0]
+
+        self.misses += 1
+        block = prepare(file_path)
+        size = self.block_size(block)
+        if size <= self.max_bytes:
+            self._blocks[digest] = (block, size)
+            self.size += size
+            self._evict()
+        return block
+
+    def clear(self):
+        self._blocks.clear()
+        self._digests.clear()
+        self.size = 0
+
+    @staticmethod
+    def _key(file_path: Path) -> Tuple[str, int, int]:
+        stat = file_path.stat()
+        return (str(file_path.resolve()), stat.st_size, stat.st_mtime_ns)
+
+    @staticmethod
+    def block_size(block: Dict) -> int:
+        if block["type"] == "text":
+            return len(block["text"])
+        return len(block["source"]["data"])
+
+    def _evict(self):
+        while self.size > self.max_bytes:
+            _, (_, size) = self._blocks.popitem(last=False)
+            self.size -= size
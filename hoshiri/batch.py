@@ -0,0 +1,296 @@
+# hoshiri/batch.py
+
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+
+# Requests per Message Batches job; the API allows more, but this keeps each
+# upload well under its payload size limit
+BATCH_CHUNK = 10_000
+
+
+def load_prompts(path: Path) -> List[Dict]:
+    """Read a JSONL file of prompts into request dicts.
+
+    Each line needs either `messages` (a Messages API list) or a text
+    `prompt` (`body` is accepted too). The id comes from `custom_id`, `id`
+    or `request_id` and falls back to the line number. `system` and
+    `max_tokens` are passed through when present. A line that cannot be
+    used raises ValueError naming its line number.
+    """
+    prompts = []
+    seen = set()
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Line {number} is not valid JSON: {e}") from None
+            if not isinstance(record, dict):
+                raise ValueError(f"Line {number} is not a JSON object")
+
+            custom_id = str(
+                record.get("custom_id")
+                or record.get("id")
+                or record.get("request_id")
+                or f"line-{number}"
+            )
+            if custom_id in seen:
+                raise ValueError(f"Duplicate id {custom_id!r} on line {number}")
+            seen.add(custom_id)
+
+            messages = record.get("messages")
+            if messages is None:
+                text = record.get("prompt") or record.get("body")
+                if not text:
+                    raise ValueError(f"Line {number} has no prompt or messages")
+                messages = [{"role": "user", "content": text}]
+
+            prompt = {"custom_id": custom_id, "messages": messages}
+            for key in ("system", "max_tokens"):
+                if key in record:
+                    prompt[key] = record[key]
+            prompts.append(prompt)
+    return prompts
+
+
+def completed_ids(path: Path) -> Set[str]:
+    """Return the ids that already have a successful result in `path`.
+
+    Failed results are not counted, so they are retried on the next run. A
+    line cut short by a crash, or one that is not a result at all, is
+    ignored.
+    """
+    done = set()
+    if not path.exists():
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if not isinstance(record, dict) or not isinstance(
+                record.get("custom_id"), str
+            ):
+                continue
+            if "error" not in record:
+                done.add(record["custom_id"])
+    return done
+
+
+def message_text(message) -> str:
+    return "".join(block.text for block in message.content if block.type == "text")
+
+
+class ResultWriter:
+    """Appends one JSON line per result and flushes it straight to disk."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file = open(self.path, "a+", encoding="utf-8")
+        # Start on a fresh line if the last run died mid-write
+        if self._file.tell():
+            self._file.seek(self._file.tell() - 1)
+            if self._file.read(1) != "\n":
+                self._file.write("\n")
+
+    def write(self, record: Dict):
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def success_record(custom_id: str, message) -> Dict:
+    return {
+        "custom_id": custom_id,
+        "text": message_text(message),
+        "stop_reason": message.stop_reason,
+        "usage": {
+            "input_tokens": message.usage.input_tokens,
+            "output_tokens": message.usage.output_tokens,
+        },
+    }
+
+
+class BatchRunner:
+    """Runs a list of prompts through a bounded pool of async workers.
+
+    Prompts whose ids already succeeded in the output file are skipped, so
+    an interrupted run picks up where it stopped. Results are appended as
+    they finish, in completion order. Retries and rate-limit pacing happen
+    in the engine's `ApiClient`, so one failed prompt is written as an
+    error only once its retries are used up.
+    """
+
+    def __init__(
+        self,
+        engine,
+        output: Path,
+        workers: int = 8,
+        on_result: Optional[Callable[[Dict], None]] = None,
+    ):
+        self.engine = engine
+        self.output = Path(output)
+        self.workers = workers
+        self.on_result = on_result
+        self.counts = {"skipped": 0, "succeeded": 0, "failed": 0}
+
+    def pending(self, prompts: List[Dict]) -> List[Dict]:
+        done = completed_ids(self.output)
+        todo = [prompt for prompt in prompts if prompt["custom_id"] not in done]
+        self.counts["skipped"] = len(prompts) - len(todo)
+        return todo
+
+    async def run(self, prompts: List[Dict]) -> Dict:
+        """Process every pending prompt and return the run counters."""
+        queue: asyncio.Queue = asyncio.Queue()
+        for prompt in self.pending(prompts):
+            queue.put_nowait(prompt)
+
+        writer = ResultWriter(self.output)
+        try:
+            workers = [
+                asyncio.create_task(self._worker(queue, writer))
+                for _ in range(min(self.workers, queue.qsize()))
+            ]
+            try:
+                await asyncio.gather(*workers)
+            finally:
+                for worker in workers:
+                    worker.cancel()
+        finally:
+            writer.close()
+        return self.counts
+
+    async def _worker(self, queue: asyncio.Queue, writer: ResultWriter):
+        while not queue.empty():
+            prompt = queue.get_nowait()
+            try:
+                message = await self._ask(prompt)
+            except Exception as e:
+                record = {"custom_id": prompt["custom_id"], "error": str(e)}
+                self.counts["failed"] += 1
+            else:
+                record = success_record(prompt["custom_id"], message)
+                self.counts["succeeded"] += 1
+            # Writes happen on the loop thread, so lines never interleave
+            writer.write(record)
+            if self.on_result:
+                self.on_result(record)
+
+    async def _ask(self, prompt: Dict):
+        request = {key: value for key, value in prompt.items() if key != "custom_id"}
+        return await self.engine.ask(**request)
+
+
+class MessageBatchRunner:
+    """Runs prompts through the Message Batches API.
+
+    Jobs are created in chunks of `BATCH_CHUNK` requests and their ids are
+    kept in a `<output>.batches` file until every result has been written,
+    so a rerun resumes polling the same jobs instead of submitting again.
+    """
+
+    def __init__(
+        self,
+        client,
+        model: str,
+        output: Path,
+        max_tokens: int = 4096,
+        poll_interval: float = 30.0,
+        on_result: Optional[Callable[[Dict], None]] = None,
+    ):
+        self.client = client
+        self.model = model
+        self.output = Path(output)
+        self.state = self.output.with_name(self.output.name + ".batches")
+        self.max_tokens = max_tokens
+        self.poll_interval = poll_interval
+        self.on_result = on_result
+        self.counts = {"skipped": 0, "succeeded": 0, "failed": 0}
+
+    def pending(self, prompts: List[Dict]) -> List[Dict]:
+        done = completed_ids(self.output)
+        todo = [prompt for prompt in prompts if prompt["custom_id"] not in done]
+        self.counts["skipped"] = len(prompts) - len(todo)
+        return todo
+
+    def params(self, prompt: Dict) -> Dict:
+        params = {
+            "model": self.model,
+            "max_tokens": prompt.get("max_tokens", self.max_tokens),
+            "messages": prompt["messages"],
+        }
+        if "system" in prompt:
+            params["system"] = prompt["system"]
+        return params
+
+    def submit(self, prompts: List[Dict]) -> List[str]:
+        """Create the batch jobs, or return the ones a previous run started."""
+        if self.state.exists():
+            return self.state.read_text().split()
+
+        batch_ids = []
+        for start in range(0, len(prompts), BATCH_CHUNK):
+            batch = self.client.messages.batches.create(
+                requests=[
+                    {"custom_id": prompt["custom_id"], "params": self.params(prompt)}
+                    for prompt in prompts[start : start + BATCH_CHUNK]
+                ]
+            )
+            batch_ids.append(batch.id)
+            # Save after every job so a crash never orphans one
+            self.state.write_text("\n".join(batch_ids) + "\n")
+        return batch_ids
+
+    def run(self, prompts: List[Dict]) -> Dict:
+        """Submit the pending prompts, wait for the jobs and write results."""
+        todo = self.pending(prompts)
+        if not todo and not self.state.exists():
+            return self.counts
+        done = completed_ids(self.output)
+
+        writer = ResultWriter(self.output)
+        try:
+            for batch_id in self.submit(todo):
+                self.wait(batch_id)
+                for result in self.client.messages.batches.results(batch_id):
+                    if result.custom_id in done:
+                        continue
+                    record = self.record(result)
+                    writer.write(record)
+                    done.add(result.custom_id)
+                    if self.on_result:
+                        self.on_result(record)
+        finally:
+            writer.close()
+        self.state.unlink()
+        return self.counts
+
+    def wait(self, batch_id: str):
+        while True:
+            batch = self.client.messages.batches.retrieve(batch_id)
+            if batch.processing_status == "ended":
+                return
+            time.sleep(self.poll_interval)
+
+    def record(self, result) -> Dict:
+        outcome = result.result
+        if outcome.type == "succeeded":
+            self.counts["succeeded"] += 1
+            return success_record(result.custom_id, outcome.message)
+
+        self.counts["failed"] += 1
+        if outcome.type == "errored":
+            error = f"{outcome.error.error.type}: {outcome.error.error.message}"
+        else:
+            # canceled or expired
+            error = outcome.type
+        return {"custom_id": result.custom_id, "error": error}
@@ -0,0 +1,309 @@
+# hoshiri/bench.py
+
+import contextlib
+import gc
+import io
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+from hoshiri.mockapi import MockApi
+from hoshiri.sessions import SessionLog
+
+BENCHMARKS = ("first_token", "turn_overhead", "encoding", "save_load", "memory")
+# Stages that are network time rather than Hoshiri's own work
+REMOTE_STAGES = ("api", "first_token", "map")
+ENV = ("ANTHROPIC_API_KEY", "ANTHROPIC_BASE_URL")
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+
+def _p(values: Sequence[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+def rss_bytes() -> int:
+    """Resident set size of this process (0 where /proc is not available)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+@contextlib.contextmanager
+def workspace() -> Iterator[Path]:
+    """Run in a fresh directory so sessions, uploads and jobs start empty."""
+    previous = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="hoshiri-bench-") as root:
+        os.chdir(root)
+        try:
+            yield Path(root)
+        finally:
+            os.chdir(previous)
+
+
+class Bench:
+    """Benchmarks `HoshiriChat`'s turn pipeline against a local `MockApi`.
+
+    `factory` builds a chat (normally `HoshiriChat`); each benchmark gets a
+    new one in an empty working directory, with its console writing to a
+    buffer so terminal speed doesn't skew the numbers. Results are plain
+    dicts of milliseconds, bytes and rates, ready to dump as JSON.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], object],
+        latency: float = 0.05,
+        chunks: int = 20,
+        chunk_delay: float = 0.0,
+        turns: int = 1000,
+    ):
+        self.factory = factory
+        self.latency = latency
+        self.chunks = chunks
+        self.chunk_delay = chunk_delay
+        self.turns = turns
+
+    @contextlib.contextmanager
+    def chat(self, latency: Optional[float] = None, **settings) -> Iterator:
+        latency = self.latency if latency is None else latency
+        saved = {name: os.environ.get(name) for name in ENV}
+        with workspace(), MockApi(latency, self.chunks, self.chunk_delay) as mock:
+            os.environ.update(ANTHROPIC_API_KEY="bench", ANTHROPIC_BASE_URL=mock.url)
+            try:
+                chat = self.factory()
+                chat.console.file = io.StringIO()
+                for name, value in settings.items():
+                    setattr(chat, name, value)
+                try:
+                    yield chat
+                finally:
+                    chat.close()
+            finally:
+                for name, value in saved.items():
+                    if value is None:
+                        os.environ.pop(name, None)
+                    else:
+                        os.environ[name] = value
+
+    def first_token(self, turns: int = 20) -> Dict:
+        """Time to first token of streamed turns, and what Hoshiri adds to it."""
+        with self.chat(streaming=True) as chat:
+            for i in range(turns):
+                chat.send(f"Question number {i}: what is new?")
+            ttft = [t["spans"]["first_token"] for t in chat.metrics.turns]
+        return {
+            "server_latency_ms": _ms(self.latency),
+            "p50_ms": _ms(_p(ttft, 0.5)),
+            "p95_ms": _ms(_p(ttft, 0.95)),
+            "client_overhead_p50_ms": _ms(_p(ttft, 0.5) - self.latency),
+        }
+
+    def turn_overhead(
+        self, lengths: Sequence[int] = (0, 50, 200, 1000), turns: int = 10
+    ) -> Dict:
+        """Local work per turn (everything but the API call) by history length."""
+        results = {}
+        filler = "Some earlier discussion about the project. " * 12
+        for length in lengths:
+            with self.chat(latency=0.0, streaming=True) as chat:
+                # Keep compaction out of it; this measures the raw history cost
+                chat.context.budget = 10**9
+                chat.conversation_history = [
+                    {
+                        "role": "user" if i % 2 == 0 else "assistant",
+                        "content": [{"type": "text", "text": f"{i} {filler}"}],
+                        "timestamp": datetime.now().isoformat(),
+                    }
+                    for i in range(length)
+                ]
+                for i in range(turns):
+                    chat.send(f"Follow-up question {i}")
+                local, api, stages = [], [], {}
+                for turn in chat.metrics.turns:
+                    spans = turn["spans"]
+                    # The mock answers at once, so this is client-side request work
+                    api.append(spans["api"])
+                    own = {k: v for k, v in spans.items() if k not in REMOTE_STAGES}
+                    local.append(sum(own.values()))
+                    for name, seconds in own.items():
+                        stages.setdefault(name, []).append(seconds)
+            results[str(length)] = {
+                "local_p50_ms": _ms(_p(local, 0.5)),
+                "local_p95_ms": _ms(_p(local, 0.95)),
+                "api_p50_ms": _ms(_p(api, 0.5)),
+                "stages_p50_ms": {k: _ms(_p(v, 0.5)) for k, v in stages.items()},
+            }
+        return results
+
+    def encoding(self, sizes_mb: Sequence[int] = (1, 8)) -> Dict:
+        """Attachment encoding throughput, cold and from the attachment cache."""
+        results = {}
+        with self.chat() as chat:
+            for size in sizes_mb:
+                for kind, suffix in (("binary", ".pdf"), ("text", ".txt")):
+                    path = Path(f"sample-{size}mb{suffix}")
+                    if kind == "binary":
+                        path.write_bytes(os.urandom(size * 1024 * 1024))
+                    else:
+                        line = b"a line of plain text for the encoder\n"
+                        path.write_bytes(line * (size * 1024 * 1024 // len(line)))
+
+                    started = time.perf_counter()
+                    chat.encode_file(path)
+                    cold = time.perf_counter() - started
+                    chat.prepare_file_message(path)
+                    started = time.perf_counter()
+                    chat.prepare_file_message(path)
+                    cached = time.perf_counter() - started
+                    results[f"{kind}_{size}mb"] = {
+                        "cold_ms": _ms(cold),
+                        "mb_per_s": round(path.stat().st_size / 1e6 / cold, 1),
+                        "cached_ms": _ms(cached),
+                    }
+        return results
+
+    def save_load(self, turns: Optional[int] = None) -> Dict:
+        """Appending a long session to its log and loading it back."""
+        turns = turns or self.turns
+        text = "A typical reply of a few sentences about the question. " * 8
+        with workspace() as root:
+            log = SessionLog(root / "sessions")
+            started = time.perf_counter()
+            for i in range(turns):
+                for role in ("user", "assistant"):
+                    log.append(
+                        {
+                            "role": role,
+                            "content": [{"type": "text", "text": f"{i} {text}"}],
+                            "timestamp": datetime.now().isoformat(),
+                        }
+                    )
+            appended = time.perf_counter() - started
+            log.close()
+
+            started = time.perf_counter()
+            entries = SessionLog(root / "sessions", log.session_id).load()
+            loaded = time.perf_counter() - started
+            size = log.path.stat().st_size
+        return {
+            "entries": len(entries),
+            "append_us_per_entry": round(appended / (2 * turns) * 1e6, 2),
+            "load_ms": _ms(loaded),
+            "log_bytes": size,
+        }
+
+    def memory(self, turns: Optional[int] = None, samples: int = 10) -> Dict:
+        """Memory growth over a long session of quick non-streamed turns.
+
+        Samples the resident set size and the interpreter's allocated
+        block count, which cost nothing to read, instead of tracing every
+        allocation, which would slow the turns down several times over.
+        """
+        turns = turns or self.turns
+        every = max(turns // samples, 1)
+        growth = []
+        with self.chat(latency=0.0, streaming=False) as chat:
+            chat.send("Warm-up turn")
+            gc.collect()
+            rss, blocks = rss_bytes(), sys.getallocatedblocks()
+            started = time.perf_counter()
+            for i in range(1, turns + 1):
+                chat.send(f"Turn {i}: tell me something short")
+                if i % every == 0:
+                    growth.append(
+                        {
+                            "turn": i,
+                            "rss_bytes": rss_bytes() - rss,
+                            "blocks": sys.getallocatedblocks() - blocks,
+                        }
+                    )
+            elapsed = time.perf_counter() - started
+            entries = len(chat.conversation_history)
+            compactions = chat.context.compactions
+
+        # Slope over the second half, once caches have warmed up
+        tail = growth[len(growth) // 2 :]
+        span = tail[-1]["turn"] - tail[0]["turn"] if len(tail) > 1 else 0
+        return {
+            "turns": turns,
+            "history_entries": entries,
+            "compactions": compactions,
+            "turns_per_s": round(turns / elapsed, 1),
+            "growth": growth,
+            "rss_bytes_per_turn": (
+                round((tail[-1]["rss_bytes"] - tail[0]["rss_bytes"]) / span)
+                if span
+                else 0
+            ),
+            "blocks_per_turn": (
+                round((tail[-1]["blocks"] - tail[0]["blocks"]) / span) if span else 0
+            ),
+        }
+
+    def run(self, only: Sequence[str] = BENCHMARKS) -> Dict:
+        results = {"meta": meta(self)}
+        for name in only:
+            if name not in BENCHMARKS:
+                raise ValueError(f"Unknown benchmark: {name}")
+            results[name] = getattr(self, name)()
+        return results
+
+
+def meta(bench: Bench) -> Dict:
+    """Where and how the numbers were taken, for comparing runs later."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "latency": bench.latency,
+        "chunks": bench.chunks,
+        "turns": bench.turns,
+    }
+
+
+def flatten(results: Dict, prefix: str = "") -> Dict[str, float]:
+    """Numeric leaves of a results dict keyed by dotted path."""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(baseline: Dict, current: Dict) -> List[Dict]:
+    """Changes between two result sets, skipping the run metadata."""
+    before = flatten({k: v for k, v in baseline.items() if k != "meta"})
+    after = flatten({k: v for k, v in current.items() if k != "meta"})
+    changes = []
+    for name, old in before.items():
+        if name not in after:
+            continue
+        new = after[name]
+        change = (new - old) / old * 100 if old else None
+        changes.append({"metric": name, "before": old, "after": new, "change": change})
+    return changes
@@ -0,0 +1,299 @@
+# hoshiri/client.py
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+import anthropic
+import httpx
+
+# Rate limits, server errors and overload (529) are worth another attempt
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+RATE_LIMITS = ("requests", "tokens", "input-tokens", "output-tokens")
+
+
+def is_retryable(error: Exception) -> bool:
+    """Tell whether a failed API call should be attempted again."""
+    if isinstance(error, anthropic.APIStatusError):
+        return error.status_code in RETRY_STATUS
+    # Also covers APITimeoutError
+    return isinstance(error, anthropic.APIConnectionError)
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Read the server's retry hint (in seconds) from an API error, if any."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        if "retry-after-ms" in response.headers:
+            return float(response.headers["retry-after-ms"]) / 1000
+        return float(response.headers["retry-after"])
+    except (KeyError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """Paces requests from the rate-limit headers of earlier responses.
+
+    Every response updates the remaining requests and tokens per limit. A
+    limit that is down to `reserve` of its size holds new requests until
+    its reset time, so the client waits up front instead of collecting
+    429s. A `retry-after` from the server holds everything the same way.
+    """
+
+    def __init__(self, reserve: float = 0.02):
+        self.reserve = reserve
+        self.limits: Dict[str, Dict] = {}
+        self._hold_until = 0.0
+        self._lock = threading.Lock()
+
+    def update(self, headers):
+        with self._lock:
+            for name in RATE_LIMITS:
+                prefix = f"anthropic-ratelimit-{name}-"
+                if prefix + "remaining" not in headers:
+                    continue
+                try:
+                    limit = int(headers[prefix + "limit"])
+                    remaining = int(headers[prefix + "remaining"])
+                    reset = datetime.fromisoformat(headers[prefix + "reset"]).timestamp()
+                except (KeyError, ValueError):
+                    continue
+                self.limits[name] = {
+                    "limit": limit,
+                    "remaining": remaining,
+                    "reset": reset,
+                }
+
+    def hold(self, seconds: float):
+        """Hold every request for `seconds` from now."""
+        with self._lock:
+            self._hold_until = max(self._hold_until, time.time() + seconds)
+
+    def delay(self) -> float:
+        """Return how long the next request should wait before it is sent."""
+        now = time.time()
+        with self._lock:
+            wait = self._hold_until - now
+            for state in self.limits.values():
+                if state["reset"] <= now:
+                    continue
+                if state["remaining"] <= state["limit"] * self.reserve:
+                    wait = max(wait, state["reset"] - now)
+        return max(wait, 0.0)
+
+
+class CallStats:
+    """Latency and token counters for the calls made through the client."""
+
+    def __init__(self, keep: int = 1000):
+        self.calls: deque = deque(maxlen=keep)
+        self.totals = {
+            "calls": 0,
+            "errors": 0,
+            "retries": 0,
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "cache_read_input_tokens": 0,
+            "seconds": 0.0,
+        }
+        self._lock = threading.Lock()
+
+    @property
+    def last(self) -> Optional[Dict]:
+        return self.calls[-1] if self.calls else None
+
+    def find(self, message_id: str) -> Optional[Dict]:
+        """Return the call that produced the message `message_id`, if kept.
+
+        With requests in flight on other threads (scheduled jobs, map
+        steps), `last` may be another request's call.
+        """
+        with self._lock:
+            for call in reversed(self.calls):
+                if call.get("id") == message_id:
+                    return call
+        return None
+
+    def record(
+        self,
+        latency: float,
+        retries: int,
+        message=None,
+        error: Optional[Exception] = None,
+        first_token: Optional[float] = None,
+    ) -> Dict:
+        call = {
+            "latency": round(latency, 3),
+            "first_token": round(first_token, 3) if first_token is not None else None,
+            "retries": retries,
+            "error": type(error).__name__ if error else None,
+        }
+        if message is not None:
+            call["id"] = message.id
+            call["input_tokens"] = message.usage.input_tokens
+            call["output_tokens"] = message.usage.output_tokens
+            call["cache_read_input_tokens"] = (
+                message.usage.cache_read_input_tokens or 0
+            )
+
+        with self._lock:
+            self.calls.append(call)
+            self.totals["calls"] += 1
+            self.totals["retries"] += retries
+            self.totals["seconds"] += latency
+            if error:
+                self.totals["errors"] += 1
+            for key in ("input_tokens", "output_tokens", "cache_read_input_tokens"):
+                self.totals[key] += call.get(key, 0)
+        return call
+
+    def summary(self) -> Dict:
+        with self._lock:
+            latencies = sorted(call["latency"] for call in self.calls)
+            summary = dict(self.totals)
+        summary["seconds"] = round(summary["seconds"], 3)
+        if latencies:
+            summary["p50_latency"] = latencies[len(latencies) // 2]
+            summary["p95_latency"] = latencies[int(len(latencies) * 0.95)]
+        return summary
+
+
+class ApiClient:
+    """The one Anthropic client the whole app shares.
+
+    It keeps a pooled HTTP connection alive across turns, retries 429, 529
+    and other transient failures with jittered exponential backoff, paces
+    requests from the rate-limit headers, and records latency and tokens
+    per call in `stats`. `create` and `stream` are the async entry points
+    used by the engine; `client` is a synchronous SDK client on the same
+    settings for background threads, with the SDK's own retries.
+
+    Point `base_url` (or ANTHROPIC_BASE_URL) at a local stub server to run
+    without the real API.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: Optional[str] = None,
+        max_retries: int = 5,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        max_connections: int = 20,
+        timeout: float = 600.0,
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.limiter = RateLimiter()
+        self.stats = CallStats()
+
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=120,
+        )
+
+        async def on_async_response(response: httpx.Response):
+            self.limiter.update(response.headers)
+
+        def on_response(response: httpx.Response):
+            self.limiter.update(response.headers)
+
+        # Our own retry loop runs on the async side, so the SDK's is off there
+        self.async_client = anthropic.AsyncAnthropic(
+            api_key=api_key,
+            base_url=base_url,
+            max_retries=0,
+            http_client=anthropic.DefaultAsyncHttpxClient(
+                limits=limits,
+                timeout=timeout,
+                event_hooks={"response": [on_async_response]},
+            ),
+        )
+        self.client = anthropic.Anthropic(
+            api_key=api_key,
+            base_url=base_url,
+            max_retries=max_retries,
+            http_client=anthropic.DefaultHttpxClient(
+                limits=limits,
+                timeout=timeout,
+                event_hooks={"response": [on_response]},
+            ),
+        )
+
+    async def create(self, **kwargs):
+        """Send one request and return the final message."""
+
+        async def send(started):
+            return await self.async_client.messages.create(**kwargs), None
+
+        return await self._call(send)
+
+    async def stream(self, on_text: Callable[[str], None], **kwargs):
+        """Stream one request, passing every text delta to `on_text`.
+
+        A failed stream is only retried if no text reached the callback yet.
+        """
+        state = {"emitted": False}
+
+        async def send(started):
+            first_token = None
+            async with self.async_client.messages.stream(**kwargs) as stream:
+                async for text in stream.text_stream:
+                    if first_token is None:
+                        first_token = time.monotonic() - started
+                    state["emitted"] = True
+                    on_text(text)
+                return await stream.get_final_message(), first_token
+
+        return await self._call(send, lambda: not state["emitted"])
+
+    def backoff(self, attempt: int, error: Exception) -> float:
+        """Jittered exponential delay before retry number `attempt + 1`."""
+        delay = min(self.max_delay, self.base_delay * 2**attempt)
+        delay *= random.uniform(0.5, 1.0)
+        hint = retry_after(error)
+        if hint is not None:
+            # Hold back every caller, not just this one
+            self.limiter.hold(hint)
+            delay = max(delay, hint)
+        return delay
+
+    async def _call(self, send, can_retry: Callable[[], bool] = lambda: True):
+        attempt = 0
+        # Latency covers the whole call, including pacing and retries
+        call_started = time.monotonic()
+        while True:
+            wait = self.limiter.delay()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            started = time.monotonic()
+            try:
+                message, first_token = await send(started)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e) or not can_retry():
+                    self.stats.record(time.monotonic() - call_started, attempt, error=e)
+                    raise
+                await asyncio.sleep(self.backoff(attempt, e))
+                attempt += 1
+                continue
+
+            self.stats.record(
+                time.monotonic() - call_started,
+                attempt,
+                message,
+                first_token=first_token,
+            )
+            return message
+
+    async def aclose(self):
+        await self.async_client.close()
+        self.client.close()
@@ -0,0 +1,186 @@
+# hoshiri/context.py
+
+import threading
+from typing import Dict, List, Optional
+
+# Rough token estimates; the API reports the exact input size after each call
+CHARS_PER_TOKEN = 4
+IMAGE_TOKENS = 1600
+
+SUMMARY_PROMPT = """Summarize the conversation above so it can replace the original turns.
+Keep every fact, decision, file name, code identifier and open question the user
+may refer back to. Write it as compact notes, not as a reply to the user."""
+
+
+class ContextManager:
+    """Keeps the conversation history inside a token budget.
+
+    Every history entry gets a token estimate the first time it is seen.
+    Once the history grows past `compact_at` of the budget, the older turns
+    are summarized in a background thread and, when the summary is ready,
+    replaced by it on the next turn. The most recent turns stay verbatim.
+    """
+
+    def __init__(
+        self,
+        client,
+        model: str,
+        budget: int = 100_000,
+        keep_recent: int = 6,
+        compact_at: float = 0.75,
+    ):
+        self.client = client
+        self.model = model
+        self.budget = budget
+        self.keep_recent = keep_recent
+        self.compact_at = compact_at
+        self.last_input_tokens: Optional[int] = None
+        self.compactions = 0
+
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._pending: Optional[tuple] = None
+        self.last_error: Optional[Exception] = None
+
+    def count(self, entry: Dict) -> int:
+        """Return the (cached) token estimate for a history entry."""
+        if "tokens" not in entry:
+            tokens = 0
+            for block in entry["content"]:
+                if block["type"] == "text":
+                    tokens += len(block["text"]) // CHARS_PER_TOKEN
+                elif block["type"] == "image":
+                    tokens += IMAGE_TOKENS
+                else:
+                    # base64 carries 3 bytes per 4 characters
+                    tokens += len(block["source"]["data"]) * 3 // 4 // CHARS_PER_TOKEN
+            entry["tokens"] = max(tokens, 1)
+        return entry["tokens"]
+
+    def total(self, history: List[Dict]) -> int:
+        return sum(self.count(entry) for entry in history)
+
+    def record_usage(self, usage):
+        """Remember the exact input size the API reported for the last call."""
+        self.last_input_tokens = usage.input_tokens + (
+            (usage.cache_read_input_tokens or 0)
+            + (usage.cache_creation_input_tokens or 0)
+        )
+
+    def usage(self, history: List[Dict]) -> Dict:
+        """Report how close the session is to its token budget."""
+        total = self.total(history)
+        return {
+            "estimated_tokens": total,
+            "last_input_tokens": self.last_input_tokens,
+            "budget": self.budget,
+            "percent": round(100 * total / self.budget, 1),
+            "entries": len(history),
+            "compactions": self.compactions,
+            "summarizing": self.is_summarizing(),
+            "last_error": str(self.last_error) if self.last_error else None,
+        }
+
+    def is_summarizing(self) -> bool:
+        return self._worker is not None and self._worker.is_alive()
+
+    def maybe_compact(self, history: List[Dict]) -> bool:
+        """Apply a finished summary and start a new one if over budget.
+
+        Must be called from the thread that owns `history`; the background
+        worker never touches the list itself. Returns True if the history
+        was compacted.
+        """
+        compacted = self._apply_pending(history)
+
+        if self.is_summarizing():
+            return compacted
+        if self.total(history) < self.budget * self.compact_at:
+            return compacted
+
+        split = self._split_point(history)
+        if split is None:
+            return compacted
+
+        older = history[:split]
+        self._worker = threading.Thread(
+            target=self._summarize, args=(older,), daemon=True
+        )
+        self._worker.start()
+        return compacted
+
+    def _split_point(self, history: List[Dict]) -> Optional[int]:
+        """Find where the verbatim tail starts; it must begin on a user turn."""
+        split = len(history) - self.keep_recent
+        while split > 0 and history[split]["role"] != "user":
+            split -= 1
+        # Compacting a single exchange gains nothing
+        return split if split >= 2 else None
+
+    def _summarize(self, older: List[Dict]):
+        messages = [
+            {"role": entry["role"], "content": self._text_only(entry["content"])}
+            for entry in older
+        ]
+        messages.append({"role": "user", "content": SUMMARY_PROMPT})
+
+        try:
+            response = self.client.messages.create(
+                model=self.model,
+                messages=messages,
+                max_tokens=2048,
+            )
+        except Exception as e:
+            self.last_error = e
+            return
+
+        self.last_error = None
+        with self._lock:
+            self._pending = (older, response.content[0].text)
+
+    @staticmethod
+    def _text_only(content: List[Dict]) -> List[Dict]:
+        """Replace attachments with placeholders so summarizing stays cheap."""
+        blocks = []
+        for block in content:
+            if block["type"] == "text":
+                blocks.append({"type": "text", "text": block["text"]})
+            else:
+                blocks.append({"type": "text", "text": f"[attached {block['type']}]"})
+        return blocks
+
+    def _apply_pending(self, history: List[Dict]) -> bool:
+        with self._lock:
+            pending, self._pending = self._pending, None
+
+        if pending is None:
+            return False
+
+        older, summary = pending
+        # Only splice if the summarized turns are still the head of the history
+        if len(history) < len(older) or any(
+            a is not b for a, b in zip(history, older)
+        ):
+            return False
+
+        history[: len(older)] = [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": f"Summary of our earlier conversation:\n\n{summary}",
+                    }
+                ],
+                "summary": True,
+            },
+            {
+                "role": "assistant",
+                "content": [
+                    {"type": "text", "text": "Understood, I'll keep that in mind."}
+                ],
+                "summary": True,
+            },
+        ]
+        self.compactions += 1
+        return True
@@ -0,0 +1,307 @@
+# hoshiri/documents.py
+
+import csv
+import io
+import multiprocessing
+import os
+import re
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+from xml.etree import ElementTree as ET
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+A = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+S = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+R = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+PR = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+HEADING_STYLE = re.compile(r"(?i)heading\s*(\d)")
+
+
+def table(rows: List[List[str]]) -> str:
+    """Render rows as a Markdown table, the first row as its header."""
+    width = max(len(row) for row in rows)
+    lines = []
+    for i, row in enumerate(rows):
+        cells = [cell.replace("|", "\\|").replace("\n", " ") for cell in row]
+        cells += [""] * (width - len(cells))
+        lines.append("| " + " | ".join(cells) + " |")
+        if i == 0:
+            lines.append("|" + " --- |" * width)
+    return "\n".join(lines)
+
+
+def _relationships(package: zipfile.ZipFile, part: str) -> Dict[str, str]:
+    """Map relationship ids of a package part to the parts they point at."""
+    folder, name = part.rsplit("/", 1)
+    root = ET.fromstring(package.read(f"{folder}/_rels/{name}.rels"))
+    targets = {}
+    for rel in root.iter(f"{PR}Relationship"):
+        target = rel.get("Target")
+        if target.startswith("/"):
+            target = target[1:]
+        else:
+            target = os.path.normpath(f"{folder}/{target}").replace(os.sep, "/")
+        targets[rel.get("Id")] = target
+    return targets
+
+
+def _paragraph(p: ET.Element) -> str:
+    text = []
+    for node in p.iter():
+        if node.tag == f"{W}t" and node.text:
+            text.append(node.text)
+        elif node.tag == f"{W}tab":
+            text.append("\t")
+        elif node.tag in (f"{W}br", f"{W}cr"):
+            text.append("\n")
+    line = "".join(text).strip()
+    style = p.find(f"{W}pPr/{W}pStyle")
+    name = style.get(f"{W}val", "") if style is not None else ""
+    heading = HEADING_STYLE.match(name)
+    if line and heading:
+        return "#" * min(int(heading.group(1)), 6) + " " + line
+    if line and name.lower() == "title":
+        return "# " + line
+    if line and p.find(f"{W}pPr/{W}numPr") is not None:
+        return "- " + line
+    return line
+
+
+def docx_text(package: zipfile.ZipFile) -> str:
+    """Paragraphs (headings and list items marked up) and tables of a .docx."""
+    body = ET.fromstring(package.read("word/document.xml")).find(f"{W}body")
+    if body is None:
+        raise ValueError("word/document.xml has no body")
+    blocks = []
+    for node in body:
+        if node.tag == f"{W}p":
+            line = _paragraph(node)
+            if line:
+                blocks.append(line)
+        elif node.tag == f"{W}tbl":
+            rows = [
+                [
+                    " ".join(filter(None, map(_paragraph, cell.iter(f"{W}p"))))
+                    for cell in row.findall(f"{W}tc")
+                ]
+                for row in node.findall(f"{W}tr")
+            ]
+            if rows:
+                blocks.append(table(rows))
+    return "\n\n".join(blocks)
+
+
+def _slide_blocks(node: ET.Element) -> Iterator[str]:
+    for child in node:
+        if child.tag == f"{A}tbl":
+            rows = [
+                [
+                    " ".join("".join(t.text or "" for t in cell.iter(f"{A}t")).split())
+                    for cell in row.findall(f"{A}tc")
+                ]
+                for row in child.findall(f"{A}tr")
+            ]
+            if rows:
+                yield table(rows)
+        elif child.tag == f"{A}p":
+            line = "".join(t.text or "" for t in child.iter(f"{A}t")).strip()
+            if line:
+                yield line
+        else:
+            yield from _slide_blocks(child)
+
+
+def pptx_text(package: zipfile.ZipFile) -> str:
+    """The text and tables of each slide of a .pptx, in presentation order."""
+    part = "ppt/presentation.xml"
+    targets = _relationships(package, part)
+    order = ET.fromstring(package.read(part)).iter(
+        "{http://schemas.openxmlformats.org/presentationml/2006/main}sldId"
+    )
+    slides = []
+    for number, slide in enumerate(order, 1):
+        root = ET.fromstring(package.read(targets[slide.get(f"{R}id")]))
+        blocks = list(_slide_blocks(root))
+        slides.append("\n\n".join([f"## Slide {number}", *blocks]))
+    return "\n\n".join(slides)
+
+
+def _column(ref: str) -> int:
+    index = 0
+    for char in ref:
+        if not char.isalpha():
+            break
+        index = index * 26 + ord(char.upper()) - 64
+    return index - 1
+
+
+def _sheet_rows(stream, shared: List[str]) -> Iterator[List[str]]:
+    # Sheets can be large, so rows are parsed and dropped one at a time
+    for _, node in ET.iterparse(stream):
+        if node.tag != f"{S}row":
+            continue
+        row: List[str] = []
+        for cell in node.findall(f"{S}c"):
+            kind = cell.get("t")
+            if kind == "inlineStr":
+                value = "".join(t.text or "" for t in cell.iter(f"{S}t"))
+            else:
+                v = cell.find(f"{S}v")
+                value = (v.text or "") if v is not None else ""
+                if kind == "s" and value:
+                    try:
+                        value = shared[int(value)]
+                    except (ValueError, IndexError):
+                        raise ValueError(f"bad shared string {value!r}") from None
+                elif kind == "b":
+                    value = "TRUE" if value == "1" else "FALSE"
+            ref = cell.get("r")
+            if ref:
+                row += [""] * (_column(ref) - len(row))
+            row.append(value)
+        node.clear()
+        while row and not row[-1]:
+            row.pop()
+        if row:
+            yield row
+
+
+def xlsx_text(package: zipfile.ZipFile) -> str:
+    """Every sheet of an .xlsx as CSV under its name.
+
+    Cells hold their stored values: formulas give their last computed
+    result and dates stay serial numbers.
+    """
+    shared = []
+    if "xl/sharedStrings.xml" in package.namelist():
+        for item in ET.fromstring(package.read("xl/sharedStrings.xml")):
+            # Rich text runs hold their own <t>; phonetic hints are skipped
+            parts = item.findall(f"{S}t") + item.findall(f"{S}r/{S}t")
+            shared.append("".join(t.text or "" for t in parts))
+
+    part = "xl/workbook.xml"
+    targets = _relationships(package, part)
+    sheets = []
+    for sheet in ET.fromstring(package.read(part)).iter(f"{S}sheet"):
+        out = io.StringIO()
+        writer = csv.writer(out, lineterminator="\n")
+        with package.open(targets[sheet.get(f"{R}id")]) as stream:
+            writer.writerows(_sheet_rows(stream, shared))
+        sheets.append(f"## Sheet: {sheet.get('name')}\n\n{out.getvalue().rstrip()}")
+    return "\n\n".join(sheets)
+
+
+EXTRACTORS = {".docx": docx_text, ".pptx": pptx_text, ".xlsx": xlsx_text}
+# Older binary formats that would need a converter to read
+LEGACY = {".doc", ".ppt", ".xls"}
+
+
+def can_extract(file_path: Path) -> bool:
+    return Path(file_path).suffix.lower() in EXTRACTORS
+
+
+def extract(file_path: Path) -> str:
+    """Return the text of an Office Open XML document as Markdown.
+
+    Any failure to read a document, however malformed, is a ValueError.
+    """
+    file_path = Path(file_path)
+    try:
+        with zipfile.ZipFile(file_path) as package:
+            text = EXTRACTORS[file_path.suffix.lower()](package)
+    except Exception as e:
+        raise ValueError(f"Could not read {file_path.name}: {e}") from None
+    return f"# {file_path.name}\n\n{text}\n"
+
+
+def extract_to(source: Path, target: Path) -> Path:
+    """Extract `source` into `target` atomically; runs in worker processes."""
+    text = extract(source)
+    fd, tmp_name = tempfile.mkstemp(dir=target.parent, prefix=".extract-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_name, target)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+    return target
+
+
+class DocumentCache:
+    """Text extracted from office documents, cached on disk by content hash.
+
+    Word, PowerPoint and Excel files are converted to Markdown (tables as
+    Markdown tables, sheets as CSV) once per content hash and stored at
+    `<root>/<sha256>/<name>.md`, so the work survives across turns and
+    sessions. Uncached documents are extracted in a process pool, since
+    parsing the XML is CPU-bound and a folder of them should not queue up
+    behind one core.
+    """
+
+    def __init__(self, root: Path, workers: Optional[int] = None):
+        self.root = Path(root)
+        self.workers = workers or os.cpu_count() or 1
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path(self, file_path: Path, digest: str) -> Path:
+        return self.root / digest / f"{Path(file_path).name}.md"
+
+    def get(self, file_path: Path, digest: str) -> Path:
+        """Return the extracted text file for one document, extracting if needed."""
+        result = self.extract_many([(file_path, digest)])[digest]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def extract_many(
+        self, documents: Sequence[Tuple[Path, str]]
+    ) -> Dict[str, Union[Path, Exception]]:
+        """Extract (path, digest) pairs; each maps to its text file or its error.
+
+        One document failing, for any reason, does not affect the others.
+        """
+        results: Dict[str, Union[Path, Exception]] = {}
+        todo = []
+        queued = set()
+        for file_path, digest in documents:
+            target = self.path(file_path, digest)
+            if digest in results or digest in queued:
+                # The same content under another name
+                continue
+            if target.exists():
+                results[digest] = target
+            else:
+                target.parent.mkdir(exist_ok=True)
+                todo.append((file_path, digest, target))
+                queued.add(digest)
+
+        if len(todo) == 1:
+            file_path, digest, target = todo[0]
+            try:
+                results[digest] = extract_to(file_path, target)
+            except Exception as e:
+                results[digest] = e
+        elif todo:
+            # Spawned, not forked: the chat has the engine and scheduler
+            # threads running, and a fork copies their locks mid-use
+            with ProcessPoolExecutor(
+                min(self.workers, len(todo)),
+                mp_context=multiprocessing.get_context("spawn"),
+            ) as pool:
+                futures = {
+                    digest: pool.submit(extract_to, file_path, target)
+                    for file_path, digest, target in todo
+                }
+                for digest, future in futures.items():
+                    try:
+                        results[digest] = future.result()
+                    except Exception as e:
+                        # A worker that died (BrokenProcessPool) fails its
+                        # document rather than the whole upload
+                        results[digest] = e
+        return results
@@ -0,0 +1,97 @@
+# hoshiri/engine.py
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+from hoshiri.client import ApiClient
+
+
+class AsyncEngine:
+    """Asyncio core that talks to the Messages API.
+
+    The engine owns an event loop running in a background thread, so the
+    synchronous REPL can hand it coroutines with `submit` and keep the
+    terminal responsive while they run. Any number of requests can be in
+    flight; a semaphore caps how many hit the API at the same time.
+    Retries, pacing and metrics are handled by the shared `ApiClient`.
+    """
+
+    def __init__(
+        self,
+        api: ApiClient,
+        model: str,
+        max_concurrency: int = 4,
+        max_tokens: int = 4096,
+    ):
+        self.model = model
+        self.max_tokens = max_tokens
+        self.api = api
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._thread.start()
+
+    def submit(self, coro) -> Future:
+        """Schedule a coroutine on the engine loop from any thread."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    async def ask(
+        self,
+        messages: List[Dict],
+        system=None,
+        on_text: Optional[Callable[[str], None]] = None,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+    ):
+        """Send one request and return the final message.
+
+        With `on_text` the reply is streamed and every text delta is passed
+        to the callback as it arrives (on the engine thread).
+        """
+        kwargs = {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": max_tokens or self.max_tokens,
+        }
+        if system is not None:
+            kwargs["system"] = system
+        if temperature is not None:
+            kwargs["temperature"] = temperature
+
+        async with self._semaphore:
+            if on_text is None:
+                return await self.api.create(**kwargs)
+            return await self.api.stream(on_text, **kwargs)
+
+    async def ask_many(self, requests: List[Dict]) -> List:
+        """Run several `ask` calls concurrently.
+
+        Each request is a dict of `ask` keyword arguments. Results come back
+        in request order; a failed request yields its exception instead of
+        cancelling the others.
+        """
+        return await asyncio.gather(
+            *(self.ask(**request) for request in requests), return_exceptions=True
+        )
+
+    async def _shutdown(self):
+        # Requests still in flight are cancelled, so threads waiting on
+        # their futures (scheduled jobs) get CancelledError instead of
+        # waiting on a loop that has stopped
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.api.aclose()
+
+    def close(self):
+        """Cancel pending requests, close the HTTP client and close the loop."""
+        if self.loop.is_closed():
+            return
+        self.submit(self._shutdown()).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
@@ -0,0 +1,290 @@
+# hoshiri/executor.py
+
+import contextlib
+import importlib
+import io
+import multiprocessing
+import pickle
+import threading
+import time
+import traceback
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from hoshiri.loader import ModuleLoader
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Imported once per worker so generated scripts don't pay for them per run
+WARM_IMPORTS = (
+    "json",
+    "os",
+    "re",
+    "datetime",
+    "pathlib",
+    "collections",
+    "subprocess",
+    "requests",
+)
+# Per worker process: module files are compiled once and recompiled on change
+_loader = ModuleLoader()
+
+
+def _worker_main(conn, warm_imports: Sequence[str], memory_bytes: Optional[int]):
+    """Worker loop: warm up, then run one task per message until told to stop."""
+    if memory_bytes and resource is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+    for name in warm_imports:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        conn.send(_run_task(task))
+
+
+def _run_task(task: Dict) -> Dict:
+    path = task.get("path")
+    code = task.get("code")
+    stdout = io.StringIO()
+    namespace = {"__name__": "hoshiri_task", "__file__": path}
+    loads = dict(_loader.stats)
+    try:
+        if code is None:
+            compiled = _loader.code(Path(path))
+        else:
+            compiled = compile(code, "<generated>", "exec")
+        with contextlib.redirect_stdout(stdout):
+            exec(compiled, namespace)
+            run_command = namespace.get("run_command")
+            run_step = namespace.get("run_step")
+            inputs = task.get("inputs")
+            if inputs is not None and callable(run_step):
+                output = run_step(
+                    task.get("command", ""),
+                    {step_id: iter(items) for step_id, items in inputs.items()},
+                )
+                if output is None or isinstance(output, (str, bytes, dict)):
+                    output = [output]
+                result = list(output)
+            elif callable(run_command):
+                result = run_command(task.get("command", ""))
+            else:
+                result = namespace.get("result")
+            if inputs is not None and not callable(run_step):
+                # A pipeline step always yields a list of items
+                result = [result]
+    except BaseException as e:
+        return {
+            "ok": False,
+            "error": "".join(traceback.format_exception_only(type(e), e)).strip(),
+            "traceback": traceback.format_exc(),
+            "stdout": stdout.getvalue(),
+            "loader": _loader_delta(loads),
+            # The worker may be in a bad state after this
+            "fatal": isinstance(e, (MemoryError, SystemExit, KeyboardInterrupt)),
+        }
+
+    try:
+        # Only plain data crosses the pipe
+        pickle.dumps(result)
+    except Exception:
+        if task.get("inputs") is not None:
+            result = [repr(item) for item in result]
+        else:
+            result = repr(result)
+    return {
+        "ok": True,
+        "result": result,
+        "stdout": stdout.getvalue(),
+        "loader": _loader_delta(loads),
+    }
+
+
+def _loader_delta(before: Dict) -> Dict:
+    """What this task added to the worker's loader stats."""
+    return {name: value - before[name] for name, value in _loader.stats.items()}
+
+
+class _Worker:
+    def __init__(self, context, warm_imports, memory_bytes):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child, warm_imports, memory_bytes),
+            daemon=True,
+        )
+        self.process.start()
+        child.close()
+        self.tasks = 0
+
+    def stop(self, kill: bool = False):
+        if kill:
+            self.process.kill()
+        else:
+            with contextlib.suppress(OSError):
+                self.conn.send(None)
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class Executor:
+    """Pool of pre-warmed worker processes that run generated modules.
+
+    Workers are spawned up front with `warm_imports` already loaded and
+    then take tasks over a pipe; module files are compiled once per worker
+    and only recompiled when they change, with the loader counts of every
+    worker summed in `loader_stats`. A small script runs in milliseconds
+    instead of paying interpreter start-up each time, while still running
+    outside the chat process. Each worker has an address-space limit of
+    `memory_mb`; a task that runs past its timeout or crashes its worker
+    gets that worker killed and replaced, and workers are recycled after
+    `max_tasks` tasks so leaked state doesn't pile up.
+
+    `run` is blocking and thread-safe; call it from several threads (or
+    `asyncio.to_thread`) to use more than one worker at a time.
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        timeout: float = 30.0,
+        memory_mb: Optional[int] = 512,
+        max_tasks: int = 50,
+        warm_imports: Sequence[str] = WARM_IMPORTS,
+    ):
+        self.timeout = timeout
+        self.max_tasks = max_tasks
+        self.warm_imports = tuple(warm_imports)
+        self.memory_bytes = memory_mb * 1024 * 1024 if memory_mb else None
+        self.stats = {"tasks": 0, "timeouts": 0, "crashes": 0, "recycled": 0}
+        # Module loads summed over every worker, past and present
+        self.loader_stats = {
+            "hits": 0,
+            "compiles": 0,
+            "reloads": 0,
+            "load_seconds": 0.0,
+        }
+
+        self._context = multiprocessing.get_context("spawn")
+        self._idle: List[_Worker] = [self._spawn() for _ in range(workers)]
+        self._available = threading.Condition()
+        self._closed = False
+
+    def run(
+        self,
+        path: Optional[Path] = None,
+        command: str = "",
+        code: Optional[str] = None,
+        timeout: Optional[float] = None,
+        inputs: Optional[Dict[str, List]] = None,
+    ) -> Dict:
+        """Run a module file (or source `code`) in a worker.
+
+        The module's `run_command(command)` is called if it defines one,
+        otherwise its top-level `result` variable is returned. With `inputs`
+        (upstream pipeline items by step id) the module runs as a pipeline
+        step and the result is its list of items: those of
+        `run_step(command, inputs)` if it defines one, otherwise the single
+        result of `run_command`. The result dict has `ok`, `result` or
+        `error`, the captured `stdout` and the wall time in `seconds`. The
+        `timeout` covers any wait for a free worker as well as the run
+        itself.
+        """
+        task = {
+            "path": str(path) if path is not None else None,
+            "code": code,
+            "command": command,
+            "inputs": inputs,
+        }
+        timeout = self.timeout if timeout is None else timeout
+        started = time.perf_counter()
+
+        worker = self._acquire(started + timeout)
+        if worker is None:
+            self.stats["timeouts"] += 1
+            return {
+                "ok": False,
+                "error": f"Timed out after {timeout:g}s waiting for a worker",
+                "stdout": "",
+                "seconds": time.perf_counter() - started,
+            }
+        replace = False
+        try:
+            worker.conn.send(task)
+            if worker.conn.poll(max(started + timeout - time.perf_counter(), 0)):
+                reply = worker.conn.recv()
+                replace = reply.pop("fatal", False)
+                for name, value in reply.pop("loader", {}).items():
+                    self.loader_stats[name] += value
+            else:
+                self.stats["timeouts"] += 1
+                reply = {"ok": False, "error": f"Timed out after {timeout:g}s"}
+                replace = True
+        except (EOFError, OSError):
+            self.stats["crashes"] += 1
+            worker.process.join(timeout=1)
+            exitcode = worker.process.exitcode
+            reply = {"ok": False, "error": f"Worker died (exit code {exitcode})"}
+            replace = True
+
+        worker.tasks += 1
+        self.stats["tasks"] += 1
+        self._release(worker, replace)
+        reply.setdefault("stdout", "")
+        reply["seconds"] = time.perf_counter() - started
+        return reply
+
+    def _spawn(self) -> _Worker:
+        return _Worker(self._context, self.warm_imports, self.memory_bytes)
+
+    def _acquire(self, deadline: float) -> Optional[_Worker]:
+        """Take an idle worker, or return None if none frees up by `deadline`."""
+        with self._available:
+            while not self._idle:
+                if self._closed:
+                    raise RuntimeError("Executor is closed")
+                left = deadline - time.perf_counter()
+                if left <= 0:
+                    return None
+                self._available.wait(left)
+            worker = self._idle.pop()
+        if not worker.process.is_alive():
+            worker.stop(kill=True)
+            worker = self._spawn()
+        return worker
+
+    def _release(self, worker: _Worker, replace: bool):
+        if replace or worker.tasks >= self.max_tasks:
+            if not replace:
+                self.stats["recycled"] += 1
+            worker.stop(kill=replace)
+            # The new worker warms up while it waits for its first task
+            worker = self._spawn()
+        with self._available:
+            if self._closed:
+                worker.stop()
+                return
+            self._idle.append(worker)
+            self._available.notify()
+
+    def close(self):
+        with self._available:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._available.notify_all()
+        for worker in idle:
+            worker.stop()
@@ -0,0 +1,154 @@
+# hoshiri/fileindex.py
+
+import re
+import sqlite3
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from hoshiri.largefile import LargeFile
+from hoshiri.text import match_expression
+
+# Lines that give a file its shape: Markdown headings, definitions in the
+# common languages, and section headers of INI/TOML files
+OUTLINE_LINE = re.compile(
+    r"^(#{1,6} \S|\s{0,8}(async def|def|class|function|func|fn|pub fn|"
+    r"interface|struct|impl|module|package|CREATE TABLE)\b|\[[\w.\- ]+\]\s*$)",
+    re.IGNORECASE,
+)
+MAX_OUTLINE_LINES = 40
+
+
+def outline(large: LargeFile, chunks: List[Dict]) -> str:
+    """A few lines that describe a file: size, line count and its structure."""
+    lines = chunks[-1]["last_line"] if chunks else 0
+    head = f"{large.path.name}: {lines} lines, {large.size / 1024:.0f} KB"
+    if not chunks:
+        return head
+    marks = []
+    for chunk in chunks:
+        for offset, line in enumerate(chunk["text"].splitlines()):
+            if OUTLINE_LINE.match(line):
+                marks.append(f"  {chunk['first_line'] + offset}: {line.strip()[:100]}")
+    if not marks:
+        # Tables and logs have no headings; their first line says what they hold
+        first = chunks[0]["text"].split("\n", 1)[0].strip()[:200]
+        return f"{head}\n  1: {first}"
+    if len(marks) > MAX_OUTLINE_LINES:
+        marks = marks[:MAX_OUTLINE_LINES] + [
+            f"  … {len(marks) - MAX_OUTLINE_LINES} more"
+        ]
+    return head + "\n" + "\n".join(marks)
+
+
+class FileIndex:
+    """Full-text index of uploaded text files, for sending only what matters.
+
+    Each file is cut into line-aligned chunks and stored once per content
+    hash in an FTS5 table next to the uploads, together with a short
+    outline of the file. `search` ranks the chunks of the attached files
+    with BM25, so a turn can carry the outline and the best few chunks
+    instead of every file in full.
+    """
+
+    def __init__(self, path: Path, chunk_tokens: int = 300):
+        self.path = Path(path)
+        self.chunk_tokens = chunk_tokens
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5("
+            "text, digest UNINDEXED, part UNINDEXED, first_line UNINDEXED, "
+            "last_line UNINDEXED, tokenize='porter unicode61')"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS files "
+            "(digest TEXT PRIMARY KEY, name TEXT, chunks INTEGER, outline TEXT)"
+        )
+        self.db.commit()
+
+    def add(self, file_path: Path, digest: str) -> int:
+        """Index a file under its content hash, once; returns its chunk count."""
+        row = self.db.execute(
+            "SELECT chunks FROM files WHERE digest = ?", (digest,)
+        ).fetchone()
+        if row is not None:
+            return row[0]
+        with LargeFile(file_path, self.chunk_tokens) as large:
+            chunks = list(large.chunks())
+            summary = outline(large, chunks)
+        with self.db:
+            self.db.executemany(
+                "INSERT INTO chunks (text, digest, part, first_line, last_line) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (c["text"], digest, c["index"], c["first_line"], c["last_line"])
+                    for c in chunks
+                ],
+            )
+            self.db.execute(
+                "INSERT INTO files (digest, name, chunks, outline) VALUES (?, ?, ?, ?)",
+                (digest, Path(file_path).name, len(chunks), summary),
+            )
+        return len(chunks)
+
+    def outline(self, digest: str) -> Optional[str]:
+        row = self.db.execute(
+            "SELECT outline FROM files WHERE digest = ?", (digest,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def search(self, query: str, digests: Sequence[str], k: int = 6) -> List[Dict]:
+        """Return the `k` chunks of the given files that best match `query`.
+
+        With nothing to match on, the opening chunks of each file stand in.
+        """
+        if not digests:
+            return []
+        marks = ", ".join("?" * len(digests))
+        match = match_expression(query)
+        rows = []
+        if match is not None:
+            rows = self.db.execute(
+                "SELECT text, digest, part, first_line, last_line FROM chunks "
+                f"WHERE chunks MATCH ? AND digest IN ({marks}) ORDER BY rank LIMIT ?",
+                (match, *digests, k),
+            ).fetchall()
+        if not rows:
+            per_file = max(k // len(digests), 1)
+            rows = self.db.execute(
+                "SELECT text, digest, part, first_line, last_line FROM chunks "
+                f"WHERE digest IN ({marks}) AND CAST(part AS INTEGER) <= ? "
+                "ORDER BY digest, CAST(part AS INTEGER)",
+                (*digests, per_file),
+            ).fetchall()
+        return [
+            {
+                "text": text,
+                "digest": digest,
+                "part": int(part),
+                "first_line": int(first),
+                "last_line": int(last),
+            }
+            for text, digest, part, first, last in rows
+        ]
+
+    def count(self) -> int:
+        return self.db.execute("SELECT count(*) FROM chunks").fetchone()[0]
+
+    def close(self):
+        self.db.close()
+
+
+def excerpt_block(name: str, outline: str, chunks: List[Dict]) -> Dict:
+    """A text block with a file's outline and its retrieved chunks in file order."""
+    parts = [
+        f"Excerpts from {name}, chosen by relevance to this question; "
+        f"the rest of the file is not shown.\n\nOutline:\n{outline}"
+    ]
+    for chunk in sorted(chunks, key=lambda c: c["part"]):
+        parts.append(
+            f"[lines {chunk['first_line']}-{chunk['last_line']}]\n"
+            + chunk["text"].rstrip("\n")
+        )
+    return {"type": "text", "text": "\n\n".join(parts)}
@@ -0,0 +1,155 @@
+# hoshiri/images.py
+
+import io
+import os
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Tuple
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Optional; without it images are sent as they are
+    Image = ImageOps = None
+
+# The API scales anything past ~1568 px on the long edge or ~1.15 MP down
+# itself, so larger images only cost upload time
+MAX_EDGE = 1568
+MAX_PIXELS = 1_150_000
+# Media types the API accepts
+SUPPORTED = {"image/jpeg", "image/png", "image/gif", "image/webp"}
+FORMATS = {
+    "jpeg": ("JPEG", "image/jpeg", ".jpg"),
+    "webp": ("WEBP", "image/webp", ".webp"),
+    "png": ("PNG", "image/png", ".png"),
+}
+EXTENSIONS = {media: ext for _, media, ext in FORMATS.values()}
+EXTENSIONS["image/gif"] = ".gif"
+
+
+def target_size(
+    width: int, height: int, max_edge: int = MAX_EDGE, max_pixels: int = MAX_PIXELS
+) -> Tuple[int, int]:
+    """The largest size within both limits that keeps the aspect ratio."""
+    scale = min(
+        1.0, max_edge / max(width, height), (max_pixels / (width * height)) ** 0.5
+    )
+    return max(int(width * scale), 1), max(int(height * scale), 1)
+
+
+class ImageCache:
+    """Downscaled, recompressed copies of image attachments.
+
+    Each image is shrunk to the largest size the model makes use of and
+    re-encoded as `format` at `quality`, in a small thread pool (Pillow
+    releases the GIL while decoding, resizing and encoding). JPEGs are
+    decoded at a reduced scale to begin with, which makes a phone photo
+    several times cheaper to shrink. A result is kept on disk under the
+    content hash and the settings, so it is made once across sessions. An
+    image that is already small and would not get smaller is sent as it
+    is, as are animated GIFs.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        max_edge: int = MAX_EDGE,
+        max_pixels: int = MAX_PIXELS,
+        format: str = "jpeg",
+        quality: int = 85,
+        workers: int = 2,
+    ):
+        if format not in FORMATS:
+            raise ValueError(
+                f"Unknown image format {format!r}; use one of {', '.join(FORMATS)}"
+            )
+        self.root = Path(root)
+        self.max_edge = max_edge
+        self.max_pixels = max_pixels
+        self.format = format
+        self.quality = quality
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="hoshiri-image")
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return Image is not None
+
+    def key(self, digest: str) -> str:
+        return f"{digest}-{self.max_edge}-{self.max_pixels}-{self.format}{self.quality}"
+
+    def submit(self, file_path: Path, media_type: str, digest: str) -> Future:
+        """Start preparing an image in the pool; the same image is prepared once."""
+        key = self.key(digest)
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pool.submit(
+                    self._prepare, Path(file_path), media_type, key
+                )
+                self._pending[key] = future
+        return future
+
+    def get(self, file_path: Path, media_type: str, digest: str) -> Tuple[bytes, str]:
+        """Return the bytes and media type to send for an image."""
+        return self.submit(file_path, media_type, digest).result()
+
+    def _prepare(self, file_path: Path, media_type: str, key: str) -> Tuple[bytes, str]:
+        for cached in self.root.glob(f"{key}.*"):
+            media = next(m for m, ext in EXTENSIONS.items() if ext == cached.suffix)
+            return cached.read_bytes(), media
+
+        original = file_path.read_bytes()
+        if Image is None:
+            return original, media_type
+        try:
+            data, media = self._shrink(original, media_type)
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            if media_type in SUPPORTED:
+                return original, media_type
+            raise ValueError(f"Could not read image {file_path.name}: {e}") from None
+
+        fd, tmp_name = tempfile.mkstemp(dir=self.root, prefix=".image-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_name, self.root / f"{key}{EXTENSIONS[media]}")
+        except BaseException:
+            os.unlink(tmp_name)
+            raise
+        return data, media
+
+    def _shrink(self, original: bytes, media_type: str) -> Tuple[bytes, str]:
+        with Image.open(io.BytesIO(original)) as image:
+            if getattr(image, "is_animated", False) and media_type in SUPPORTED:
+                return original, media_type
+            # For JPEGs, decode straight to the nearest power-of-two scale
+            image.draft("RGB", target_size(*image.size, self.max_edge, self.max_pixels))
+            image = ImageOps.exif_transpose(image)
+            size = target_size(*image.size, self.max_edge, self.max_pixels)
+            resized = size != image.size
+            if resized:
+                image = image.resize(size, Image.LANCZOS, reducing_gap=3.0)
+
+            name, media, _ = FORMATS[self.format]
+            if name == "JPEG" and image.mode not in ("RGB", "L"):
+                if image.mode in ("RGBA", "LA", "P"):
+                    # JPEG has no alpha; flatten transparent areas onto white
+                    image = image.convert("RGBA")
+                    flat = Image.new("RGB", image.size, "white")
+                    flat.paste(image, mask=image.getchannel("A"))
+                    image = flat
+                else:
+                    image = image.convert("RGB")
+            buffer = io.BytesIO()
+            image.save(buffer, name, quality=self.quality, optimize=True)
+        data = buffer.getvalue()
+        if not resized and media_type in SUPPORTED and len(original) <= len(data):
+            return original, media_type
+        return data, media
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,291 @@
+# hoshiri/largefile.py
+
+import asyncio
+import mmap
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from hoshiri.context import CHARS_PER_TOKEN
+
+MAP_PROMPT = """Below is part {index} of {total} of the file {name} (lines {first_line}-{last_line}).
+
+<part>
+{text}
+</part>
+
+Question about the whole file: {question}
+
+Answer from this part only, as short notes for someone who will combine the
+notes from every part. Quote the lines (with their line numbers) and values
+your notes rest on. If this part has nothing relevant, reply with just NONE."""
+
+MERGE_PROMPT = """These notes were taken from consecutive parts of the file {name} to
+answer: {question}
+
+{notes}
+
+Merge them into one set of notes. Keep every specific fact, count, value and
+line reference; drop repetition and anything irrelevant to the question."""
+
+ANSWER_PROMPT = "{notes}\n\n{question}"
+
+
+def chunk_spans(data, max_bytes: int) -> Iterator[Tuple[int, int]]:
+    """Yield (start, end) byte offsets that cut `data` into chunks.
+
+    Chunks end after a newline wherever one falls inside `max_bytes`; a
+    longer line is cut at the limit, moved back to the start of a UTF-8
+    character so no character is split between chunks.
+    """
+    size = len(data)
+    start = 0
+    while start < size:
+        end = start + max_bytes
+        if end >= size:
+            end = size
+        else:
+            newline = data.rfind(b"\n", start, end)
+            if newline >= 0:
+                end = newline + 1
+            else:
+                # Continuation bytes look like 0b10xxxxxx
+                back = end
+                while end - back < 3 and back > start + 1:
+                    if data[back] & 0xC0 != 0x80:
+                        break
+                    back -= 1
+                if data[back] & 0xC0 != 0x80:
+                    end = back
+        yield start, end
+        start = end
+
+
+class LargeFile:
+    """A text file read through `mmap`, one chunk of lines at a time.
+
+    Only the chunk being decoded is ever copied out of the mapping, so a
+    file of any size costs the same memory as one chunk. Bytes that are not
+    valid UTF-8 are replaced rather than raising.
+    """
+
+    def __init__(self, path: Path, chunk_tokens: int = 20_000):
+        self.path = Path(path)
+        self.max_bytes = chunk_tokens * CHARS_PER_TOKEN
+        self.size = self.path.stat().st_size
+        self._file = open(self.path, "rb")
+        # An empty file cannot be mapped
+        self._data = (
+            mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            if self.size
+            else b""
+        )
+        self._spans: Optional[List[Tuple[int, int]]] = None
+
+    @property
+    def spans(self) -> List[Tuple[int, int]]:
+        if self._spans is None:
+            self._spans = list(chunk_spans(self._data, self.max_bytes))
+        return self._spans
+
+    def __len__(self) -> int:
+        return len(self.spans)
+
+    def chunks(self) -> Iterator[Dict]:
+        """Yield each chunk's text with its position in the file."""
+        line = 1
+        for index, (start, end) in enumerate(self.spans, 1):
+            raw = self._data[start:end]
+            lines = raw.count(b"\n")
+            last = line + lines - 1 if raw.endswith(b"\n") else line + lines
+            yield {
+                "index": index,
+                "first_line": line,
+                "last_line": last,
+                "text": raw.decode("utf-8", errors="replace"),
+            }
+            line += lines
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+    def __enter__(self) -> "LargeFile":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def is_none(text: str) -> bool:
+    return text.strip().rstrip(".").upper() == "NONE"
+
+
+def notes_block(name: str, result: Dict) -> Dict:
+    """The notes from `MapReduce.notes` as a text block that stands in for the file."""
+    header = (
+        f"The file {name} is too large to attach whole, so it was read in "
+        f"{result['parts']} parts and notes were taken for this question"
+    )
+    if result["failed"]:
+        header += f" ({result['failed']} parts could not be read)"
+    if not result["text"]:
+        return {"type": "text", "text": f"{header}. No part had anything relevant."}
+    return {"type": "text", "text": f"{header}:\n\n{result['text']}"}
+
+
+class MapReduce:
+    """Answers a question about a text file too large for one request.
+
+    Map: every chunk of the file is asked the question on its own, by a
+    bounded pool of workers that pull chunks from the file as they go, so
+    only `concurrency` chunks are held in memory at once. Parts with
+    nothing relevant answer NONE and are dropped. Reduce: the remaining
+    notes, in file order, are merged in groups until they fit in
+    `notes_tokens`; `answer` then asks the question once more over them.
+    Requests go through the engine, which adds its own concurrency cap,
+    retries and pacing.
+    """
+
+    def __init__(
+        self,
+        engine,
+        system=None,
+        concurrency: int = 4,
+        chunk_tokens: int = 20_000,
+        notes_tokens: int = 20_000,
+        map_tokens: int = 1024,
+        on_usage: Optional[Callable[[Any], None]] = None,
+    ):
+        self.engine = engine
+        self.system = system
+        self.concurrency = concurrency
+        self.chunk_tokens = chunk_tokens
+        self.notes_tokens = notes_tokens
+        self.map_tokens = map_tokens
+        self.on_usage = on_usage
+
+    async def notes(
+        self,
+        path: Path,
+        question: str,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+    ) -> Dict:
+        """Map the question over the file's chunks and reduce the notes.
+
+        `on_progress(done, total)` is called on the engine thread after
+        each chunk. Failed chunks are counted and skipped; if every chunk
+        fails, the first error is raised.
+        """
+        path = Path(path)
+        with LargeFile(path, self.chunk_tokens) as large:
+            total = len(large)
+            found: Dict[int, str] = {}
+            errors: List[Exception] = []
+            chunks = large.chunks()
+            done = 0
+
+            async def worker():
+                nonlocal done
+                # The loop is single-threaded, so workers can share the iterator
+                for chunk in chunks:
+                    prompt = MAP_PROMPT.format(
+                        name=path.name, total=total, question=question, **chunk
+                    )
+                    try:
+                        text = await self._ask(prompt, self.map_tokens)
+                    except Exception as e:
+                        errors.append(e)
+                    else:
+                        if not is_none(text):
+                            found[chunk["index"]] = (
+                                f"[part {chunk['index']}, lines "
+                                f"{chunk['first_line']}-{chunk['last_line']}]\n"
+                                + text.strip()
+                            )
+                    done += 1
+                    if on_progress:
+                        on_progress(done, total)
+
+            workers = [
+                asyncio.create_task(worker())
+                for _ in range(max(min(self.concurrency, total), 1))
+            ]
+            try:
+                await asyncio.gather(*workers)
+            finally:
+                for task in workers:
+                    task.cancel()
+
+        if total and len(errors) == total:
+            raise errors[0]
+        notes = [found[index] for index in sorted(found)]
+        notes, merges = await self._reduce(path.name, question, notes)
+        return {
+            "text": "\n\n".join(notes),
+            "parts": total,
+            "relevant": len(found),
+            "failed": len(errors),
+            "merges": merges,
+        }
+
+    async def answer(
+        self,
+        path: Path,
+        question: str,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+    ):
+        """Return the final message answering `question` from the file's notes."""
+        result = await self.notes(path, question, on_progress)
+        block = notes_block(Path(path).name, result)
+        message = await self.engine.ask(
+            [
+                {
+                    "role": "user",
+                    "content": ANSWER_PROMPT.format(
+                        notes=block["text"], question=question
+                    ),
+                }
+            ],
+            system=self.system,
+        )
+        if self.on_usage:
+            self.on_usage(message.usage)
+        return message
+
+    async def _reduce(
+        self, name: str, question: str, notes: List[str]
+    ) -> Tuple[List[str], int]:
+        budget = self.notes_tokens * CHARS_PER_TOKEN
+        merges = 0
+        while sum(len(note) for note in notes) > budget:
+            groups: List[List[str]] = [[]]
+            for note in notes:
+                if groups[-1] and sum(map(len, groups[-1])) + len(note) > budget:
+                    groups.append([])
+                groups[-1].append(note)
+            if all(len(group) == 1 for group in groups):
+                break
+            notes = await asyncio.gather(
+                *(self._merge(name, question, group) for group in groups)
+            )
+            merges += sum(len(group) > 1 for group in groups)
+        return notes, merges
+
+    async def _merge(self, name: str, question: str, group: List[str]) -> str:
+        if len(group) == 1:
+            return group[0]
+        prompt = MERGE_PROMPT.format(
+            name=name, question=question, notes="\n\n".join(group)
+        )
+        return await self._ask(prompt, self.map_tokens * 2)
+
+    async def _ask(self, prompt: str, max_tokens: int) -> str:
+        message = await self.engine.ask(
+            [{"role": "user", "content": prompt}],
+            system=self.system,
+            max_tokens=max_tokens,
+        )
+        if self.on_usage:
+            self.on_usage(message.usage)
+        return "".join(block.text for block in message.content if block.type == "text")
@@ -0,0 +1,157 @@
+# hoshiri/memory.py
+
+import json
+import re
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from hoshiri.text import match_expression
+
+
+class MemoryIndex:
+    """Long-term memory of past sessions in a SQLite full-text index.
+
+    Turns from the session logs are split into chunks and stored in an
+    FTS5 table; `search` ranks them with BM25 (a TF-IDF weighting) through
+    the inverted index, so lookups stay in the low milliseconds however
+    many turns are stored. Each log is indexed from the byte offset where
+    the previous pass stopped, so indexing after every turn only reads
+    the new lines.
+    """
+
+    def __init__(self, path: Path, chunk_chars: int = 1200):
+        self.path = Path(path)
+        self.chunk_chars = chunk_chars
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5("
+            "text, session UNINDEXED, role UNINDEXED, timestamp UNINDEXED, "
+            "tokenize='porter unicode61')"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS sources (session TEXT PRIMARY KEY, offset INTEGER)"
+        )
+        self.db.commit()
+
+    def index_session(self, path: Path) -> int:
+        """Index the lines a session log gained since the last pass."""
+        path = Path(path)
+        session = path.stem
+        row = self.db.execute(
+            "SELECT offset FROM sources WHERE session = ?", (session,)
+        ).fetchone()
+        offset = row[0] if row else 0
+
+        rows = []
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Still being written; pick it up next time
+                    break
+                offset += len(line)
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record.get("op") == "turn":
+                    rows.extend(self._rows(session, record["entry"]))
+
+        with self.db:
+            self.db.executemany(
+                "INSERT INTO chunks (text, session, role, timestamp) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self.db.execute(
+                "INSERT OR REPLACE INTO sources (session, offset) VALUES (?, ?)",
+                (session, offset),
+            )
+        return len(rows)
+
+    def index_legacy(self, path: Path) -> int:
+        """Index a full JSON dump written by the old `save` command, once.
+
+        Raises ValueError if the file is not such a dump.
+        """
+        path = Path(path)
+        session = path.stem
+        if self.db.execute(
+            "SELECT 1 FROM sources WHERE session = ?", (session,)
+        ).fetchone():
+            return 0
+
+        with open(path, encoding="utf-8") as f:
+            history = json.load(f)
+        if not isinstance(history, list):
+            raise ValueError(f"{path.name} is not a list of messages")
+        try:
+            rows = [row for entry in history for row in self._rows(session, entry)]
+        except (AttributeError, KeyError, TypeError) as e:
+            raise ValueError(f"{path.name} has a malformed message: {e!r}") from e
+
+        with self.db:
+            self.db.executemany(
+                "INSERT INTO chunks (text, session, role, timestamp) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self.db.execute(
+                "INSERT INTO sources (session, offset) VALUES (?, ?)",
+                (session, path.stat().st_size),
+            )
+        return len(rows)
+
+    def search(
+        self, query: str, k: int = 4, exclude_session: Optional[str] = None
+    ) -> List[Dict]:
+        """Return the `k` stored chunks that best match `query`."""
+        match = match_expression(query)
+        if match is None:
+            return []
+        rows = self.db.execute(
+            "SELECT text, session, role, timestamp FROM chunks "
+            "WHERE chunks MATCH ? AND session != ? ORDER BY rank LIMIT ?",
+            (match, exclude_session or "", k),
+        ).fetchall()
+        return [
+            {"text": text, "session": session, "role": role, "timestamp": timestamp}
+            for text, session, role, timestamp in rows
+        ]
+
+    def count(self) -> int:
+        return self.db.execute("SELECT count(*) FROM chunks").fetchone()[0]
+
+    def _rows(self, session: str, entry: Dict) -> Iterator[Tuple]:
+        # Summaries only restate turns that are already indexed
+        if entry.get("summary"):
+            return
+        text = "\n\n".join(
+            block["text"] for block in entry["content"] if block["type"] == "text"
+        )
+        for chunk in self.chunks(text):
+            yield (chunk, session, entry["role"], entry.get("timestamp", ""))
+
+    def chunks(self, text: str) -> Iterator[str]:
+        """Split text into paragraph-aligned chunks of about `chunk_chars`."""
+        chunk = ""
+        for paragraph in re.split(r"\n\s*\n", text):
+            paragraph = paragraph.strip()
+            while len(paragraph) > self.chunk_chars:
+                if chunk:
+                    yield chunk
+                    chunk = ""
+                yield paragraph[: self.chunk_chars]
+                paragraph = paragraph[self.chunk_chars :]
+            if not paragraph:
+                continue
+            if chunk and len(chunk) + len(paragraph) + 2 > self.chunk_chars:
+                yield chunk
+                chunk = ""
+            chunk = f"{chunk}\n\n{paragraph}" if chunk else paragraph
+        if chunk:
+            yield chunk
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,198 @@
+# hoshiri/metrics.py
+
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+# USD per million tokens: input, output, cache write, cache read
+PRICES = {
+    "claude-3-5-sonnet": (3.00, 15.00, 3.75, 0.30),
+    "claude-3-7-sonnet": (3.00, 15.00, 3.75, 0.30),
+    "claude-3-5-haiku": (0.80, 4.00, 1.00, 0.08),
+    "claude-3-opus": (15.00, 75.00, 18.75, 1.50),
+    "claude-3-haiku": (0.25, 1.25, 0.30, 0.03),
+}
+TOKEN_KINDS = ("input", "output", "cache_write", "cache_read")
+
+
+def usage_tokens(usage) -> Dict[str, int]:
+    """Token counts of an API `usage` object, by kind."""
+    return {
+        "input": usage.input_tokens,
+        "output": usage.output_tokens,
+        "cache_write": getattr(usage, "cache_creation_input_tokens", None) or 0,
+        "cache_read": getattr(usage, "cache_read_input_tokens", None) or 0,
+    }
+
+
+def cost(model: str, tokens: Dict[str, int]) -> Optional[float]:
+    """Price of a call in USD, or None for a model without a known price."""
+    for prefix, prices in PRICES.items():
+        if model.startswith(prefix):
+            return (
+                sum(
+                    tokens.get(kind, 0) * price
+                    for kind, price in zip(TOKEN_KINDS, prices)
+                )
+                / 1_000_000
+            )
+    return None
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+class Metrics:
+    """Timing spans and token/cost counters for chat turns.
+
+    A turn is opened with `start_turn` and closed with `end_turn`; in
+    between, `span(name)` times a stage (preparing files, the API call,
+    rendering, ...) and `add` records a duration measured elsewhere, such
+    as render time summed over a stream. Repeated spans of one stage add
+    up within a turn. Each finished turn is kept in memory and, with an
+    `export_path`, appended to a JSONL file as it happens. `prometheus`
+    renders the totals in the Prometheus text format.
+    """
+
+    def __init__(
+        self, model: str, export_path: Optional[Path] = None, keep: int = 1000
+    ):
+        self.model = model
+        self.export_path = Path(export_path) if export_path else None
+        self.turns: deque = deque(maxlen=keep)
+        self.stages: Dict[str, Dict] = {}
+        self.tokens = dict.fromkeys(TOKEN_KINDS, 0)
+        self.cost = 0.0
+        self.turn_count = 0
+        self.current: Optional[Dict] = None
+        self._lock = threading.Lock()
+
+    def start_turn(self, **labels) -> Dict:
+        self.current = {
+            "timestamp": datetime.now().isoformat(),
+            "started": time.perf_counter(),
+            "spans": {},
+            "tokens": dict.fromkeys(TOKEN_KINDS, 0),
+            "cost": 0.0,
+            **labels,
+        }
+        return self.current
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            if self.current is not None:
+                spans = self.current["spans"]
+                spans[name] = spans.get(name, 0.0) + seconds
+            stage = self.stages.setdefault(
+                name, {"count": 0, "seconds": 0.0, "recent": deque(maxlen=1000)}
+            )
+            stage["count"] += 1
+            stage["seconds"] += seconds
+            stage["recent"].append(seconds)
+
+    def record_usage(self, usage, model: Optional[str] = None) -> Dict:
+        """Count the tokens and cost of one API response."""
+        tokens = usage_tokens(usage)
+        price = cost(model or self.model, tokens) or 0.0
+        with self._lock:
+            for kind, count in tokens.items():
+                self.tokens[kind] += count
+                if self.current is not None:
+                    self.current["tokens"][kind] += count
+            self.cost += price
+            if self.current is not None:
+                self.current["cost"] += price
+        return {"tokens": tokens, "cost": price}
+
+    def end_turn(self, error: Optional[str] = None) -> Optional[Dict]:
+        """Close the current turn, keep it and append it to the export file."""
+        turn, self.current = self.current, None
+        if turn is None:
+            return None
+        turn["seconds"] = time.perf_counter() - turn.pop("started")
+        turn["error"] = error
+        with self._lock:
+            self.turns.append(turn)
+            self.turn_count += 1
+        if self.export_path is not None:
+            self.export_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.export_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(turn) + "\n")
+        return turn
+
+    def summary(self) -> Dict:
+        with self._lock:
+            stages = {
+                name: {
+                    "count": stage["count"],
+                    "seconds": stage["seconds"],
+                    "p50": _percentile(stage["recent"], 0.5),
+                    "p95": _percentile(stage["recent"], 0.95),
+                }
+                for name, stage in self.stages.items()
+            }
+            return {
+                "turns": self.turn_count,
+                "stages": stages,
+                "tokens": dict(self.tokens),
+                "cost": self.cost,
+            }
+
+    def prometheus(self) -> str:
+        """Return the totals in the Prometheus text exposition format."""
+        summary = self.summary()
+        lines = [
+            "# HELP hoshiri_turns_total Chat turns completed.",
+            "# TYPE hoshiri_turns_total counter",
+            f"hoshiri_turns_total {summary['turns']}",
+            "# HELP hoshiri_stage_seconds Time spent in each stage of a turn.",
+            "# TYPE hoshiri_stage_seconds summary",
+        ]
+        for name, stage in summary["stages"].items():
+            lines += [
+                f'hoshiri_stage_seconds{{stage="{name}",quantile="0.5"}} {stage["p50"]:.6f}',
+                f'hoshiri_stage_seconds{{stage="{name}",quantile="0.95"}} {stage["p95"]:.6f}',
+                f'hoshiri_stage_seconds_sum{{stage="{name}"}} {stage["seconds"]:.6f}',
+                f'hoshiri_stage_seconds_count{{stage="{name}"}} {stage["count"]}',
+            ]
+        lines += [
+            "# HELP hoshiri_tokens_total Tokens used, by kind.",
+            "# TYPE hoshiri_tokens_total counter",
+        ]
+        for kind, count in summary["tokens"].items():
+            lines.append(f'hoshiri_tokens_total{{kind="{kind}"}} {count}')
+        lines += [
+            "# HELP hoshiri_cost_usd_total Estimated API cost in US dollars.",
+            "# TYPE hoshiri_cost_usd_total counter",
+            f"hoshiri_cost_usd_total {summary['cost']:.6f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: Path) -> Path:
+        """Write the totals as Prometheus text (.prom/.txt) or the turns as JSONL."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.suffix in (".prom", ".txt"):
+            path.write_text(self.prometheus(), encoding="utf-8")
+        else:
+            with self._lock:
+                turns = list(self.turns)
+            with open(path, "w", encoding="utf-8") as f:
+                for turn in turns:
+                    f.write(json.dumps(turn) + "\n")
+        return path
@@ -0,0 +1,159 @@
+# hoshiri/mockapi.py
+
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+REPLY = (
+    "Here is a short answer with some **Markdown** in it.\n\n"
+    "- one point\n- another point\n\n"
+    "```python\nprint('hello')\n```\n"
+)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; with Nagle on, every
+    # reply would stall ~40 ms on the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        server = self.server.mock
+        request = json.loads(body)
+        server.record(len(body))
+
+        time.sleep(server.latency)
+        text = server.reply
+        usage = {
+            # Roughly what the API would count for a request this size
+            "input_tokens": max(len(body) // 4, 1),
+            "output_tokens": max(len(text) // 4, 1),
+        }
+        message = {
+            "id": f"msg_{uuid.uuid4().hex[:12]}",
+            "type": "message",
+            "role": "assistant",
+            "model": request.get("model", "mock"),
+            "content": [],
+            "stop_reason": None,
+            "stop_sequence": None,
+            "usage": {"input_tokens": usage["input_tokens"], "output_tokens": 1},
+        }
+
+        if not request.get("stream"):
+            message.update(
+                content=[{"type": "text", "text": text}],
+                stop_reason="end_turn",
+                usage=usage,
+            )
+            payload = json.dumps(message).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self._event("message_start", {"type": "message_start", "message": message})
+        self._event(
+            "content_block_start",
+            {
+                "type": "content_block_start",
+                "index": 0,
+                "content_block": {"type": "text", "text": ""},
+            },
+        )
+        for piece in server.pieces(text):
+            time.sleep(server.chunk_delay)
+            self._event(
+                "content_block_delta",
+                {
+                    "type": "content_block_delta",
+                    "index": 0,
+                    "delta": {"type": "text_delta", "text": piece},
+                },
+            )
+        self._event("content_block_stop", {"type": "content_block_stop", "index": 0})
+        self._event(
+            "message_delta",
+            {
+                "type": "message_delta",
+                "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                "usage": {"output_tokens": usage["output_tokens"]},
+            },
+        )
+        self._event("message_stop", {"type": "message_stop"})
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _event(self, name: str, data: Dict):
+        chunk = f"event: {name}\ndata: {json.dumps(data)}\n\n".encode()
+        self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+
+class MockApi:
+    """Local stand-in for the Messages API, for benchmarks and tests.
+
+    Answers every POST with `reply` after `latency` seconds. Streaming
+    requests get proper server-sent events, with the reply split into
+    `chunks` deltas sent `chunk_delay` seconds apart. Point `base_url` (or
+    ANTHROPIC_BASE_URL) at `url` to use it.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        chunks: int = 20,
+        chunk_delay: float = 0.0,
+        reply: str = REPLY,
+    ):
+        self.latency = latency
+        self.chunks = chunks
+        self.chunk_delay = chunk_delay
+        self.reply = reply
+        self.requests = 0
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.mock = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def record(self, size: int):
+        with self._lock:
+            self.requests += 1
+            self.bytes_received += size
+
+    def pieces(self, text: str) -> List[str]:
+        size = max(len(text) // max(self.chunks, 1), 1)
+        return [text[i : i + size] for i in range(0, len(text), size)]
+
+    def start(self) -> "MockApi":
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "MockApi":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,333 @@
+# hoshiri/pipeline.py
+
+import asyncio
+import hashlib
+import json
+import os
+import queue
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+PLAN_PROMPT = """Break the request below into steps that call the available modules.
+
+Available modules:
+{modules}
+
+Request: {request}
+
+Reply with a JSON list in a single ```json block. Each step is an object with
+"id" (short and unique), "module" (one of the names above), "command" (the text
+passed to the module) and "after" (the ids of the steps whose output it reads).
+Steps that do not depend on each other will run in parallel. Add
+"volatile": true to steps whose output changes between runs, such as fetching
+mail or calling an API."""
+
+_DONE = object()
+
+
+class StepError(Exception):
+    """Raised in a step whose upstream step failed."""
+
+
+class StepCache:
+    """Outputs of finished steps, one JSON file per step key."""
+
+    def __init__(self, root: Path = Path("data/steps")):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def get(self, key: str) -> Optional[List]:
+        path = self.root / f"{key}.json"
+        if not path.exists():
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def put(self, key: str, items: List):
+        try:
+            data = json.dumps(items)
+        except (TypeError, ValueError):
+            # Not JSON data; the step simply runs again next time
+            return
+        fd, tmp_name = tempfile.mkstemp(dir=self.root, prefix=".step-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_name, self.root / f"{key}.json")
+
+
+class _Channel:
+    """Fans the items of one step out to each of its consumers.
+
+    The queues are unbounded on purpose: with bounded ones, a consumer that
+    drains one input before the other can deadlock a diamond-shaped plan.
+    """
+
+    def __init__(self, consumers: int):
+        self.queues = [queue.Queue() for _ in range(consumers)]
+
+    def put(self, item):
+        for q in self.queues:
+            q.put(item)
+
+    @staticmethod
+    def read(q: queue.Queue) -> Iterator:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                return
+            if isinstance(item, StepError):
+                raise item
+            yield item
+
+
+class Pipeline:
+    """Runs a DAG of steps, streaming items from each step to the next.
+
+    A step is a dict with an `id`, the ids it reads from in `after`, and
+    whatever the `run` callable needs (for modules: `module` and `command`).
+    `run(step, inputs)` gets one iterator per upstream step and returns an
+    iterable of output items, so a downstream step starts on the first
+    item while its upstream is still producing. Every step runs in its own
+    thread, so independent branches run in parallel and the whole run is
+    bounded by the critical path.
+
+    With a `cache`, each step gets a key hashed from its definition, the
+    fingerprint of its code and the keys of its upstream steps. A re-run
+    replays cached outputs, and skips upstream steps nobody needs any
+    more. Steps marked `volatile` and everything downstream of them always
+    run.
+    """
+
+    def __init__(
+        self,
+        steps: List[Dict],
+        run: Callable[[Dict, Dict[str, Iterator]], Iterable],
+        cache: Optional[StepCache] = None,
+    ):
+        self.steps = {step["id"]: step for step in steps}
+        if len(self.steps) != len(steps):
+            raise ValueError("Step ids must be unique")
+        self.run_step = run
+        self.cache = cache
+        self.order = self._topological_order()
+        self.consumers = {step_id: [] for step_id in self.steps}
+        for step in steps:
+            for dep in step.get("after", []):
+                self.consumers[dep].append(step["id"])
+        self.stats = {"ran": [], "cached": [], "skipped": []}
+
+    def _topological_order(self) -> List[str]:
+        for step in self.steps.values():
+            for dep in step.get("after", []):
+                if dep not in self.steps:
+                    raise ValueError(f"Step {step['id']} depends on unknown step {dep}")
+
+        order, visiting, done = [], set(), set()
+
+        def visit(step_id: str):
+            if step_id in done:
+                return
+            if step_id in visiting:
+                raise ValueError(f"Steps form a cycle through {step_id}")
+            visiting.add(step_id)
+            for dep in self.steps[step_id].get("after", []):
+                visit(dep)
+            visiting.discard(step_id)
+            done.add(step_id)
+            order.append(step_id)
+
+        for step_id in self.steps:
+            visit(step_id)
+        return order
+
+    def keys(self) -> Dict[str, Optional[str]]:
+        """Return the cache key of every step; None for steps that always run."""
+        fingerprint = getattr(self.run_step, "fingerprint", None)
+        keys: Dict[str, Optional[str]] = {}
+        for step_id in self.order:
+            step = self.steps[step_id]
+            deps = [keys[dep] for dep in step.get("after", [])]
+            if step.get("volatile") or None in deps:
+                keys[step_id] = None
+                continue
+            definition = {k: v for k, v in step.items() if k != "after"}
+            material = json.dumps(
+                {
+                    "step": definition,
+                    "code": fingerprint(step) if fingerprint else None,
+                    "after": deps,
+                },
+                sort_keys=True,
+            )
+            keys[step_id] = hashlib.sha256(material.encode()).hexdigest()
+        return keys
+
+    async def run(self) -> Dict[str, List]:
+        """Run the plan and return the items of every final step."""
+        keys = self.keys() if self.cache else {step_id: None for step_id in self.steps}
+        cached = {
+            step_id: self.cache.get(key)
+            for step_id, key in keys.items()
+            if key is not None
+        }
+        cached = {
+            step_id: items for step_id, items in cached.items() if items is not None
+        }
+
+        # Walk back from the final steps to find what has to produce items
+        needed = set()
+        for step_id in reversed(self.order):
+            consumers = self.consumers[step_id]
+            if not consumers or any(c in needed and c not in cached for c in consumers):
+                needed.add(step_id)
+
+        channels = {}
+        inbox: Dict[str, Dict[str, queue.Queue]] = {step_id: {} for step_id in needed}
+        for step_id in needed:
+            readers = [c for c in self.consumers[step_id] if c in needed]
+            channels[step_id] = _Channel(len(readers))
+            for reader, q in zip(readers, channels[step_id].queues):
+                inbox[reader][step_id] = q
+
+        results: Dict[str, List] = {}
+        loop = asyncio.get_running_loop()
+        # One thread per step: a step blocked on its inputs must never keep
+        # its upstream from getting a thread
+        with ThreadPoolExecutor(max_workers=max(len(needed), 1)) as pool:
+            await asyncio.gather(
+                *(
+                    loop.run_in_executor(
+                        pool,
+                        self._produce,
+                        step_id,
+                        inbox[step_id],
+                        channels[step_id],
+                        keys[step_id],
+                        cached.get(step_id),
+                        results,
+                    )
+                    for step_id in needed
+                )
+            )
+        self.stats["skipped"] = [s for s in self.order if s not in needed]
+
+        # Report the failure furthest upstream; the others are its echoes
+        for step_id in self.order:
+            error = results.get(step_id)
+            if isinstance(error, Exception):
+                raise RuntimeError(f"Step {step_id} failed: {error}") from error
+        return results
+
+    def _produce(
+        self,
+        step_id: str,
+        inbox: Dict[str, queue.Queue],
+        channel: _Channel,
+        key: Optional[str],
+        replay: Optional[List],
+        results: Dict[str, List],
+    ):
+        step = self.steps[step_id]
+        sink = not self.consumers[step_id]
+        items: List = []
+        try:
+            if replay is not None:
+                self.stats["cached"].append(step_id)
+                source = iter(replay)
+            else:
+                self.stats["ran"].append(step_id)
+                inputs = {dep: _Channel.read(q) for dep, q in inbox.items()}
+                source = iter(self.run_step(step, inputs))
+            for item in source:
+                items.append(item)
+                channel.put(item)
+        except Exception as e:
+            results[step_id] = e
+            channel.put(StepError(f"upstream step {step_id} failed: {e}"))
+            return
+
+        channel.put(_DONE)
+        if key is not None and replay is None:
+            self.cache.put(key, items)
+        if sink:
+            results[step_id] = items
+
+
+class ModuleRunner:
+    """Runs pipeline steps by calling registered modules on the Executor.
+
+    Modules are looked up in the module `Registry` and run in the
+    executor's worker processes, so a step that hangs is killed after
+    `timeout` seconds instead of holding up the whole run. A module can
+    define `run_step(command, inputs)`, which gets one iterator per
+    upstream step and may be a generator, or a plain `run_command(command)`,
+    whose return value becomes the step's only item. A step collects its
+    upstream items before it takes a worker, so steps waiting on their
+    inputs never hold one.
+    """
+
+    def __init__(self, registry, executor, timeout: Optional[float] = None):
+        self.registry = registry
+        self.executor = executor
+        self.timeout = timeout
+
+    def _path(self, step: Dict) -> Path:
+        module_info = self.registry.get(step["module"])
+        if module_info is None:
+            raise KeyError(f"No module named {step['module']}")
+        return Path(module_info["file_path"])
+
+    def fingerprint(self, step: Dict) -> str:
+        return hashlib.sha256(self._path(step).read_bytes()).hexdigest()
+
+    def __call__(self, step: Dict, inputs: Dict[str, Iterator]) -> Iterable:
+        path = self._path(step)
+        items = {step_id: list(upstream) for step_id, upstream in inputs.items()}
+        reply = self.executor.run(
+            path, step.get("command", ""), timeout=self.timeout, inputs=items
+        )
+        if not reply["ok"]:
+            raise RuntimeError(reply["error"])
+        return reply["result"]
+
+
+def extract_plan(text: str) -> List[Dict]:
+    """Parse the JSON step list out of a planner reply."""
+    match = re.search(r"```(?:json)?\s*\n(.*?)```", text, re.DOTALL)
+    steps = json.loads(match.group(1) if match else text)
+    if not isinstance(steps, list):
+        raise ValueError("The plan is not a list of steps")
+    for number, step in enumerate(steps, 1):
+        if not isinstance(step, dict):
+            raise ValueError(f"Step {number} of the plan is not an object")
+        for key in ("id", "module"):
+            if not isinstance(step.get(key), str):
+                raise ValueError(f"Step {number} of the plan has no {key}")
+        step.setdefault("after", [])
+        if not isinstance(step["after"], list) or not all(
+            isinstance(dep, str) for dep in step["after"]
+        ):
+            raise ValueError(f"Step {step['id']} has an invalid 'after' list")
+    return steps
+
+
+async def plan(engine, request: str, modules: List[Dict]) -> List[Dict]:
+    """Ask the model to turn a request into a list of steps over `modules`."""
+    listing = "\n".join(f"- {m['name']}: {m['description']}" for m in modules)
+    response = await engine.ask(
+        [
+            {
+                "role": "user",
+                "content": PLAN_PROMPT.format(modules=listing, request=request),
+            }
+        ]
+    )
+    steps = extract_plan(response.content[0].text)
+    known = {m["name"] for m in modules}
+    for step in steps:
+        if step.get("module") not in known:
+            raise ValueError(f"The plan uses an unknown module: {step.get('module')}")
+    return steps
@@ -0,0 +1,198 @@
+# hoshiri/registry.py
+
+import json
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from hoshiri.text import match_expression, stem, terms
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS modules (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    description TEXT NOT NULL DEFAULT '',
+    file_path TEXT NOT NULL,
+    created TEXT NOT NULL,
+    uses INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS module_tags (
+    tag TEXT NOT NULL,
+    module_id INTEGER NOT NULL REFERENCES modules(id) ON DELETE CASCADE,
+    PRIMARY KEY (tag, module_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS module_tags_by_module ON module_tags(module_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS module_text USING fts5(
+    name, description, tags, tokenize='porter unicode61'
+);
+"""
+# bm25 column weights for name, description and tags
+RANK = "bm25(module_text, 10.0, 1.0, 5.0)"
+
+
+class Registry:
+    """SQLite-backed registry of generated modules.
+
+    Names are unique and indexed, tags live in their own indexed table and
+    name, description and tags are mirrored into an FTS5 table, so
+    `find_compatible_module` is a couple of index lookups rather than a
+    scan. Every write is one small transaction; nothing is ever rewritten
+    wholesale. Modules from a v2 `registry.json` are imported on first use.
+    """
+
+    def __init__(
+        self,
+        registry_path: Path = Path("data/registry.sqlite3"),
+        legacy_path: Optional[Path] = Path("data/registry.json"),
+        min_overlap: float = 0.6,
+    ):
+        self.path = Path(registry_path)
+        self.min_overlap = min_overlap
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA foreign_keys=ON")
+        self.db.executescript(SCHEMA)
+
+        if legacy_path is not None and Path(legacy_path).exists() and not len(self):
+            self._import_json(Path(legacy_path))
+
+    def __len__(self) -> int:
+        return self.db.execute("SELECT count(*) FROM modules").fetchone()[0]
+
+    @property
+    def modules(self) -> List[Dict]:
+        rows = self.db.execute("SELECT * FROM modules ORDER BY id").fetchall()
+        return [self._info(row) for row in rows]
+
+    def add_module(self, module_info: Dict) -> Dict:
+        """Insert a module, or replace the one with the same name."""
+        name = module_info["name"]
+        description = module_info.get("description", "")
+        tags = sorted({tag.lower() for tag in module_info.get("tags", [])})
+
+        with self.db:
+            row = self.db.execute(
+                "INSERT INTO modules (name, description, file_path, created) "
+                "VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET description = excluded.description, "
+                "file_path = excluded.file_path, created = excluded.created "
+                "RETURNING id",
+                (
+                    name,
+                    description,
+                    str(module_info["file_path"]),
+                    module_info.get("created") or datetime.now().isoformat(),
+                ),
+            ).fetchone()
+            module_id = row["id"]
+            self.db.execute("DELETE FROM module_tags WHERE module_id = ?", (module_id,))
+            self.db.executemany(
+                "INSERT INTO module_tags (tag, module_id) VALUES (?, ?)",
+                [(tag, module_id) for tag in tags],
+            )
+            self.db.execute("DELETE FROM module_text WHERE rowid = ?", (module_id,))
+            self.db.execute(
+                "INSERT INTO module_text (rowid, name, description, tags) "
+                "VALUES (?, ?, ?, ?)",
+                (module_id, name.replace("_", " "), description, " ".join(tags)),
+            )
+        return self.get(name)
+
+    def remove_module(self, name: str):
+        with self.db:
+            row = self.db.execute(
+                "DELETE FROM modules WHERE name = ? RETURNING id", (name,)
+            ).fetchone()
+            if row is not None:
+                self.db.execute("DELETE FROM module_text WHERE rowid = ?", (row["id"],))
+
+    def get(self, name: str) -> Optional[Dict]:
+        row = self.db.execute("SELECT * FROM modules WHERE name = ?", (name,)).fetchone()
+        return self._info(row) if row else None
+
+    def with_tags(self, tags: List[str]) -> List[Dict]:
+        """Return the modules that carry every one of `tags`."""
+        tags = sorted({tag.lower() for tag in tags})
+        if not tags:
+            return []
+        rows = self.db.execute(
+            "SELECT modules.* FROM modules JOIN module_tags "
+            "ON module_tags.module_id = modules.id "
+            f"WHERE module_tags.tag IN ({', '.join('?' * len(tags))}) "
+            "GROUP BY modules.id HAVING count(*) = ? ORDER BY modules.uses DESC",
+            (*tags, len(tags)),
+        ).fetchall()
+        return [self._info(row) for row in rows]
+
+    def find_compatible_module(self, interpretation: Dict) -> Optional[Dict]:
+        """Match an interpreted command to an existing module, or return None.
+
+        An exact `module_name` wins. Otherwise the command, description and
+        tags are ranked against the full-text index, and the best module is
+        returned only if it covers at least `min_overlap` of the query words.
+        """
+        name = interpretation.get("module_name")
+        if name:
+            module = self.get(name)
+            if module is not None:
+                return module
+
+        query = " ".join(
+            [
+                interpretation.get("command", ""),
+                interpretation.get("description", ""),
+                " ".join(interpretation.get("tags", [])),
+            ]
+        )
+        match = match_expression(query)
+        if match is None:
+            return None
+
+        rows = self.db.execute(
+            "SELECT modules.* FROM module_text JOIN modules "
+            "ON modules.id = module_text.rowid "
+            f"WHERE module_text MATCH ? ORDER BY {RANK} LIMIT 5",
+            (match,),
+        ).fetchall()
+
+        wanted = {stem(word) for word in terms(query)}
+        for row in rows:
+            module = self._info(row)
+            text = " ".join([module["name"], module["description"], *module["tags"]])
+            have = {stem(word) for word in terms(text.replace("_", " "))}
+            if len(wanted & have) >= self.min_overlap * len(wanted):
+                return module
+        return None
+
+    def record_use(self, name: str):
+        with self.db:
+            self.db.execute("UPDATE modules SET uses = uses + 1 WHERE name = ?", (name,))
+
+    def _info(self, row: sqlite3.Row) -> Dict:
+        tags = [
+            tag
+            for (tag,) in self.db.execute(
+                "SELECT tag FROM module_tags WHERE module_id = ? ORDER BY tag",
+                (row["id"],),
+            )
+        ]
+        return {
+            "name": row["name"],
+            "description": row["description"],
+            "file_path": row["file_path"],
+            "tags": tags,
+            "created": row["created"],
+            "uses": row["uses"],
+        }
+
+    def _import_json(self, path: Path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        for module_info in data.get("modules", []):
+            self.add_module(module_info)
+
+    def close(self):
+        self.db.close()
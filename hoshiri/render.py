@@ -0,0 +1,200 @@
+# hoshiri/render.py
+
+import re
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from rich.console import Console, ConsoleOptions, RenderResult
+from rich.markdown import Markdown
+from rich.segment import Segment
+
+FENCE = re.compile(r" {0,3}(`{3,}|~{3,})")
+HEADING = re.compile(r" {0,3}#{1,6}(\s|$)")
+LIST_ITEM = re.compile(r" {0,3}([-*+]|\d{1,9}[.)])(\s|$)")
+INDENTED = re.compile(r"( {4}|\t)")
+# A fence inside a list item is indented to the item's content
+NESTED_FENCE = re.compile(r"[ \t]+(`{3,}|~{3,})")
+
+
+class IncrementalMarkdown:
+    """Markdown renderable for a reply that is still arriving.
+
+    Text is split into blocks as it is fed: a paragraph ends at a blank
+    line, a heading is a block of its own, and a fenced code block ends at
+    its closing fence (blank lines inside it don't count). A list or an
+    indented code block carries on past blank lines while the next line is
+    indented or, for a list, is another item, so loose lists and code
+    fences inside list items stay in the list. Each finished block is
+    parsed and rendered once and its lines are cached per width, so a
+    refresh only re-renders the open block at the end. That trailing
+    block is re-rendered at most every `min_interval` seconds while it
+    grows; in between, the last rendering is shown. `finish` closes
+    everything so the final frame is exact.
+
+    Feeding and rendering may happen on different threads (the engine
+    streams while `rich.live.Live` refreshes); both take a lock.
+    """
+
+    def __init__(self, text: str = "", min_interval: float = 0.1, **markdown):
+        self.min_interval = min_interval
+        self.markdown = markdown
+        self.blocks: List[str] = []
+        self.final = False
+        self.stats = {"block_renders": 0, "tail_renders": 0, "stale": 0, "seconds": 0.0}
+
+        self._lines: List[Optional[List[Segment]]] = []
+        self._width: Optional[int] = None
+        self._open = ""
+        # "list", "code" (indented) or "text": what the open block is
+        self._kind: Optional[str] = None
+        # Blank lines after a list or indented code, held until the next
+        # line shows whether the block goes on
+        self._blank = ""
+        self._partial = ""
+        self._fence: Optional[str] = None
+        self._lock = threading.Lock()
+        # (source, width, segments, time) of the last trailing-block render
+        self._tail: Tuple[str, Optional[int], List[Segment], float] = (
+            "",
+            None,
+            [],
+            0.0,
+        )
+        if text:
+            self.feed(text)
+
+    def feed(self, text: str):
+        """Add streamed text; complete lines are sorted into blocks."""
+        with self._lock:
+            *lines, self._partial = (self._partial + text).split("\n")
+            for line in lines:
+                self._line(line + "\n")
+
+    def finish(self):
+        """Mark the reply complete, closing any open block or fence."""
+        with self._lock:
+            self._open += self._partial
+            self._partial = ""
+            self._fence = None
+            self._close()
+            self.final = True
+
+    def _line(self, line: str):
+        if self._fence is not None:
+            self._open += line
+            if line.strip().startswith(self._fence) and not line.strip().strip(
+                self._fence[0]
+            ):
+                self._fence = None
+                if self._kind != "list":
+                    self._close()
+            return
+
+        if not line.strip():
+            if self._kind in ("list", "code"):
+                self._blank += line
+            else:
+                self._close()
+            return
+        if self._blank:
+            if self._continues(line):
+                self._open += self._blank
+                self._blank = ""
+            else:
+                self._close()
+
+        nested = self._kind == "list" and NESTED_FENCE.match(line)
+        fence = FENCE.match(line)
+        if nested:
+            self._fence = nested.group(1)
+            self._open += line
+        elif fence:
+            self._close()
+            self._fence = fence.group(1)
+            self._open = line
+        elif HEADING.match(line):
+            self._close()
+            self._open = line
+            self._close()
+        else:
+            if LIST_ITEM.match(line) and self._kind != "code":
+                self._kind = "list"
+            elif not self._open:
+                self._kind = "code" if INDENTED.match(line) else "text"
+            self._open += line
+
+    def _continues(self, line: str) -> bool:
+        """Whether `line`, after blank lines, still belongs to the open block."""
+        if self._kind == "list":
+            return line[0] in " \t" or bool(LIST_ITEM.match(line))
+        return bool(INDENTED.match(line))
+
+    def _close(self):
+        if self._open.strip():
+            self.blocks.append(self._open)
+            self._lines.append(None)
+        self._open = ""
+        self._kind = None
+        self._blank = ""
+
+    def _render(self, source: str, console: Console, options: ConsoleOptions):
+        segments = list(
+            console.render(
+                Markdown(source, **self.markdown), options.update(height=None)
+            )
+        )
+        # Lists open with a blank line of their own; blocks get exactly one
+        while segments and segments[0].text == "\n":
+            segments.pop(0)
+        return segments
+
+    def __rich_console__(
+        self, console: Console, options: ConsoleOptions
+    ) -> RenderResult:
+        with self._lock:
+            segments = self._segments(console, options)
+        yield from segments
+
+    def _segments(self, console: Console, options: ConsoleOptions) -> List[Segment]:
+        started = time.perf_counter()
+        if options.max_width != self._width:
+            self._width = options.max_width
+            self._lines = [None] * len(self.blocks)
+
+        segments: List[Segment] = []
+        for i, source in enumerate(self.blocks):
+            if self._lines[i] is None:
+                self._lines[i] = self._render(source, console, options)
+                self.stats["block_renders"] += 1
+            if i:
+                segments.append(Segment.line())
+            segments.extend(self._lines[i])
+
+        tail = self._open + self._blank + self._partial
+        if tail.strip():
+            source, width, cached, rendered_at = self._tail
+            now = time.monotonic()
+            fresh = source == tail and width == self._width
+            # Only a grown version of the same block may be shown stale
+            may_lag = (
+                source
+                and tail.startswith(source)
+                and width == self._width
+                and not self.final
+                and now - rendered_at < self.min_interval
+            )
+            if fresh:
+                pass
+            elif may_lag:
+                self.stats["stale"] += 1
+            else:
+                cached = self._render(tail, console, options)
+                self._tail = (tail, self._width, cached, now)
+                self.stats["tail_renders"] += 1
+            if self.blocks:
+                segments.append(Segment.line())
+            segments.extend(cached)
+
+        self.stats["seconds"] += time.perf_counter() - started
+        return segments
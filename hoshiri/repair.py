@@ -0,0 +1,161 @@
+# hoshiri/repair.py
+
+import asyncio
+import re
+import time
+from typing import Dict, List, Optional
+
+REPAIR_PROMPT = """This Python script failed when it was run.
+
+Script:
+```python
+{code}
+```
+
+Error:
+{error}
+
+Reply with the complete corrected script in a single ```python block. Keep the
+`run_command(command)` entry point if the script has one."""
+
+CODE_BLOCK = re.compile(r"```(?:python|py)?\s*\n(.*?)```", re.DOTALL)
+
+
+def extract_code(text: str) -> str:
+    """Return the first fenced code block of a reply, or the whole reply."""
+    match = CODE_BLOCK.search(text)
+    return (match.group(1) if match else text).strip() + "\n"
+
+
+class RepairEngine:
+    """Repairs failing generated code with parallel candidate fixes.
+
+    Each round asks the model for `candidates` fixes at once and runs each
+    one in the executor's sandboxed workers as soon as it arrives. The
+    first candidate that runs cleanly wins and the rest are cancelled. If
+    none pass, the next round starts from the last failure. The loop stops
+    at the first success, after `max_attempts` candidates in total, or at
+    the `deadline`, whichever comes first.
+
+    A failed model call uses up its attempt. The last such error is kept
+    as `api_error`, and if every call of a round fails it is raised, since
+    further rounds would fail the same way. Cancelling a candidate cannot
+    stop a run already in a worker thread, so each run's timeout is cut
+    to the time left before the deadline; leftover runs end by then.
+    """
+
+    def __init__(
+        self,
+        engine,
+        executor,
+        candidates: int = 3,
+        max_attempts: int = 9,
+        deadline: float = 120.0,
+        temperature: float = 0.8,
+    ):
+        self.engine = engine
+        self.executor = executor
+        self.candidates = candidates
+        self.max_attempts = max_attempts
+        self.deadline = deadline
+        self.temperature = temperature
+
+    async def repair(self, code: str, error: str, command: str = "") -> Dict:
+        """Return the first fix that runs, or the last failure.
+
+        The result has `ok`, the winning `code` and its `result` (or the
+        last `error`), plus the number of `attempts` and the `seconds` spent,
+        and `api_error` if a model call failed. Raises the model's error if
+        every call of a round failed.
+        """
+        started = time.monotonic()
+        ends = started + self.deadline
+        outcome = {"ok": False, "error": error, "code": code, "attempts": 0}
+
+        try:
+            async with asyncio.timeout(self.deadline):
+                while outcome["attempts"] < self.max_attempts:
+                    left = self.max_attempts - outcome["attempts"]
+                    count = min(self.candidates, left)
+                    outcome["attempts"] += count
+                    failures: List[Dict] = []
+                    errors: List[Exception] = []
+                    winner = await self._round(
+                        outcome["code"],
+                        outcome["error"],
+                        command,
+                        count,
+                        ends,
+                        failures,
+                        errors,
+                    )
+                    if errors:
+                        outcome["api_error"] = str(errors[-1])
+                    if winner is not None:
+                        outcome.update(winner)
+                        break
+                    if len(errors) == count:
+                        raise errors[-1]
+                    if failures:
+                        # Build the next round on the last candidate that got to run
+                        outcome.update(failures[-1])
+        except TimeoutError:
+            outcome["error"] = f"Gave up after {self.deadline:g}s: {outcome['error']}"
+
+        outcome["seconds"] = time.monotonic() - started
+        return outcome
+
+    async def _round(
+        self,
+        code: str,
+        error: str,
+        command: str,
+        count: int,
+        ends: float,
+        failures: List[Dict],
+        errors: List[Exception],
+    ) -> Optional[Dict]:
+        tasks = [
+            asyncio.create_task(self._candidate(code, error, command, ends))
+            for _ in range(count)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    result = await next_done
+                except Exception as e:
+                    # The model call itself failed; there is no fix to learn from
+                    errors.append(e)
+                    continue
+                if result["ok"]:
+                    return result
+                failures.append(result)
+        finally:
+            for task in tasks:
+                task.cancel()
+        return None
+
+    async def _candidate(
+        self, code: str, error: str, command: str, ends: float
+    ) -> Dict:
+        response = await self.engine.ask(
+            [
+                {
+                    "role": "user",
+                    "content": REPAIR_PROMPT.format(code=code.strip(), error=error),
+                }
+            ],
+            temperature=self.temperature,
+        )
+        fixed = extract_code(response.content[0].text)
+        timeout = min(self.executor.timeout, max(ends - time.monotonic(), 0.0))
+        reply = await asyncio.to_thread(
+            self.executor.run, code=fixed, command=command, timeout=timeout
+        )
+        return {
+            "ok": reply["ok"],
+            "code": fixed,
+            "result": reply.get("result"),
+            "error": reply.get("error"),
+            "stdout": reply["stdout"],
+        }
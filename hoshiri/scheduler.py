@@ -0,0 +1,304 @@
+# hoshiri/scheduler.py
+
+import json
+import logging
+import random
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    trigger TEXT NOT NULL,
+    target TEXT NOT NULL,
+    next_run REAL NOT NULL,
+    jitter REAL NOT NULL DEFAULT 0,
+    max_instances INTEGER NOT NULL DEFAULT 1,
+    runs INTEGER NOT NULL DEFAULT 0,
+    missed INTEGER NOT NULL DEFAULT 0,
+    last_run REAL,
+    last_status TEXT,
+    last_result TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_by_next_run ON jobs(next_run);
+"""
+# After a failed pass, wait this long before trying again
+RETRY_SECONDS = 5.0
+CRON_FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+INTERVAL_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+log = logging.getLogger(__name__)
+
+
+class CronTrigger:
+    """Five-field cron expression: minute hour day-of-month month day-of-week.
+
+    Fields take `*`, numbers, ranges `a-b`, lists `a,b` and steps `*/n` or
+    `a-b/n`. Day of week counts from Sunday = 0 (7 is Sunday too). As in
+    cron, when both day fields are restricted a day matching either runs.
+    """
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression!r}")
+        self.expression = expression
+        parsed = [self._field(f, lo, hi) for f, (lo, hi) in zip(fields, CRON_FIELDS)]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = {day % 7 for day in weekdays}
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    @staticmethod
+    def _field(field: str, lo: int, hi: int) -> Set[int]:
+        values = set()
+        for part in field.split(","):
+            match = re.fullmatch(r"(\*|\d+(?:-\d+)?)(?:/(\d+))?", part)
+            if not match:
+                raise ValueError(f"Bad cron field: {field!r}")
+            span, step = match.group(1), int(match.group(2) or 1)
+            if span == "*":
+                start, end = lo, hi
+            elif "-" in span:
+                start, end = map(int, span.split("-"))
+            else:
+                start = end = int(span)
+                if match.group(2):
+                    end = hi
+            if start < lo or end > hi or start > end or step < 1:
+                raise ValueError(f"Cron field out of range: {field!r}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, t: datetime) -> bool:
+        in_month = t.day in self.days
+        in_week = (t.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return in_month and in_week
+        return in_month or in_week
+
+    def next_after(self, after: float) -> float:
+        t = datetime.fromtimestamp(after).replace(second=0, microsecond=0)
+        t += timedelta(minutes=1)
+        limit = t + timedelta(days=5 * 366)
+        while t < limit:
+            if t.month not in self.months:
+                t = (t.replace(day=1) + timedelta(days=32)).replace(
+                    day=1, hour=0, minute=0
+                )
+            elif not self._day_matches(t):
+                t = (t + timedelta(days=1)).replace(hour=0, minute=0)
+            elif t.hour not in self.hours:
+                t = (t + timedelta(hours=1)).replace(minute=0)
+            elif t.minute not in self.minutes:
+                t += timedelta(minutes=1)
+            else:
+                return t.timestamp()
+        raise ValueError(f"Cron expression never fires: {self.expression!r}")
+
+
+class IntervalTrigger:
+    def __init__(self, seconds: float):
+        if seconds <= 0:
+            raise ValueError("Interval must be positive")
+        self.seconds = seconds
+
+    def next_after(self, after: float) -> float:
+        return after + self.seconds
+
+
+def parse_trigger(spec: str):
+    """Build a trigger from `cron:<expression>` or `every:<n><s|m|h|d>`."""
+    kind, _, value = spec.partition(":")
+    if kind == "cron":
+        return CronTrigger(value)
+    if kind == "every":
+        match = re.fullmatch(r"(\d+(?:\.\d+)?)([smhd]?)", value.strip())
+        if not match:
+            raise ValueError(f"Bad interval: {value!r}")
+        return IntervalTrigger(
+            float(match.group(1)) * INTERVAL_UNITS[match.group(2) or "s"]
+        )
+    raise ValueError(f"Unknown trigger: {spec!r}")
+
+
+class Scheduler:
+    """Runs recurring jobs from a persistent SQLite job store.
+
+    A background thread sleeps until the next job is due (or a job is
+    added) and hands due jobs to a thread pool, so jobs run while the REPL
+    waits for input. Missed runs are coalesced: a job that was due several
+    times while Hoshiri was closed runs once and is rescheduled from now.
+    Each job can add random `jitter` seconds to its run times and has a
+    `max_instances` cap; a run that would exceed it is counted as missed.
+
+    Jobs are executed by the `run` callable, which gets the job's target
+    dict and returns a result that is stored as text.
+    """
+
+    def __init__(
+        self,
+        run: Callable[[Dict], object],
+        path: Path = Path("data/jobs.sqlite3"),
+        workers: int = 2,
+        on_finish: Optional[Callable[[Dict], None]] = None,
+    ):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        self.run_job = run
+        self.on_finish = on_finish
+
+        self._lock = threading.Lock()
+        self._running: Dict[str, int] = {}
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(
+        self,
+        trigger: str,
+        target: Dict,
+        jitter: float = 0.0,
+        max_instances: int = 1,
+    ) -> str:
+        """Store a job and return its id. `trigger` is a `parse_trigger` spec."""
+        next_run = parse_trigger(trigger).next_after(time.time())
+        job_id = uuid.uuid4().hex[:8]
+        with self._lock, self.db:
+            self.db.execute(
+                "INSERT INTO jobs (id, trigger, target, next_run, jitter, max_instances) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    job_id,
+                    trigger,
+                    json.dumps(target),
+                    next_run + random.uniform(0, jitter),
+                    jitter,
+                    max_instances,
+                ),
+            )
+        self._wake.set()
+        return job_id
+
+    def remove(self, job_id: str) -> bool:
+        with self._lock, self.db:
+            cursor = self.db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        return cursor.rowcount > 0
+
+    def jobs(self) -> List[Dict]:
+        with self._lock:
+            rows = self.db.execute("SELECT * FROM jobs ORDER BY next_run").fetchall()
+        jobs = []
+        for row in rows:
+            job = dict(row)
+            job["target"] = json.loads(job["target"])
+            job["running"] = self._running.get(job["id"], 0)
+            jobs.append(job)
+        return jobs
+
+    def run_pending(self, now: Optional[float] = None) -> List[str]:
+        """Submit every due job once and reschedule it; return the submitted ids."""
+        now = time.time() if now is None else now
+        submitted = []
+        with self._lock, self.db:
+            rows = self.db.execute(
+                "SELECT * FROM jobs WHERE next_run <= ?", (now,)
+            ).fetchall()
+            for row in rows:
+                trigger = parse_trigger(row["trigger"])
+                # Coalesce: however many runs were missed, schedule from now
+                next_run = trigger.next_after(now) + random.uniform(0, row["jitter"])
+                if self._running.get(row["id"], 0) >= row["max_instances"]:
+                    self.db.execute(
+                        "UPDATE jobs SET next_run = ?, missed = missed + 1 WHERE id = ?",
+                        (next_run, row["id"]),
+                    )
+                    continue
+                self.db.execute(
+                    "UPDATE jobs SET next_run = ?, last_run = ?, runs = runs + 1 "
+                    "WHERE id = ?",
+                    (next_run, now, row["id"]),
+                )
+                self._running[row["id"]] = self._running.get(row["id"], 0) + 1
+                self._pool.submit(self._execute, row["id"], json.loads(row["target"]))
+                submitted.append(row["id"])
+        return submitted
+
+    def _execute(self, job_id: str, target: Dict):
+        try:
+            result = self.run_job(target)
+            status = "ok"
+        except Exception as e:
+            result = str(e)
+            status = "error"
+
+        with self._lock:
+            self._running[job_id] -= 1
+            if self._stop.is_set():
+                # Closed while the job ran; the store is gone
+                return
+            with self.db:
+                self.db.execute(
+                    "UPDATE jobs SET last_status = ?, last_result = ? WHERE id = ?",
+                    (status, None if result is None else str(result), job_id),
+                )
+        if self.on_finish:
+            self.on_finish(
+                {"id": job_id, "target": target, "status": status, "result": result}
+            )
+
+    def _next_due(self) -> Optional[float]:
+        with self._lock:
+            row = self.db.execute("SELECT min(next_run) FROM jobs").fetchone()
+        return row[0]
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_pending()
+                next_due = self._next_due()
+                timeout = None if next_due is None else max(next_due - time.time(), 0)
+            except Exception:
+                # A bad row or a busy store must not kill the thread; the
+                # jobs would silently stop running
+                log.exception("Scheduler pass failed; retrying")
+                timeout = RETRY_SECONDS
+            # Wake up at least once a minute in case the clock jumped
+            self._wake.wait(60 if timeout is None else min(timeout, 60))
+            self._wake.clear()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop starting runs; runs already in flight carry on."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def close(self):
+        """Stop, wait for runs in flight to return and close the store.
+
+        A run blocked on something that never answers keeps this waiting,
+        so shut down what runs wait on (the engine) after `stop` and
+        before `close`.
+        """
+        self.stop()
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        with self._lock:
+            self.db.close()
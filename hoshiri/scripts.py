@@ -0,0 +1,189 @@
+# hoshiri/scripts.py
+
+import math
+import re
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+from hoshiri.text import match_expression, stem
+
+# Words that don't change what a command asks for; prepositions stay, as
+# "copy a into b" and "copy a from b" are different scripts
+FILLER = {"a", "an", "the", "i", "me", "my", "please", "can", "could", "you"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scripts (
+    id INTEGER PRIMARY KEY,
+    intent TEXT NOT NULL UNIQUE,
+    command TEXT NOT NULL,
+    code TEXT NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    successes INTEGER NOT NULL DEFAULT 1,
+    failures INTEGER NOT NULL DEFAULT 0,
+    created TEXT NOT NULL,
+    last_used TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scripts_by_last_used ON scripts(last_used);
+CREATE VIRTUAL TABLE IF NOT EXISTS script_text USING fts5(intent);
+"""
+
+
+def normalize(command: str) -> str:
+    """Reduce a command to its intent: its stemmed words minus filler.
+
+    Numbers, file names and word order are kept, since they are the
+    script's arguments: "delete files older than 30 days" and "... 7 days"
+    are different intents, as are "move a.txt to b" and "move b to a.txt".
+    Only case, punctuation, suffixes and filler words are ignored.
+    """
+    words = re.findall(r"\w+(?:[.-]\w+)*", command.lower())
+    return " ".join(
+        word if any(c.isdigit() or c in ".-" for c in word) else stem(word)
+        for word in words
+        if word not in FILLER
+    )
+
+
+def similarity(a: str, b: str) -> float:
+    """Cosine similarity of two normalized intents as bags of words."""
+    left, right = set(a.split()), set(b.split())
+    if not left or not right:
+        return 0.0
+    return len(left & right) / math.sqrt(len(left) * len(right))
+
+
+class ScriptCache:
+    """Cache of verified generated scripts, keyed by intent.
+
+    A script is reused only for a command with exactly the same normalized
+    intent, as scripts act on their arguments and a near-match may do
+    something else. `similar` finds the closest stored intent above
+    `threshold` among the full-text candidates instead, to seed the
+    generation of a new script. Only scripts that ran successfully are
+    stored. Each entry tracks hits and its success rate; an entry whose rate
+    drops below `min_success_rate` is evicted, and the least recently used
+    entries go once the cache holds more than `max_entries`.
+    """
+
+    def __init__(
+        self,
+        path: Path = Path("data/scripts.sqlite3"),
+        threshold: float = 0.8,
+        min_success_rate: float = 0.5,
+        max_entries: int = 1000,
+    ):
+        self.path = Path(path)
+        self.threshold = threshold
+        self.min_success_rate = min_success_rate
+        self.max_entries = max_entries
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+
+    def __len__(self) -> int:
+        return self.db.execute("SELECT count(*) FROM scripts").fetchone()[0]
+
+    def lookup(self, command: str) -> Optional[Dict]:
+        """Return the cached script for exactly this intent, counting the hit."""
+        intent = normalize(command)
+        if not intent:
+            return None
+        row = self.db.execute(
+            "SELECT * FROM scripts WHERE intent = ?", (intent,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        with self.db:
+            self.db.execute(
+                "UPDATE scripts SET hits = hits + 1, last_used = ? WHERE id = ?",
+                (datetime.now().isoformat(), row["id"]),
+            )
+        entry = dict(row)
+        entry["hits"] += 1
+        return entry
+
+    def similar(self, command: str) -> Optional[Dict]:
+        """Return the closest cached script, to base a new one on; no hit is counted."""
+        intent = normalize(command)
+        row = self._closest(intent) if intent else None
+        if row is None:
+            return None
+        entry = dict(row)
+        entry["similarity"] = similarity(intent, row["intent"])
+        return entry
+
+    def store(self, command: str, code: str) -> int:
+        """Store a script that just ran successfully and return its id."""
+        intent = normalize(command)
+        now = datetime.now().isoformat()
+        with self.db:
+            row = self.db.execute(
+                "INSERT INTO scripts (intent, command, code, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(intent) DO UPDATE SET command = excluded.command, "
+                "code = excluded.code, successes = 1, failures = 0, "
+                "last_used = excluded.last_used "
+                "RETURNING id",
+                (intent, command, code, now, now),
+            ).fetchone()
+            self.db.execute("DELETE FROM script_text WHERE rowid = ?", (row["id"],))
+            self.db.execute(
+                "INSERT INTO script_text (rowid, intent) VALUES (?, ?)",
+                (row["id"], intent),
+            )
+            self._evict_oldest()
+        return row["id"]
+
+    def record(self, script_id: int, ok: bool):
+        """Record the outcome of running a cached script; evict it if unreliable."""
+        column = "successes" if ok else "failures"
+        with self.db:
+            row = self.db.execute(
+                f"UPDATE scripts SET {column} = {column} + 1 WHERE id = ? "
+                "RETURNING successes, failures",
+                (script_id,),
+            ).fetchone()
+            if row is None:
+                return
+            rate = row["successes"] / (row["successes"] + row["failures"])
+            if rate < self.min_success_rate:
+                self._delete(script_id)
+
+    def _closest(self, intent: str) -> Optional[sqlite3.Row]:
+        match = match_expression(intent)
+        if match is None:
+            return None
+        rows = self.db.execute(
+            "SELECT scripts.* FROM script_text JOIN scripts "
+            "ON scripts.id = script_text.rowid "
+            "WHERE script_text MATCH ? ORDER BY rank LIMIT 10",
+            (match,),
+        ).fetchall()
+        best, best_score = None, self.threshold
+        for row in rows:
+            score = similarity(intent, row["intent"])
+            if score >= best_score:
+                best, best_score = row, score
+        return best
+
+    def _evict_oldest(self):
+        excess = len(self) - self.max_entries
+        if excess <= 0:
+            return
+        rows = self.db.execute(
+            "SELECT id FROM scripts ORDER BY last_used LIMIT ?", (excess,)
+        ).fetchall()
+        for row in rows:
+            self._delete(row["id"])
+
+    def _delete(self, script_id: int):
+        self.db.execute("DELETE FROM scripts WHERE id = ?", (script_id,))
+        self.db.execute("DELETE FROM script_text WHERE rowid = ?", (script_id,))
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,89 @@
+# hoshiri/sessions.py
+
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+class SessionLog:
+    """Append-only JSONL log of a chat session.
+
+    Every finished turn is written as one line the moment it happens, so
+    saving never rewrites what is already on disk. Attachments are written
+    as references to their content hash and upload path instead of inline
+    data; `load` keeps those references and the chat resolves them through
+    the attachment cache only when a request is built. Compactions are
+    logged as an op that replaces the head of the history on replay.
+    """
+
+    def __init__(self, root: Path, session_id: Optional[str] = None):
+        self.root = Path(root)
+        self.session_id = session_id or datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.path = self.root / f"{self.session_id}.jsonl"
+        self._file = None
+
+    @classmethod
+    def sessions(cls, root: Path) -> List[Path]:
+        """Return the session logs under `root`, oldest first."""
+        root = Path(root)
+        if not root.is_dir():
+            return []
+        return sorted(root.glob("*.jsonl"))
+
+    def append(self, entry: Dict):
+        """Log one history entry."""
+        self._write({"op": "turn", "entry": self.dehydrate(entry)})
+
+    def compact(self, replaced: int, summary: List[Dict]):
+        """Log that the first `replaced` entries were swapped for `summary`."""
+        self._write(
+            {
+                "op": "compact",
+                "replaced": replaced,
+                "entries": [self.dehydrate(entry) for entry in summary],
+            }
+        )
+
+    def load(self) -> List[Dict]:
+        """Replay the log into a history list, leaving attachments as references."""
+        history: List[Dict] = []
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A line cut short by a crash
+                    continue
+                if record["op"] == "turn":
+                    history.append(record["entry"])
+                elif record["op"] == "compact":
+                    history[: record["replaced"]] = record["entries"]
+        return history
+
+    @staticmethod
+    def dehydrate(entry: Dict) -> Dict:
+        """Replace inline attachment blocks with hash references.
+
+        The first blocks of an entry with `files` are the attachments, in the
+        same order as the list.
+        """
+        files = entry.get("files", [])
+        content = [
+            {"type": "attachment", "digest": f["digest"], "path": f["path"]}
+            for f in files
+        ]
+        content += entry["content"][len(files) :]
+        return {**entry, "content": content}
+
+    def _write(self, record: Dict):
+        if self._file is None:
+            self.root.mkdir(exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,89 @@
+# hoshiri/startup.py
+
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List
+
+# Runs in a fresh interpreter so nothing is imported yet; argv[1] is the
+# directory holding main.py
+PROBE = """
+import json, sys, time
+sys.path.insert(0, sys.argv[1])
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+error = None
+try:
+    chat = main.HoshiriChat()
+    chat.close()
+except Exception as e:
+    error = str(e)
+ready = time.perf_counter()
+print(json.dumps({"import": imported - started, "init": ready - imported,
+                  "error": error, "modules": len(sys.modules)}))
+"""
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)")
+
+
+def parse_importtime(output: str) -> List[Dict]:
+    """Parse `python -X importtime` output into one record per import.
+
+    Times are in microseconds; `depth` 0 is an import made by the script
+    itself and `cumulative` includes everything that import pulled in.
+    """
+    imports = []
+    for line in output.splitlines():
+        match = _LINE.match(line)
+        if match:
+            imports.append(
+                {
+                    "module": match.group(4),
+                    "self": int(match.group(1)),
+                    "cumulative": int(match.group(2)),
+                    "depth": (len(match.group(3)) - 1) // 2,
+                }
+            )
+    return imports
+
+
+def by_package(imports: List[Dict]) -> Dict[str, int]:
+    """Total self time per top-level package, largest first."""
+    totals: Dict[str, int] = {}
+    for record in imports:
+        package = record["module"].split(".")[0]
+        totals[package] = totals.get(package, 0) + record["self"]
+    return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+
+def profile_startup(root: str = ".") -> Dict:
+    """Start Hoshiri in a fresh interpreter and time its imports and set-up.
+
+    Returns the wall time of `import main` and of building `HoshiriChat`
+    (up to where the first prompt would show), the per-import records and
+    the per-package totals. The probe runs in an empty directory, so the
+    sessions, uploads and job store it creates are thrown away with it.
+    """
+    root = os.path.abspath(root)
+    # The project's .env is out of reach there; no request is sent, so
+    # any key gets set-up past the key check
+    env = dict(os.environ, ANTHROPIC_API_KEY="startup-probe")
+    with tempfile.TemporaryDirectory(prefix="hoshiri-startup-") as workspace:
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", PROBE, root],
+            cwd=workspace,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+    lines = [line for line in proc.stdout.splitlines() if line.startswith("{")]
+    if proc.returncode != 0 or not lines:
+        raise RuntimeError(f"Start-up probe failed:\n{proc.stderr[-2000:]}")
+    profile = json.loads(lines[-1])
+    imports = parse_importtime(proc.stderr)
+    profile["imports"] = imports
+    profile["packages"] = by_package(imports)
+    return profile
@@ -0,0 +1,38 @@
+# hoshiri/text.py
+
+import re
+from typing import List, Optional
+
+# Words that match almost everything and only dilute a lookup
+STOPWORDS = set(
+    """the and for are but not you your with this that have was what when where
+    which who how can could would should about from into there their they them
+    then than its our out all any did does had has his her she him just like
+    more some such too very will also please""".split()
+)
+MAX_QUERY_TERMS = 32
+
+
+def terms(text: str) -> List[str]:
+    """Return the distinct searchable words of `text`, in order."""
+    found = []
+    for word in re.findall(r"\w+", text.lower()):
+        if len(word) > 2 and word not in STOPWORDS and word not in found:
+            found.append(word)
+    return found
+
+
+def stem(word: str) -> str:
+    """Strip the commonest English suffixes so 'emails' matches 'email'."""
+    for suffix in ("ing", "ed", "es", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)]
+    return word
+
+
+def match_expression(text: str) -> Optional[str]:
+    """Turn free text into an FTS5 query that matches any of its words."""
+    words = terms(text)
+    if not words:
+        return None
+    return " OR ".join(f'"{word}"' for word in words[:MAX_QUERY_TERMS])
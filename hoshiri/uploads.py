@@ -0,0 +1,64 @@
+# hoshiri/uploads.py
+
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Tuple
+
+
+class UploadStore:
+    """Content-addressed storage for uploaded files.
+
+    Every upload lives at `<root>/<sha256>/<original name>`. The size limit
+    is checked from `stat` before anything is read, the file is hashed in
+    chunks, and the copy goes through `shutil.copyfile`, which uses the
+    kernel fast paths (`sendfile`, `fcopyfile`) where available. Uploading
+    content that is already stored costs one hashing pass and no writes.
+    """
+
+    def __init__(self, root: Path, max_bytes: int = 512 * 1024 * 1024):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.root.mkdir(exist_ok=True)
+
+    def add(self, source: Path) -> Tuple[Path, str]:
+        """Store a file and return its stored path and content hash."""
+        source = Path(source)
+        size = source.stat().st_size
+        if size > self.max_bytes:
+            raise ValueError(
+                f"{source.name} is {size / 1024 / 1024:.1f} MB, "
+                f"the upload limit is {self.max_bytes / 1024 / 1024:.0f} MB"
+            )
+
+        with open(source, "rb") as f:
+            digest = hashlib.file_digest(f, "sha256").hexdigest()
+
+        target_dir = self.root / digest
+        existing = self.find(digest)
+        if existing is not None:
+            return existing, digest
+
+        target_dir.mkdir(exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=target_dir, prefix=".upload-")
+        os.close(fd)
+        try:
+            shutil.copyfile(source, tmp_name)
+            target = target_dir / source.name
+            os.replace(tmp_name, target)
+        except BaseException:
+            os.unlink(tmp_name)
+            raise
+        return target, digest
+
+    def find(self, digest: str):
+        """Return the stored file for a content hash, or None."""
+        target_dir = self.root / digest
+        if not target_dir.is_dir():
+            return None
+        for path in target_dir.iterdir():
+            if not path.name.startswith(".upload-"):
+                return path
+        return None
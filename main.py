@@ -1,23 +1,33 @@
 import os
 from dotenv import load_dotenv
-import anthropic
 from datetime import datetime
+from functools import cached_property
 import textwrap
+import threading
+import time
 import sys
-from typing import List, Dict
-import json
+from typing import List, Dict, Optional, Tuple
 from rich.console import Console
-from rich.markdown import Markdown
 from rich.theme import Theme
-from rich.prompt import Prompt
-from rich.live import Live
-from rich.spinner import Spinner
-import base64
 from pathlib import Path
-import mimetypes
-import readline
-import time
-import threading
+from hoshiri.attachments import AttachmentStore
+from hoshiri.context import CHARS_PER_TOKEN, ContextManager
+from hoshiri.memory import MemoryIndex
+from hoshiri.metrics import Metrics
+from hoshiri.scheduler import Scheduler
+from hoshiri.sessions import SessionLog
+from hoshiri.uploads import UploadStore
+
+# Imported on first use rather than at start-up: the anthropic SDK (with
+# pydantic and httpx) alone is most of a cold start, and rich's Markdown,
+# Live and Progress, mimetypes, base64 and readline are only needed once
+# the first prompt is answered. `--profile-startup` shows what remains.
+
+# Anthropic allows at most four cache breakpoints per request
+MAX_CACHE_BREAKPOINTS = 4
+# Blocks shorter than this are not worth a breakpoint (~1024 tokens)
+CACHE_MIN_CHARS = 4096
+MODEL = "claude-3-5-sonnet-20241022"
 
 
 class HoshiriChat:
@@ -28,18 +38,20 @@ class HoshiriChat:
         if not api_key:
             raise ValueError("ANTHROPIC_API_KEY not found in .env file")
 
-        self.client = anthropic.Anthropic(api_key=api_key)
-        self.model = "claude-3-5-sonnet-20241022"
+        self.api_key = api_key
+        self.model = MODEL
         self.conversation_history: List[Dict] = []
         self.max_width = 100
         self.command_history = []
-        self.spinner = Spinner("dots", text="Thinking")
-        self.is_processing = False
-
-        # Initialize readline for history
-        readline.parse_and_bind('"\e[A": history-search-backward')
-        readline.parse_and_bind('"\e[B": history-search-forward')
-        readline.parse_and_bind('"\C-r": reverse-search-history')
+        self.streaming = True
+        self.failed_input = None
+        self.readline = None
+        self._lazy_lock = threading.RLock()
+        self._api = None
+        self._engine = None
+        self.metrics = Metrics(
+            self.model, export_path=os.getenv("HOSHIRI_METRICS_FILE") or None
+        )
 
         self.theme = Theme(
             {
@@ -53,8 +65,29 @@ class HoshiriChat:
         self.console = Console(theme=self.theme, width=self.max_width)
 
         self.uploads_dir = Path("uploads")
-        self.uploads_dir.mkdir(exist_ok=True)
         self.current_files = []
+        self.attachments = AttachmentStore(
+            max_bytes=int(os.getenv("HOSHIRI_ATTACHMENT_CACHE_MB", "256")) * 1024 * 1024
+        )
+        # Text attachments over `search_file_tokens` are searched for the
+        # chunks a question needs; over `large_file_tokens` they are read
+        # in full, chunk by chunk, instead
+        self.search_file_tokens = int(os.getenv("HOSHIRI_SEARCH_FILE_TOKENS", "4000"))
+        self.large_file_tokens = int(os.getenv("HOSHIRI_LARGE_FILE_TOKENS", "50000"))
+        self.search_k = int(os.getenv("HOSHIRI_SEARCH_K", "6"))
+        self.chunk_tokens = int(os.getenv("HOSHIRI_CHUNK_TOKENS", "20000"))
+        # Notes on large files by (digest, question), so a turn that repeats
+        # a question (or a retry) does not read the whole file again
+        self.large_notes: Dict[Tuple[str, str], dict] = {}
+        self.sessions_dir = Path("sessions")
+        self.session = SessionLog(self.sessions_dir)
+        self.memory_k = int(os.getenv("HOSHIRI_MEMORY_K", "4"))
+        self.scheduler = Scheduler(
+            self.run_job,
+            Path("data/jobs.sqlite3"),
+            workers=int(os.getenv("HOSHIRI_JOB_WORKERS", "2")),
+            on_finish=self.job_finished,
+        )
 
         self.system_prompt = """You are Hoshiri, an AI assistant based on Claude 3.5 Sonnet. 
 You should maintain this identity throughout the conversation while keeping all of Claude's 
@@ -66,6 +99,136 @@ Use Markdown formatting in your responses when appropriate:
 - Use headings with # when organizing information
 - Use ```language code blocks for longer code examples"""
 
+    @property
+    def api(self):
+        """The API client, built (and the SDK imported) on first use."""
+        # Scheduled jobs may get here from another thread
+        with self._lazy_lock:
+            if self._api is None:
+                from hoshiri.client import ApiClient
+
+                self._api = ApiClient(self.api_key)
+            return self._api
+
+    @property
+    def client(self):
+        return self.api.client
+
+    @property
+    def engine(self):
+        with self._lazy_lock:
+            if self._engine is None:
+                from hoshiri.engine import AsyncEngine
+
+                self._engine = AsyncEngine(
+                    self.api,
+                    self.model,
+                    max_concurrency=int(os.getenv("HOSHIRI_MAX_CONCURRENCY", "4")),
+                )
+            return self._engine
+
+    @cached_property
+    def context(self) -> ContextManager:
+        return ContextManager(
+            self.client,
+            self.model,
+            budget=int(os.getenv("HOSHIRI_CONTEXT_BUDGET", "100000")),
+        )
+
+    @cached_property
+    def uploads(self) -> UploadStore:
+        return UploadStore(
+            self.uploads_dir,
+            max_bytes=int(os.getenv("HOSHIRI_MAX_UPLOAD_MB", "512")) * 1024 * 1024,
+        )
+
+    @cached_property
+    def memory(self) -> MemoryIndex:
+        """The memory index, brought up to date when it is first searched."""
+        memory = MemoryIndex(self.sessions_dir / "memory.sqlite3")
+        self.index_past_sessions(memory)
+        return memory
+
+    @cached_property
+    def documents(self):
+        from hoshiri.documents import DocumentCache
+
+        return DocumentCache(
+            self.uploads_dir / "extracted",
+            workers=int(os.getenv("HOSHIRI_EXTRACT_WORKERS", "0")) or None,
+        )
+
+    @cached_property
+    def images(self):
+        from hoshiri.images import ImageCache
+
+        return ImageCache(
+            self.uploads_dir / "images",
+            max_edge=int(os.getenv("HOSHIRI_IMAGE_MAX_EDGE", "1568")),
+            format=os.getenv("HOSHIRI_IMAGE_FORMAT", "jpeg"),
+            quality=int(os.getenv("HOSHIRI_IMAGE_QUALITY", "85")),
+        )
+
+    @cached_property
+    def file_index(self):
+        from hoshiri.fileindex import FileIndex
+
+        return FileIndex(self.uploads_dir / "index.sqlite3")
+
+    @cached_property
+    def reader(self):
+        """Map-reduce reader for text attachments too large to send whole."""
+        from hoshiri.largefile import MapReduce
+
+        return MapReduce(
+            self.engine,
+            system=self.build_system(),
+            concurrency=int(os.getenv("HOSHIRI_MAX_CONCURRENCY", "4")),
+            chunk_tokens=self.chunk_tokens,
+            on_usage=self.metrics.record_usage,
+        )
+
+    @cached_property
+    def registry(self):
+        """The generated modules a pipeline plan can use."""
+        from hoshiri.registry import Registry
+
+        return Registry(
+            Path(os.getenv("HOSHIRI_MODULE_REGISTRY", "data/registry.sqlite3"))
+        )
+
+    @cached_property
+    def executor(self):
+        from hoshiri.executor import Executor
+
+        return Executor(workers=int(os.getenv("HOSHIRI_STEP_WORKERS", "2")))
+
+    @cached_property
+    def spinner(self):
+        from rich.spinner import Spinner
+
+        return Spinner("dots", text="Thinking")
+
+    def close(self):
+        """Stop background work and close the stores that were opened."""
+        # No new job runs; closing the engine then cancels the requests of
+        # runs in flight, so waiting for them cannot hang
+        self.scheduler.stop()
+        if self._engine is not None:
+            self._engine.close()
+        self.scheduler.close()
+        self.session.close()
+        if "memory" in self.__dict__:
+            self.memory.close()
+        if "file_index" in self.__dict__:
+            self.file_index.close()
+        if "images" in self.__dict__:
+            self.images.close()
+        if "registry" in self.__dict__:
+            self.registry.close()
+        if "executor" in self.__dict__:
+            self.executor.close()
+
     def get_file_type(self, file_path: Path, mime_type: str) -> tuple:
         """Determine the appropriate file type and media type for the API."""
         extension = file_path.suffix.lower()
@@ -110,18 +273,46 @@ Use Markdown formatting in your responses when appropriate:
         return "text", "text/plain"
 
     def prepare_file_message(self, file_path: Path) -> dict:
-        """Prepare a file for sending to Claude API."""
+        """Prepare a file for sending to Claude API, reusing earlier encodings."""
+        return self.attachments.get(file_path, self.encode_file)
+
+    def encode_file(self, file_path: Path) -> dict:
+        """Read and encode a file into an API content block."""
+        import base64
+        import mimetypes
+
         mime_type, _ = mimetypes.guess_type(str(file_path))
         if not mime_type:
             mime_type = "application/octet-stream"
 
         api_type, media_type = self.get_file_type(file_path, mime_type)
 
-        with open(file_path, "rb") as f:
-            content = f.read()
+        from hoshiri.documents import LEGACY, can_extract
+
+        if can_extract(file_path):
+            # Attached before uploads were converted, e.g. in a resumed session
+            digest = self.attachments.digest(file_path)
+            file_path = self.documents.get(file_path, digest)
+            api_type = "text"
+        elif file_path.suffix.lower() in LEGACY:
+            # The API takes PDFs as documents but not these
+            return {
+                "type": "text",
+                "text": f"[{file_path.name} is in a legacy binary format that "
+                "cannot be read; ask for it as .docx, .pptx, .xlsx or PDF]",
+            }
+
+        if api_type == "image":
+            # Shrunk and recompressed, usually already in the background
+            content, media_type = self.images.get(
+                file_path, media_type, self.attachments.digest(file_path)
+            )
+        else:
+            with open(file_path, "rb") as f:
+                content = f.read()
 
         if api_type == "text":
-            return {"type": "text", "text": content.decode("utf-8")}
+            return {"type": "text", "text": content.decode("utf-8", errors="replace")}
         else:
             return {
                 "type": api_type,
@@ -132,22 +323,483 @@ Use Markdown formatting in your responses when appropriate:
                 },
             }
 
+    def upload(self, path: Path):
+        """Store a file, or every file in a folder, and attach it.
+
+        Word, PowerPoint and Excel files are attached as the Markdown text
+        extracted from them, converted in parallel and cached by content
+        hash, so the text is what gets searched, chunked and sent.
+        """
+        if path.is_dir():
+            files = sorted(
+                f
+                for f in path.rglob("*")
+                if f.is_file()
+                and not any(part.startswith(".") for part in f.relative_to(path).parts)
+            )
+        else:
+            files = [path]
+
+        stored = []
+        for file_path in files:
+            try:
+                stored.append((file_path, *self.uploads.add(file_path)))
+            except ValueError as e:
+                self.console.print(f"[error]{str(e)}[/error]")
+
+        import mimetypes
+        from hoshiri.documents import can_extract
+
+        documents = [(t, d) for _, t, d in stored if can_extract(t)]
+        extracted = {}
+        if documents:
+            with self.console.status(f"Extracting text from {len(documents)} files"):
+                extracted = self.documents.extract_many(documents)
+
+        for file_path, target_path, digest in stored:
+            if digest in extracted:
+                text = extracted[digest]
+                if isinstance(text, Exception):
+                    self.console.print(f"[error]{str(text)}[/error]")
+                    continue
+                target_path, digest = self.uploads.add(text)
+            self.attachments.remember(target_path, digest)
+            if target_path not in self.current_files:
+                self.current_files.append(target_path)
+            self.console.print(f"[system]File uploaded: {file_path.name}[/system]")
+            mime_type, _ = mimetypes.guess_type(str(target_path))
+            if mime_type and mime_type.startswith("image/"):
+                # Start shrinking it now so the next turn finds it ready
+                self.images.submit(target_path, mime_type, digest)
+                if not self.images.available:
+                    self.console.print(
+                        "[system]Pillow is not installed, so images are sent "
+                        "at full size[/system]"
+                    )
+            mode = self.attachment_mode(target_path)
+            if mode == "search":
+                chunks = self.file_index.add(target_path, digest)
+                self.console.print(
+                    f"[system]Indexed in {chunks} chunks; each turn "
+                    "sends its outline and the parts that match the "
+                    "question[/system]"
+                )
+            elif mode == "chunked":
+                from hoshiri.largefile import LargeFile
+
+                with LargeFile(target_path, self.chunk_tokens) as large:
+                    parts = len(large)
+                self.console.print(
+                    f"[system]It is too large to send whole, so it is read in "
+                    f"{parts} parts: each new question about it costs {parts} "
+                    "extra requests (more if the notes need merging)[/system]"
+                )
+
+    def attachment_mode(self, file_path: Path) -> str:
+        """How a file goes into a turn: "inline", "search" or "chunked"."""
+        import mimetypes
+
+        mime_type, _ = mimetypes.guess_type(str(file_path))
+        api_type, _ = self.get_file_type(
+            file_path, mime_type or "application/octet-stream"
+        )
+        tokens = file_path.stat().st_size // CHARS_PER_TOKEN
+        if api_type != "text" or tokens <= self.search_file_tokens:
+            return "inline"
+        if tokens > self.large_file_tokens:
+            return "chunked"
+        return "search"
+
+    def search_files(self, files: List[Path], question: str) -> List[dict]:
+        """Return an outline-and-excerpts block for each searched file."""
+        from hoshiri.fileindex import excerpt_block
+
+        digests = {}
+        for file_path in files:
+            digest = self.attachments.digest(file_path)
+            # Files uploaded before the index existed are indexed here, once
+            self.file_index.add(file_path, digest)
+            digests[digest] = file_path
+
+        found = self.file_index.search(question, list(digests), k=self.search_k)
+        return [
+            excerpt_block(
+                file_path.name,
+                self.file_index.outline(digest),
+                [chunk for chunk in found if chunk["digest"] == digest],
+            )
+            for digest, file_path in digests.items()
+        ]
+
+    def read_large_file(self, file_path: Path, question: str) -> dict:
+        """Take notes on a large file for `question`, showing progress."""
+        from rich.progress import Progress
+        from hoshiri.largefile import notes_block
+
+        key = (self.attachments.digest(file_path), question)
+        if key in self.large_notes:
+            return notes_block(file_path.name, self.large_notes[key])
+        with Progress(console=self.console, transient=True) as progress:
+            task = progress.add_task(f"Reading {file_path.name}", total=None)
+
+            def on_progress(done: int, total: int):
+                progress.update(task, completed=done, total=total)
+
+            result = self.wait(
+                self.engine.submit(self.reader.notes(file_path, question, on_progress))
+            )
+        self.console.print(
+            f"[system]{file_path.name}: {result['relevant']} of {result['parts']} "
+            f"parts relevant, {result['failed']} failed[/system]"
+        )
+        if not result["failed"]:
+            self.large_notes[key] = result
+        return notes_block(file_path.name, result)
+
+    def resolve_block(self, block: dict) -> dict:
+        """Return a copy of a history block with attachment references loaded."""
+        if block["type"] != "attachment":
+            return dict(block)
+        file_path = self.uploads.find(block["digest"])
+        if file_path is None:
+            return {
+                "type": "text",
+                "text": f"[{Path(block['path']).name} is no longer in uploads]",
+            }
+        self.attachments.remember(file_path, block["digest"])
+        return dict(self.prepare_file_message(file_path))
+
+    @property
+    def system_cached(self) -> bool:
+        """Whether the system prompt is long enough to get its own breakpoint."""
+        return len(self.system_prompt) >= CACHE_MIN_CHARS
+
+    def build_system(self) -> List[Dict]:
+        """Return the system prompt as a content block.
+
+        A short prompt gets no breakpoint of its own: it is cached anyway as
+        part of the history prefix, and the breakpoint is better spent there.
+        """
+        block = {"type": "text", "text": self.system_prompt}
+        if self.system_cached:
+            block["cache_control"] = {"type": "ephemeral"}
+        return [block]
+
+    def index_past_sessions(self, memory: MemoryIndex):
+        """Bring the memory index up to date with the logs on disk."""
+        for path in SessionLog.sessions(self.sessions_dir):
+            memory.index_session(path)
+        # Full dumps written by the old 'save' command
+        for path in Path(".").glob("hoshiri_chat_*.json"):
+            try:
+                memory.index_legacy(path)
+            except (ValueError, OSError) as e:
+                # A truncated or hand-edited dump; the rest are still indexed
+                self.console.print(f"[error]Skipped {path} in memory: {e}[/error]")
+
+    def recall(self, query: str) -> Optional[Dict]:
+        """Return a text block with notes from earlier sessions about `query`."""
+        if not self.memory_k:
+            return None
+        snippets = self.memory.search(
+            query, k=self.memory_k, exclude_session=self.session.session_id
+        )
+        if not snippets:
+            return None
+        notes = "\n\n".join(
+            f"[{s['timestamp'][:10]}, {s['role']}] {s['text']}" for s in snippets
+        )
+        return {
+            "type": "text",
+            "text": "Notes from earlier sessions that may be relevant "
+            f"(use them only if they help):\n\n{notes}",
+        }
+
+    def build_messages(self, memory: Optional[Dict] = None) -> List[Dict]:
+        """Build the API messages with prompt-cache breakpoints on the stable prefix.
+
+        A long system prompt takes one breakpoint, the last history turn before
+        the current prompt takes another, and the largest attachments of the
+        current prompt get the rest. Stored history is never mutated. A `memory`
+        block goes right before the question, after the cacheable attachments.
+        """
+        messages = [
+            {
+                "role": m["role"],
+                "content": [self.resolve_block(block) for block in m["content"]],
+            }
+            for m in self.conversation_history
+        ]
+        if memory is not None:
+            messages[-1]["content"].insert(-1, memory)
+        breakpoints = MAX_CACHE_BREAKPOINTS - (1 if self.system_cached else 0)
+
+        if len(messages) > 1:
+            messages[-2]["content"][-1]["cache_control"] = {"type": "ephemeral"}
+            breakpoints -= 1
+
+        def block_size(block: dict) -> int:
+            if block["type"] == "text":
+                return len(block["text"])
+            return len(block["source"]["data"])
+
+        large_blocks = [
+            block
+            for block in messages[-1]["content"]
+            if block_size(block) >= CACHE_MIN_CHARS
+        ]
+        large_blocks.sort(key=block_size, reverse=True)
+        for block in large_blocks[:breakpoints]:
+            block["cache_control"] = {"type": "ephemeral"}
+
+        return messages
+
+    def print_usage(self, response, cost: Optional[float] = None):
+        """Print the token, cache, latency and cost counters of a turn's reply."""
+        usage = response.usage
+        cache_read = usage.cache_read_input_tokens or 0
+        cache_write = usage.cache_creation_input_tokens or 0
+        status = "hit" if cache_read else "miss"
+        # This turn's call, not whichever request finished last
+        call = self.api.stats.find(response.id)
+        timing = ""
+        if call is not None:
+            retries = f", {call['retries']} retries" if call["retries"] else ""
+            timing = f" · {call['latency']:.1f}s{retries}"
+        price = f" · ${cost:.4f}" if cost else ""
+        self.console.print(
+            f"[system]Tokens: {usage.input_tokens} in, {usage.output_tokens} out · "
+            f"cache {status}: {cache_read} read, {cache_write} written"
+            f"{timing}{price}[/system]"
+        )
+
+    def print_api_stats(self):
+        """Print latency, token and retry totals for the session's API calls."""
+        stats = self.api.stats.summary()
+        self.console.print(
+            f"\n[system]API calls: {stats['calls']} ({stats['errors']} failed, "
+            f"{stats['retries']} retries) · {stats['input_tokens']} in, "
+            f"{stats['output_tokens']} out, {stats['cache_read_input_tokens']} "
+            f"read from cache[/system]"
+        )
+        if "p50_latency" in stats:
+            self.console.print(
+                f"[system]Latency: p50 {stats['p50_latency']:.2f}s, "
+                f"p95 {stats['p95_latency']:.2f}s[/system]"
+            )
+        for name, limit in self.api.limiter.limits.items():
+            self.console.print(
+                f"[system]Rate limit {name}: {limit['remaining']} of "
+                f"{limit['limit']} left[/system]"
+            )
+
+        metrics = self.metrics.summary()
+        if not metrics["turns"]:
+            return
+        self.console.print(
+            f"[system]Turns: {metrics['turns']} · est. cost ${metrics['cost']:.4f} · "
+            + ", ".join(f"{n} {kind}" for kind, n in metrics["tokens"].items())
+            + " tokens[/system]"
+        )
+        for name, stage in metrics["stages"].items():
+            self.console.print(
+                f"[system]  {name:<12} p50 {stage['p50'] * 1000:8.1f} ms · "
+                f"p95 {stage['p95'] * 1000:8.1f} ms · "
+                f"total {stage['seconds']:.2f}s over {stage['count']}[/system]"
+            )
+
+    def export_metrics(self, path: str):
+        """Handle 'stats export <file>': .prom/.txt for Prometheus, else JSONL turns."""
+        if not path:
+            self.console.print("[error]Usage: stats export <file.prom|file.jsonl>[/error]")
+            return
+        written = self.metrics.export(Path(path))
+        self.console.print(f"[system]Metrics written to {written}[/system]")
+
+    def print_context_usage(self):
+        """Print how much of the context budget the session is using."""
+        usage = self.context.usage(self.conversation_history)
+        self.console.print(
+            f"\n[system]Context: ~{usage['estimated_tokens']} of {usage['budget']} "
+            f"tokens ({usage['percent']}%) in {usage['entries']} entries[/system]"
+        )
+        if usage["last_input_tokens"] is not None:
+            self.console.print(
+                f"[system]Last request: {usage['last_input_tokens']} input tokens[/system]"
+            )
+        if usage["compactions"] or usage["summarizing"]:
+            state = " (summarizing now)" if usage["summarizing"] else ""
+            self.console.print(
+                f"[system]Older turns compacted {usage['compactions']} times{state}[/system]"
+            )
+        if usage["last_error"]:
+            self.console.print(f"[error]Last summary failed: {usage['last_error']}[/error]")
+
     def save_conversation(self):
-        """Save the conversation history to a JSON file."""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"hoshiri_chat_{timestamp}.json"
+        """Report where the session log is; turns are written as they happen."""
+        if self.session.path.exists():
+            self.console.print(
+                f"\n[system]Conversation is saved to {self.session.path}[/system]"
+            )
+        else:
+            self.console.print("\n[system]Nothing to save yet[/system]")
 
-        with open(filename, "w") as f:
-            json.dump(self.conversation_history, f, indent=2)
-        self.console.print(f"\n[system]Conversation saved to {filename}[/system]")
+    def resume_session(self, name: str):
+        """Load a logged session and keep appending new turns to it."""
+        if name:
+            path = self.sessions_dir / f"{Path(name).stem}.jsonl"
+        else:
+            sessions = SessionLog.sessions(self.sessions_dir)
+            if not sessions:
+                self.console.print("[error]No saved sessions[/error]")
+                return
+            path = sessions[-1]
+        if not path.is_file():
+            self.console.print(f"[error]Session {name} not found[/error]")
+            return
+
+        self.session.close()
+        self.session = SessionLog(self.sessions_dir, path.stem)
+        self.conversation_history = self.session.load()
+        self.current_files = []
+        self.console.print(
+            f"\n[system]Resumed session {path.stem} with "
+            f"{len(self.conversation_history)} entries[/system]"
+        )
+
+    def log_turn(self, entry: Dict):
+        # Counting first stores the token estimate in the log as well
+        self.context.count(entry)
+        self.session.append(entry)
+        self.memory.index_session(self.session.path)
+
+    def run_job(self, target: Dict) -> str:
+        """Run a scheduled job; prompt jobs are asked outside the conversation."""
+        response = self.engine.submit(
+            self.engine.ask(
+                [{"role": "user", "content": target["prompt"]}],
+                system=self.build_system(),
+            )
+        ).result()
+        return response.content[0].text
+
+    def job_finished(self, run: Dict):
+        if run["status"] == "ok":
+            self.console.print(
+                f"\n[system]⏰ Job {run['id']} finished "
+                f"({run['target']['prompt'][:40]}) · 'jobs' shows the result[/system]"
+            )
+        else:
+            self.console.print(f"\n[error]⏰ Job {run['id']} failed: {run['result']}[/error]")
+
+    def schedule_job(self, args: str):
+        """Handle 'schedule every <n>[smhd] <prompt>' and 'schedule cron <5 fields> <prompt>'."""
+        parts = args.split()
+        if len(parts) >= 3 and parts[0] == "every":
+            trigger, prompt = f"every:{parts[1]}", " ".join(parts[2:])
+        elif len(parts) >= 7 and parts[0] == "cron":
+            trigger, prompt = "cron:" + " ".join(parts[1:6]), " ".join(parts[6:])
+        else:
+            self.console.print(
+                "[error]Usage: schedule every <n>[s|m|h|d] <prompt> | "
+                "schedule cron <min> <hour> <day> <month> <weekday> <prompt>[/error]"
+            )
+            return
+        try:
+            job_id = self.scheduler.add(trigger, {"prompt": prompt})
+        except ValueError as e:
+            self.console.print(f"[error]{str(e)}[/error]")
+            return
+        self.console.print(f"[system]Scheduled job {job_id}[/system]")
+
+    def print_jobs(self):
+        jobs = self.scheduler.jobs()
+        if not jobs:
+            self.console.print("[system]No scheduled jobs[/system]")
+            return
+        for job in jobs:
+            next_run = datetime.fromtimestamp(job["next_run"]).strftime("%Y-%m-%d %H:%M")
+            self.console.print(
+                f"[system]{job['id']} {job['trigger']} · next {next_run} · "
+                f"{job['runs']} runs, {job['missed']} skipped · "
+                f"{job['target']['prompt']}[/system]"
+            )
+            if job["last_result"]:
+                status = "assistant" if job["last_status"] == "ok" else "error"
+                self.console.print(
+                    f"[{status}]  {textwrap.shorten(job['last_result'], 200)}[/{status}]"
+                )
+
+    def run_pipeline(self, request: str):
+        """Plan a multi-step request over the registered modules and run it."""
+        import asyncio
+        from hoshiri.pipeline import ModuleRunner, Pipeline, StepCache, plan
+
+        modules = self.registry.modules
+        if not modules:
+            self.console.print(
+                f"[error]No modules are registered in {self.registry.path}[/error]"
+            )
+            return
+        try:
+            with self.console.status("Planning"):
+                steps = self.wait(
+                    self.engine.submit(plan(self.engine, request, modules))
+                )
+            self.console.print(
+                "[system]Plan: "
+                + ", ".join(f"{step['id']} ({step['module']})" for step in steps)
+                + "[/system]"
+            )
+            pipeline = Pipeline(
+                steps,
+                ModuleRunner(
+                    self.registry,
+                    self.executor,
+                    timeout=float(os.getenv("HOSHIRI_STEP_TIMEOUT", "60")),
+                ),
+                StepCache(Path("data/steps")),
+            )
+            # Steps run on their own threads, not on the engine loop, so a
+            # slow module doesn't hold up scheduled jobs; the modules
+            # themselves run in executor workers that are killed on timeout
+            with self.console.status("Running steps"):
+                results = asyncio.run(pipeline.run())
+        except KeyboardInterrupt:
+            self.console.print("\n[system]Pipeline cancelled[/system]")
+            return
+        except Exception as e:
+            # A bad plan, an API error or a failed step; the chat carries on
+            self.console.print(f"[error]❌ Pipeline failed: {str(e)}[/error]")
+            return
+
+        stats = pipeline.stats
+        for step in steps:
+            if step["id"] in stats["ran"]:
+                self.registry.record_use(step["module"])
+        self.console.print(
+            f"[system]{len(stats['ran'])} steps ran, {len(stats['cached'])} "
+            f"replayed from cache, {len(stats['skipped'])} skipped[/system]"
+        )
+        for step_id, items in results.items():
+            self.console.print(f"\n[file]{step_id}:[/file]")
+            for item in items:
+                self.console.print(item if isinstance(item, str) else repr(item))
 
     def get_input_with_history(self, prompt: str) -> str:
         """Get user input with command history support."""
+        if self.readline is None:
+            import readline
+
+            readline.parse_and_bind('"\e[A": history-search-backward')
+            readline.parse_and_bind('"\e[B": history-search-forward')
+            readline.parse_and_bind('"\C-r": reverse-search-history')
+            self.readline = readline
         try:
             if self.command_history:
-                readline.clear_history()
+                self.readline.clear_history()
                 for cmd in self.command_history:
-                    readline.add_history(cmd)
+                    self.readline.add_history(cmd)
             user_input = input(prompt)
             if user_input.strip():
                 self.command_history.append(user_input)
@@ -155,21 +807,243 @@ Use Markdown formatting in your responses when appropriate:
         except (EOFError, KeyboardInterrupt):
             return "exit"
 
-    def animate_loading(self):
-        """Display loading animation while processing."""
-        with Live(self.spinner, refresh_per_second=10) as live:
-            while self.is_processing:
-                live.update(self.spinner)
-                time.sleep(0.1)
+    def wait(self, future):
+        """Wait for an engine request, cancelling it on Ctrl-C."""
+        try:
+            return future.result()
+        except KeyboardInterrupt:
+            future.cancel()
+            raise
+
+    def stream_response(self, messages: List[Dict]):
+        """Stream the reply and re-render it in a live region as chunks arrive.
+
+        Only the block still being written is re-rendered on each refresh;
+        finished paragraphs and code blocks are rendered once.
+        """
+        from rich.live import Live
+        from hoshiri.render import IncrementalMarkdown
+
+        refresh_per_second = 10
+        markdown = IncrementalMarkdown(min_interval=1 / refresh_per_second)
+        feeding = 0.0
+        waiting = True
+
+        self.console.print()
+        self.console.print("[assistant]🤖 Hoshiri:[/assistant]")
+
+        # The spinner stays up until the first token arrives
+        started = time.perf_counter()
+        with Live(
+            self.spinner,
+            console=self.console,
+            refresh_per_second=refresh_per_second,
+            vertical_overflow="visible",
+        ) as live:
+
+            def on_text(text: str):
+                nonlocal feeding, waiting
+                feed_started = time.perf_counter()
+                if waiting:
+                    waiting = False
+                    self.metrics.add("first_token", feed_started - started)
+                    live.update(markdown)
+                markdown.feed(text)
+                feeding += time.perf_counter() - feed_started
+
+            try:
+                response = self.wait(
+                    self.engine.submit(
+                        self.engine.ask(
+                            messages, system=self.build_system(), on_text=on_text
+                        )
+                    )
+                )
+            finally:
+                markdown.finish()
+                live.refresh()
+
+        # Live renders on its own thread; the stream only pays for feeding
+        self.metrics.add("api", time.perf_counter() - started - feeding)
+        self.metrics.add("render", markdown.stats["seconds"])
+        self.console.print()
+        return response
+
+    def ask_each_file(self, question: str):
+        """Ask the same question about every attached file concurrently."""
+        from concurrent.futures import as_completed
+        from rich.live import Live
+        from rich.markdown import Markdown
+
+        futures = {}
+        for file_path in self.current_files:
+            if self.attachment_mode(file_path) == "chunked":
+                request = self.reader.answer(file_path, question)
+            else:
+                content = [
+                    self.prepare_file_message(file_path),
+                    {"type": "text", "text": question},
+                ]
+                request = self.engine.ask(
+                    [{"role": "user", "content": content}], system=self.build_system()
+                )
+            futures[self.engine.submit(request)] = file_path
+
+        with Live(self.spinner, console=self.console, transient=True):
+            try:
+                for future in as_completed(futures):
+                    file_path = futures[future]
+                    self.console.print(f"\n[file]📄 {file_path.name}:[/file]")
+                    try:
+                        response = future.result()
+                    except Exception as e:
+                        self.console.print(f"[error]❌ Error: {str(e)}[/error]")
+                        continue
+                    self.console.print(Markdown(response.content[0].text))
+            except KeyboardInterrupt:
+                for future in futures:
+                    future.cancel()
+                self.console.print("\n[system]Cancelled[/system]")
+        self.console.print()
+
+    def send(self, user_input: str):
+        """Run one chat turn: build the request, show the reply and log both."""
+        self.metrics.start_turn(files=len(self.current_files))
+        try:
+            question = user_input or "Please analyze the attached files"
+            with self.metrics.span("prepare"):
+                modes = {f: self.attachment_mode(f) for f in self.current_files}
+                attached = [f for f, mode in modes.items() if mode == "inline"]
+                searched = [f for f, mode in modes.items() if mode == "search"]
+                large = [f for f, mode in modes.items() if mode == "chunked"]
+                # Attachments go first so they sit in the cacheable prefix
+                message_content = [
+                    self.prepare_file_message(file_path) for file_path in attached
+                ]
+            if searched:
+                with self.metrics.span("search"):
+                    message_content += self.search_files(searched, question)
+            if large:
+                # Notes on large files stand in for them; this turn's reply
+                # is the final reduce step over the notes
+                with self.metrics.span("map"):
+                    for file_path in large:
+                        message_content.append(
+                            self.read_large_file(file_path, question)
+                        )
+            message_content.append(
+                {"type": "text", "text": question if self.current_files else user_input}
+            )
+
+            user_entry = {
+                "role": "user",
+                "content": message_content,
+                "timestamp": datetime.now().isoformat(),
+            }
+            if attached:
+                # Logged as references; excerpts and notes are logged as text
+                user_entry["files"] = [
+                    {
+                        "path": str(file_path),
+                        "digest": self.attachments.digest(file_path),
+                    }
+                    for file_path in attached
+                ]
+            self.conversation_history.append(user_entry)
+
+            entries = len(self.conversation_history)
+            with self.metrics.span("context"):
+                compacted = self.context.maybe_compact(self.conversation_history)
+            if compacted:
+                replaced = entries - len(self.conversation_history) + 2
+                self.session.compact(replaced, self.conversation_history[:2])
+                self.console.print(
+                    "[system]Older turns were replaced by a summary[/system]"
+                )
+            with self.metrics.span("recall"):
+                memory = self.recall(user_input)
+            with self.metrics.span("build"):
+                messages = self.build_messages(memory)
+
+            if self.streaming:
+                response = self.stream_response(messages)
+            else:
+                from rich.live import Live
+                from rich.markdown import Markdown
+
+                with Live(self.spinner, console=self.console, transient=True):
+                    with self.metrics.span("api"):
+                        response = self.wait(
+                            self.engine.submit(
+                                self.engine.ask(messages, system=self.build_system())
+                            )
+                        )
+
+                with self.metrics.span("render"):
+                    self.console.print()
+                    self.console.print("[assistant]🤖 Hoshiri:[/assistant]")
+                    self.console.print(Markdown(response.content[0].text))
+                    self.console.print()
+
+            assistant_message = response.content[0].text
+            spent = self.metrics.record_usage(response.usage)
+            self.print_usage(response, spent["cost"])
+            self.context.record_usage(response.usage)
+
+            assistant_entry = {
+                "role": "assistant",
+                "content": [{"type": "text", "text": assistant_message}],
+                "timestamp": datetime.now().isoformat(),
+            }
+            self.conversation_history.append(assistant_entry)
+            with self.metrics.span("log"):
+                self.log_turn(user_entry)
+                self.log_turn(assistant_entry)
+            self.metrics.end_turn()
+        except BaseException as e:
+            # Drop the unanswered prompt so the history keeps alternating
+            if (
+                self.conversation_history
+                and self.conversation_history[-1]["role"] == "user"
+            ):
+                self.conversation_history.pop()
+            cancelled = isinstance(e, KeyboardInterrupt)
+            self.metrics.end_turn(error="cancelled" if cancelled else type(e).__name__)
+            raise
+        return response
 
     def run(self):
         """Run the chat interface."""
+        # Jobs only fire in an interactive chat, not when a HoshiriChat is
+        # built for a benchmark or the start-up probe
+        self.scheduler.start()
         self.console.print("\n[system]Welcome to Hoshiri Chat![/system]")
         self.console.print("[system]Commands:[/system]")
         self.console.print("[system]- Type 'exit' to end the conversation[/system]")
-        self.console.print("[system]- Type 'save' to save the chat history[/system]")
-        self.console.print("[system]- Type 'upload' to upload a file[/system]")
+        self.console.print("[system]- Type 'save' to show where the chat is saved[/system]")
+        self.console.print(
+            "[system]- Type 'resume [session]' to continue a saved chat[/system]"
+        )
+        self.console.print("[system]- Type 'upload' to upload a file or folder[/system]")
         self.console.print("[system]- Type 'clear' to clear current files[/system]")
+        self.console.print("[system]- Type 'stream' to toggle streaming replies[/system]")
+        self.console.print("[system]- Type 'tokens' to show context usage[/system]")
+        self.console.print(
+            "[system]- Type 'stats' to show latency, tokens and cost per stage ('stats export <file>' to save them)[/system]"
+        )
+        self.console.print("[system]- Type 'retry' to resend a prompt that failed[/system]")
+        self.console.print(
+            "[system]- Type 'each <question>' to ask about every attached file in parallel[/system]"
+        )
+        self.console.print(
+            "[system]- Type 'schedule every 1h <prompt>' or 'schedule cron <m h dom mon dow> <prompt>' to run a prompt on a schedule[/system]"
+        )
+        self.console.print(
+            "[system]- Type 'jobs' to list scheduled jobs, 'unschedule <id>' to remove one[/system]"
+        )
+        self.console.print(
+            "[system]- Type 'pipeline <request>' to plan a multi-step request over the registered modules and run it[/system]"
+        )
         self.console.print("[system]- Use ↑/↓ arrows for command history[/system]")
         self.console.print("=" * self.max_width + "\n")
 
@@ -184,97 +1058,294 @@ Use Markdown formatting in your responses when appropriate:
 
             if user_input.lower() == "exit":
                 self.console.print("\n[system]Goodbye! Thanks for chatting![/system]")
+                self.close()
                 break
 
             if user_input.lower() == "save":
                 self.save_conversation()
                 continue
 
+            if user_input.lower() == "resume" or user_input.lower().startswith(
+                "resume "
+            ):
+                self.resume_session(user_input[7:].strip())
+                continue
+
             if user_input.lower() == "clear":
                 self.current_files = []
                 self.console.print("\n[system]Cleared all attached files[/system]")
                 continue
 
+            if user_input.lower() == "stream":
+                self.streaming = not self.streaming
+                state = "on" if self.streaming else "off"
+                self.console.print(f"\n[system]Streaming replies {state}[/system]")
+                continue
+
+            if user_input.lower() == "tokens":
+                self.print_context_usage()
+                continue
+
+            if user_input.lower() == "stats":
+                self.print_api_stats()
+                continue
+
+            if user_input.lower().startswith("stats export"):
+                self.export_metrics(user_input[12:].strip())
+                continue
+
+            if user_input.lower().startswith("schedule "):
+                self.schedule_job(user_input[9:].strip())
+                continue
+
+            if user_input.lower() == "jobs":
+                self.print_jobs()
+                continue
+
+            if user_input.lower().startswith("unschedule "):
+                job_id = user_input[11:].strip()
+                if self.scheduler.remove(job_id):
+                    self.console.print(f"[system]Removed job {job_id}[/system]")
+                else:
+                    self.console.print(f"[error]No job {job_id}[/error]")
+                continue
+
+            if user_input.lower() == "retry":
+                if self.failed_input is None:
+                    self.console.print("[error]Nothing to retry[/error]")
+                    continue
+                user_input = self.failed_input
+
+            if user_input.lower().startswith("pipeline "):
+                self.run_pipeline(user_input[9:].strip())
+                continue
+
+            if user_input.lower().startswith("each "):
+                if self.current_files:
+                    self.ask_each_file(user_input[5:].strip())
+                else:
+                    self.console.print("[error]No files attached[/error]")
+                continue
+
             if user_input.lower() == "upload":
-                file_path = Prompt.ask("[system]Enter the path to your file[/system]")
+                from rich.prompt import Prompt
+
+                file_path = Prompt.ask(
+                    "[system]Enter the path to your file or folder[/system]"
+                )
                 file_path = Path(file_path)
                 if file_path.exists():
-                    target_path = self.uploads_dir / file_path.name
-                    with open(file_path, "rb") as src, open(target_path, "wb") as dst:
-                        dst.write(src.read())
-                    self.current_files.append(target_path)
-                    self.console.print(
-                        f"[system]File uploaded: {file_path.name}[/system]"
-                    )
+                    try:
+                        self.upload(file_path)
+                    except Exception as e:
+                        self.console.print(f"[error]❌ Upload failed: {e}[/error]")
                 else:
                     self.console.print("[error]File not found[/error]")
                 continue
 
             try:
-                if self.current_files:
-                    message_content = [
-                        {
-                            "type": "text",
-                            "text": user_input or "Please analyze the attached files",
-                        }
-                    ]
-                    for file_path in self.current_files:
-                        message_content.append(self.prepare_file_message(file_path))
-                else:
-                    message_content = [{"type": "text", "text": user_input}]
+                self.send(user_input)
+                self.failed_input = None
 
-                self.conversation_history.append(
-                    {
-                        "role": "user",
-                        "content": message_content,
-                        "timestamp": datetime.now().isoformat(),
-                    }
-                )
+            except KeyboardInterrupt:
+                self.console.print("\n[system]Request cancelled[/system]\n")
+                continue
 
-                # Start animation in a separate thread
-                self.is_processing = True
-                animation_thread = threading.Thread(target=self.animate_loading)
-                animation_thread.start()
-
-                try:
-                    response = self.client.messages.create(
-                        model=self.model,
-                        messages=[
-                            {"role": m["role"], "content": m["content"]}
-                            for m in self.conversation_history
-                        ],
-                        system=self.system_prompt,
-                        max_tokens=4096,
-                    )
+            except Exception as e:
+                # Retries are used up; keep the prompt so 'retry' can resend it
+                self.failed_input = user_input
+                self.console.print(f"\n[error]❌ Error: {str(e)}[/error]")
+                self.console.print("[system]Type 'retry' to send it again[/system]\n")
+                continue
 
-                finally:
-                    # Stop animation
-                    self.is_processing = False
-                    animation_thread.join()
 
-                assistant_message = response.content[0].text
+def run_batch(argv: List[str]):
+    """Run a JSONL file of prompts and stream the results to another JSONL file."""
+    import argparse
+    from rich.progress import Progress
+    from hoshiri.batch import BatchRunner, MessageBatchRunner, load_prompts
+    from hoshiri.client import ApiClient
+    from hoshiri.engine import AsyncEngine
 
-                self.conversation_history.append(
-                    {
-                        "role": "assistant",
-                        "content": [{"type": "text", "text": assistant_message}],
-                        "timestamp": datetime.now().isoformat(),
-                    }
+    parser = argparse.ArgumentParser(
+        prog="hoshiri batch",
+        description="Run every prompt in a JSONL file. Reruns skip prompts "
+        "that already have a result in the output file.",
+    )
+    parser.add_argument("input", type=Path, help="JSONL file of prompts")
+    parser.add_argument(
+        "-o", "--output", type=Path, help="results file (default: <input>.out.jsonl)"
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=int(os.getenv("HOSHIRI_MAX_CONCURRENCY", "8")),
+        help="requests in flight at once",
+    )
+    parser.add_argument(
+        "--batches-api",
+        action="store_true",
+        help="submit through the Message Batches API instead of live requests",
+    )
+    parser.add_argument("--max-tokens", type=int, default=4096)
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    api_key = os.getenv("ANTHROPIC_API_KEY")
+    if not api_key:
+        raise ValueError("ANTHROPIC_API_KEY not found in .env file")
+
+    output = args.output or args.input.with_suffix(".out.jsonl")
+    console = Console()
+    try:
+        prompts = load_prompts(args.input)
+    except (OSError, ValueError) as e:
+        # Reported here so main() doesn't take it for a missing API key
+        console.print(f"[red]❌ Could not read {args.input}: {e}[/red]")
+        sys.exit(1)
+
+    with Progress(console=console) as progress:
+        task = progress.add_task("Running prompts", total=len(prompts))
+
+        def on_result(record: Dict):
+            progress.advance(task)
+            if "error" in record:
+                progress.console.print(
+                    f"[red]{record['custom_id']}: {record['error']}[/red]"
                 )
 
-                self.console.print()
-                self.console.print("[assistant]🤖 Hoshiri:[/assistant]")
-                self.console.print(Markdown(assistant_message))
-                self.console.print()
+        api = ApiClient(api_key, max_connections=max(args.workers, 1))
+        if args.batches_api:
+            runner = MessageBatchRunner(
+                api.client,
+                MODEL,
+                output,
+                max_tokens=args.max_tokens,
+                on_result=on_result,
+            )
+            runner.pending(prompts)
+            progress.advance(task, runner.counts["skipped"])
+            counts = runner.run(prompts)
+        else:
+            engine = AsyncEngine(
+                api, MODEL, max_concurrency=args.workers, max_tokens=args.max_tokens
+            )
+            runner = BatchRunner(
+                engine, output, workers=args.workers, on_result=on_result
+            )
+            try:
+                runner.pending(prompts)
+                progress.advance(task, runner.counts["skipped"])
+                counts = engine.submit(runner.run(prompts)).result()
+            finally:
+                engine.close()
 
-            except Exception as e:
-                self.is_processing = False
-                self.console.print(f"\n[error]❌ Error: {str(e)}[/error]\n")
-                continue
+    console.print(
+        f"{counts['succeeded']} succeeded, {counts['failed']} failed, "
+        f"{counts['skipped']} already done · results in {output}"
+    )
+
+
+def run_bench(argv: List[str]):
+    """Benchmark the turn pipeline against a local mock of the Messages API."""
+    import argparse
+    import json
+    from hoshiri.bench import BENCHMARKS, Bench, compare
+
+    parser = argparse.ArgumentParser(
+        prog="hoshiri bench",
+        description="Measure time to first token, per-turn overhead, attachment "
+        "encoding, session save/load and memory growth against a mock API.",
+    )
+    parser.add_argument(
+        "-o", "--output", type=Path, help="write JSON results here (default: stdout)"
+    )
+    parser.add_argument(
+        "--only",
+        default=",".join(BENCHMARKS),
+        help=f"comma-separated subset of: {', '.join(BENCHMARKS)}",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="mock server delay in seconds"
+    )
+    parser.add_argument("--chunks", type=int, default=20, help="stream deltas per reply")
+    parser.add_argument(
+        "--chunk-delay", type=float, default=0.0, help="seconds between deltas"
+    )
+    parser.add_argument(
+        "--turns", type=int, default=1000, help="turns for save/load and memory runs"
+    )
+    parser.add_argument(
+        "--compare", type=Path, help="earlier results file to report changes against"
+    )
+    args = parser.parse_args(argv)
+
+    bench = Bench(
+        HoshiriChat,
+        latency=args.latency,
+        chunks=args.chunks,
+        chunk_delay=args.chunk_delay,
+        turns=args.turns,
+    )
+    results = bench.run([name.strip() for name in args.only.split(",") if name.strip()])
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        for change in compare(baseline, results):
+            delta = "n/a" if change["change"] is None else f"{change['change']:+.1f}%"
+            print(
+                f"{change['metric']:<44} {change['before']:>12g} → "
+                f"{change['after']:>12g}  {delta}",
+                file=sys.stderr,
+            )
+
+
+def print_startup_profile(top: int = 15):
+    """Report where a cold start spends its time, for --profile-startup."""
+    from hoshiri.startup import profile_startup
+
+    profile = profile_startup()
+    console = Console()
+    console.print(
+        f"import main: {profile['import'] * 1000:.0f} ms · "
+        f"HoshiriChat(): {profile['init'] * 1000:.0f} ms · "
+        f"{profile['modules']} modules loaded"
+    )
+    if profile["error"]:
+        console.print(f"[red]Set-up stopped early: {profile['error']}[/red]")
+    console.print(f"\nSlowest packages (self time, top {top}):")
+    for package, micros in list(profile["packages"].items())[:top]:
+        console.print(f"  {micros / 1000:8.1f} ms  {package}")
+    console.print(f"\nSlowest imports (cumulative, top {top}):")
+    slowest = sorted(profile["imports"], key=lambda r: r["cumulative"], reverse=True)
+    for record in slowest[:top]:
+        console.print(
+            f"  {record['cumulative'] / 1000:8.1f} ms  "
+            f"{'  ' * record['depth']}{record['module']}"
+        )
 
 
 def main():
     try:
+        if sys.argv[1:2] == ["batch"]:
+            run_batch(sys.argv[2:])
+            return
+
+        if sys.argv[1:2] == ["bench"]:
+            run_bench(sys.argv[2:])
+            return
+
+        if "--profile-startup" in sys.argv[1:]:
+            print_startup_profile()
+            return
+
         if not os.path.exists(".env"):
             with open(".env", "w") as f:
                 f.write("ANTHROPIC_API_KEY=your-api-key-here")
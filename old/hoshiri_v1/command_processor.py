@@ -1,7 +1,40 @@
+import os
+import sys
+
 from ai import process_with_ai
+from config import MODULES_DIR, REGISTRY_PATH, SCRIPT_CACHE_PATH
 from script_manager import execute_script, generate_script
 from utils import get_available_scripts
 
+# The shared hoshiri package is at the repository root; it goes ahead of
+# this folder, whose hoshiri.py would otherwise shadow it
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from hoshiri.registry import Registry  # noqa: E402
+from hoshiri.scripts import ScriptCache  # noqa: E402
+
+# Scripts that ran successfully, reused for commands with the same intent
+# and offered as a starting point for similar ones
+script_cache = ScriptCache(SCRIPT_CACHE_PATH)
+
+# Known scripts by name, so a command doesn't list the modules folder
+registry = Registry(REGISTRY_PATH, legacy_path=None)
+
+
+def register_script(script_name):
+    registry.add_module(
+        {
+            "name": script_name,
+            "file_path": os.path.join(MODULES_DIR, f"{script_name}.py"),
+        }
+    )
+
+
+if not len(registry):
+    # First run: pick up the scripts generated before the registry existed
+    for name in get_available_scripts():
+        if not name.startswith("_"):
+            register_script(name)
+
 
 def is_command(user_input):
     """Determine if input is a command (task automation) or casual chat."""
@@ -13,14 +46,33 @@ def process_command(command):
     print("Thinking...")
 
     if is_command(command):
-        available_scripts = get_available_scripts()
-
-        if command in available_scripts:
+        if registry.get(command) is not None:
+            registry.record_use(command)
             execute_script(command)
-        else:
-            script_code = process_with_ai(f"Generate a Python script for: {command}")
-            script_name = generate_script(command, script_code)
-            execute_script(script_name)
+            return
+
+        cached = script_cache.lookup(command)
+        if cached is not None:
+            # The same intent as a command that worked: skip code generation
+            script_name = generate_script(cached["command"], cached["code"])
+            register_script(script_name)
+            script_cache.record(cached["id"], execute_script(script_name))
+            return
+
+        prompt = f"Generate a Python script for: {command}"
+        similar = script_cache.similar(command)
+        if similar is not None:
+            # A near-match may act on other arguments, so it is only a
+            # starting point for the new script
+            prompt += (
+                f"\n\nThis script worked for the similar command "
+                f"'{similar['command']}'; adapt it:\n{similar['code']}"
+            )
+        script_code = process_with_ai(prompt)
+        script_name = generate_script(command, script_code)
+        register_script(script_name)
+        if execute_script(script_name):
+            script_cache.store(command, script_code)
     else:
         # If it's not a command, process it as normal conversation
         response = process_with_ai(command)
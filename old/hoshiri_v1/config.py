@@ -10,3 +10,5 @@ ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
 # Storage
 DATABASE_PATH = os.getenv("DATABASE_PATH", "data/scripts_metadata.json")
 MODULES_DIR = os.getenv("MODULES_DIR", "modules/")
+SCRIPT_CACHE_PATH = os.getenv("SCRIPT_CACHE_PATH", "data/scripts.sqlite3")
+REGISTRY_PATH = os.getenv("REGISTRY_PATH", "data/registry.sqlite3")
@@ -19,10 +19,11 @@ def generate_script(name, code):
 
 
 def execute_script(name):
+    """Run a script; return whether it exited cleanly."""
     script_path = os.path.join(MODULES_DIR, f"{name}.py")
 
     if not os.path.exists(script_path):
         print(f"Error: Script '{name}' not found.")
-        return
+        return False
 
-    subprocess.run(["python", script_path])
+    return subprocess.run(["python", script_path]).returncode == 0
@@ -9,18 +9,15 @@ class AnthropicClient:
         self.client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY", "YOUR_API_KEY"))
 
     def interpret_command(self, user_input: str) -> dict:
-        # Use the "chat.completions.create" method (Messages API)
-        response = self.client.chat.completions.create(
-            model="claude-3.5-sonnet-20240620",  # Must be a model your account can use
-            messages=[
-                {"role": "system", "content": "You are Hoshiri, a helpful assistant."},
-                {"role": "user", "content": user_input},
-            ],
-            max_tokens_to_sample=200,
+        response = self.client.messages.create(
+            model="claude-3-5-sonnet-20241022",  # Must be a model your account can use
+            system="You are Hoshiri, a helpful assistant.",
+            messages=[{"role": "user", "content": user_input}],
+            max_tokens=200,
             temperature=1.0,
         )
 
-        # The returned text is in response.completion
-        text = response.completion.strip()
+        # The reply text is in the first content block
+        text = response.content[0].text.strip() if response.content else ""
 
         return {"type": "chat", "response_text": text or "No response from Anthropic."}
@@ -1,14 +1,24 @@
 # hoshiri/engine.py
 import os
-import importlib
-from hoshiri.registry import Registry
-from hoshiri.anthropic_client import AnthropicClient
+import sys
+
+from anthropic_client import AnthropicClient
+
+# The shared hoshiri package is at the repository root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from hoshiri.executor import Executor  # noqa: E402
+from hoshiri.loader import ModuleLoader  # noqa: E402
+from hoshiri.registry import Registry  # noqa: E402
 
 
 class HoshiriEngine:
     def __init__(self):
         self.registry = Registry()
         self.ai_client = AnthropicClient()
+        # Modules run in warm worker processes, isolated from the engine;
+        # each worker recompiles a module only when its file changes, and
+        # their load counts add up in executor.loader_stats
+        self.executor = Executor()
 
     # hoshiri/engine.py
 
@@ -37,6 +47,8 @@ class HoshiriEngine:
 
         with open(file_path, "w") as f:
             f.write(script_content)
+        # Compile now so the first run in a worker doesn't
+        ModuleLoader.precompile(file_path)
 
         module_info = {
             "name": module_name,
@@ -48,12 +60,14 @@ class HoshiriEngine:
 
     def execute_module(self, module_info: dict, command: str) -> str:
         """
-        Imports the module and calls its 'run_command' function.
+        Calls the module's 'run_command' function in a pooled worker
+        process, which recompiles the module if its file changed.
         """
-        try:
-            module_path = module_info["file_path"].replace("/", ".").replace(".py", "")
-            mod = importlib.import_module(module_path)
-            result = mod.run_command(command)
-            return result
-        except Exception as e:
-            return f"Error executing module: {str(e)}"
+        reply = self.executor.run(module_info["file_path"], command)
+        print(reply["stdout"], end="")
+        if not reply["ok"]:
+            return f"Error executing module: {reply['error']}"
+        return reply["result"]
+
+    def close(self):
+        self.executor.close()
@@ -1,7 +1,18 @@
 # main.py
-from dotenv import dotenv_values
 import asyncio
-from anthropic import Anthropic
+import os
+import sys
+
+from dotenv import dotenv_values
+
+# The shared hoshiri package is at the repository root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from hoshiri.client import ApiClient  # noqa: E402
+from hoshiri.engine import AsyncEngine  # noqa: E402
+from hoshiri.executor import Executor  # noqa: E402
+from hoshiri.repair import RepairEngine, extract_code  # noqa: E402
+
+MODEL = "claude-3-5-sonnet-20241022"
 
 
 class Assistant:
@@ -10,52 +21,61 @@ class Assistant:
         api_key = config.get("ANTHROPIC_API_KEY")
         if not api_key:
             raise ValueError("ANTHROPIC_API_KEY not found in .env file")
-        self.client = Anthropic(api_key=api_key)
+        self.engine = AsyncEngine(ApiClient(api_key), MODEL, max_tokens=1024)
+        # Generated code runs in sandboxed workers, not in this process
+        self.executor = Executor()
+        self.repairer = RepairEngine(self.engine, self.executor)
+
+    async def ask(self, content: str):
+        # The engine's requests run on its own loop
+        future = self.engine.submit(
+            self.engine.ask([{"role": "user", "content": content}])
+        )
+        return await asyncio.wrap_future(future)
 
     async def generate_code(self, user_input: str) -> str:
-        response = self.client.messages.create(
-            model="claude-3-sonnet",  # Fixed model name
-            max_tokens=1024,
-            messages=[
-                {
-                    "role": "user",
-                    "content": f"Generate Python code that can handle this request: {user_input}",
-                }
-            ],
+        response = await self.ask(
+            f"Generate Python code that can handle this request: {user_input}"
         )
-        return response.content
-
-    async def execute_code(self, code: str):
-        try:
-            # Execute in the current environment
-            exec(code)
-            # Access the result variable if it exists
-            return locals().get("result", None)
-        except Exception as e:
-            return await self.handle_error(code, e)
-
-    async def handle_error(self, failed_code: str, error: Exception) -> str:
-        response = self.client.messages.create(
-            model="claude-3-sonnet",  # Fixed model name
-            max_tokens=1024,
-            messages=[
-                {
-                    "role": "user",
-                    "content": f"This code failed with error: {str(error)}\n\nCode:\n{failed_code}\n\nPlease fix it.",
-                }
-            ],
+        return extract_code(response.content[0].text)
+
+    async def execute_code(self, code: str, user_input: str = ""):
+        reply = await asyncio.to_thread(
+            self.executor.run, code=code, command=user_input
+        )
+        if reply["ok"]:
+            return reply["result"]
+        return await self.handle_error(code, reply["error"], user_input)
+
+    async def handle_error(self, failed_code: str, error: str, user_input: str = ""):
+        # Candidate fixes are generated and run in parallel, within a deadline
+        future = self.engine.submit(
+            self.repairer.repair(failed_code, error, user_input)
         )
-        return await self.execute_code(response.content)
+        outcome = await asyncio.wrap_future(future)
+        if outcome["ok"]:
+            return outcome["result"]
+        return f"Error: {outcome['error']}"
 
     async def process_request(self, user_input: str):
         code = await self.generate_code(user_input)
-        result = await self.execute_code(code)
+        result = await self.execute_code(code, user_input)
         return result
 
+    def close(self):
+        self.executor.close()
+        self.engine.close()
+
 
 async def main():
     try:
         assistant = Assistant()
+    except ValueError as e:
+        print(f"Error: {e}")
+        print("Please make sure you have a .env file with ANTHROPIC_API_KEY set")
+        return
+
+    try:
         while True:
             user_input = input("> ")
             if user_input.lower() in ["exit", "quit"]:
@@ -63,9 +83,8 @@ async def main():
 
             result = await assistant.process_request(user_input)
             print(result)
-    except ValueError as e:
-        print(f"Error: {e}")
-        print("Please make sure you have a .env file with ANTHROPIC_API_KEY set")
+    finally:
+        assistant.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,60 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from hoshiri.attachments import AttachmentStore
+
+
+class TestAttachmentStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.calls = []
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def prepare(self, path):
+        self.calls.append(path)
+        return {"type": "text", "text": path.read_text()}
+
+    def write(self, name, text):
+        path = self.dir / name
+        path.write_text(text)
+        return path
+
+    def test_block_is_encoded_once(self):
+        store = AttachmentStore()
+        path = self.write("a.txt", "hello")
+
+        first = store.get(path, self.prepare)
+        second = store.get(path, self.prepare)
+
+        self.assertIs(first, second)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual((store.hits, store.misses), (1, 1))
+
+    def test_same_content_shares_entry(self):
+        store = AttachmentStore()
+        store.get(self.write("a.txt", "same"), self.prepare)
+        store.get(self.write("b.txt", "same"), self.prepare)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_evicts_least_recently_used(self):
+        store = AttachmentStore(max_bytes=10)
+        a = self.write("a.txt", "aaaa")
+        b = self.write("b.txt", "bbbb")
+        c = self.write("c.txt", "cccc")
+
+        store.get(a, self.prepare)
+        store.get(b, self.prepare)
+        store.get(a, self.prepare)
+        store.get(c, self.prepare)
+        self.assertEqual(store.size, 8)
+
+        store.get(b, self.prepare)
+        self.assertEqual(self.calls, [a, b, c, b])
+
+
+if __name__ == "__main__":
+    unittest.main()
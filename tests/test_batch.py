@@ -0,0 +1,114 @@
+import asyncio
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+from hoshiri.batch import BatchRunner, completed_ids, load_prompts
+
+
+def reply(text):
+    return SimpleNamespace(
+        content=[SimpleNamespace(type="text", text=text)],
+        stop_reason="end_turn",
+        usage=SimpleNamespace(input_tokens=3, output_tokens=2),
+    )
+
+
+class FakeEngine:
+    def __init__(self, failures=None):
+        self.failures = failures or {}
+        self.calls = []
+
+    async def ask(self, messages, **kwargs):
+        prompt = messages[0]["content"]
+        self.calls.append(prompt)
+        errors = self.failures.get(prompt)
+        if errors:
+            raise errors.pop(0)
+        return reply(prompt.upper())
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.output = self.dir / "out.jsonl"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_batch(self, engine, prompts):
+        runner = BatchRunner(engine, self.output, workers=2)
+        return asyncio.run(runner.run(prompts))
+
+    def results(self):
+        return [json.loads(line) for line in self.output.read_text().splitlines()]
+
+    def test_load_prompts(self):
+        source = self.dir / "in.jsonl"
+        source.write_text(
+            '{"request_id": "a", "body": "first"}\n'
+            "\n"
+            '{"prompt": "second", "max_tokens": 10}\n'
+        )
+        prompts = load_prompts(source)
+        self.assertEqual([p["custom_id"] for p in prompts], ["a", "line-3"])
+        self.assertEqual(prompts[0]["messages"][0]["content"], "first")
+        self.assertEqual(prompts[1]["max_tokens"], 10)
+
+        for text, error in [
+            ('{"prompt": "a"}\n{"prompt": \n', "Line 2 is not valid JSON"),
+            ('["a"]\n', "Line 1 is not a JSON object"),
+        ]:
+            source.write_text(text)
+            with self.assertRaisesRegex(ValueError, error):
+                load_prompts(source)
+
+    def test_failures_are_recorded(self):
+        engine = FakeEngine({"two": [ValueError("bad")]})
+        prompts = [
+            {"custom_id": "1", "messages": [{"role": "user", "content": "one"}]},
+            {"custom_id": "2", "messages": [{"role": "user", "content": "two"}]},
+        ]
+        counts = self.run_batch(engine, prompts)
+
+        self.assertEqual(counts["succeeded"], 1)
+        self.assertEqual(counts["failed"], 1)
+        records = {r["custom_id"]: r for r in self.results()}
+        self.assertEqual(records["1"]["text"], "ONE")
+        self.assertEqual(records["2"]["error"], "bad")
+
+    def test_rerun_skips_finished_prompts(self):
+        # A previous run finished "1", failed "2" and died while writing
+        self.output.write_text(
+            '{"custom_id": "1", "text": "ONE"}\n'
+            '{"custom_id": "2", "error": "overloaded"}\n'
+            '{"custom_id": "3", "te'
+        )
+        prompts = [
+            {"custom_id": str(i), "messages": [{"role": "user", "content": text}]}
+            for i, text in enumerate(["one", "two", "three"], 1)
+        ]
+        engine = FakeEngine()
+        counts = self.run_batch(engine, prompts)
+
+        self.assertEqual(counts["skipped"], 1)
+        self.assertEqual(sorted(engine.calls), ["three", "two"])
+        self.assertEqual(completed_ids(self.output), {"1", "2", "3"})
+
+    def test_completed_ids_skips_lines_that_are_not_results(self):
+        self.output.write_text(
+            '{"custom_id": "1", "text": "ONE"}\n'
+            "[1, 2]\n"
+            '"text"\n'
+            "null\n"
+            '{"text": "no id"}\n'
+            '{"custom_id": ["2"], "text": "TWO"}\n'
+        )
+        self.assertEqual(completed_ids(self.output), {"1"})
+
+
+if __name__ == "__main__":
+    unittest.main()
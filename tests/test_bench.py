@@ -0,0 +1,79 @@
+import asyncio
+import json
+import os
+import unittest
+
+from hoshiri.bench import Bench, compare, flatten
+from hoshiri.client import ApiClient
+from hoshiri.mockapi import REPLY, MockApi
+
+
+class TestMockApi(unittest.TestCase):
+    def test_stream_and_create(self):
+        with MockApi(chunks=5) as mock:
+            loop = asyncio.new_event_loop()
+            api = ApiClient("test-key", base_url=mock.url, max_retries=0)
+            pieces = []
+
+            async def send():
+                request = {
+                    "model": "mock",
+                    "max_tokens": 10,
+                    "messages": [{"role": "user", "content": "hi"}],
+                }
+                streamed = await api.stream(pieces.append, **request)
+                created = await api.create(**request)
+                await api.aclose()
+                return streamed, created
+
+            try:
+                streamed, created = loop.run_until_complete(send())
+            finally:
+                loop.close()
+
+        self.assertGreater(len(pieces), 1)
+        self.assertEqual("".join(pieces), REPLY)
+        self.assertEqual(streamed.content[0].text, REPLY)
+        self.assertEqual(created.content[0].text, REPLY)
+        self.assertGreater(streamed.usage.output_tokens, 1)
+        self.assertEqual(mock.requests, 2)
+        self.assertIsNotNone(api.stats.calls[0]["first_token"])
+
+
+class TestBench(unittest.TestCase):
+    def test_benchmarks_run_against_the_mock(self):
+        from main import HoshiriChat
+
+        cwd, key = os.getcwd(), os.environ.get("ANTHROPIC_API_KEY")
+        bench = Bench(HoshiriChat, latency=0.0, turns=6)
+
+        ttft = bench.first_token(turns=2)
+        self.assertGreater(ttft["p50_ms"], 0)
+        overhead = bench.turn_overhead(lengths=(0, 4), turns=2)
+        self.assertEqual(set(overhead), {"0", "4"})
+        self.assertIn("build", overhead["4"]["stages_p50_ms"])
+        self.assertIn("binary_1mb", bench.encoding(sizes_mb=(1,)))
+        self.assertEqual(bench.save_load()["entries"], 12)
+        memory = bench.memory(samples=3)
+        self.assertEqual(memory["history_entries"], 14)
+        self.assertEqual([g["turn"] for g in memory["growth"]], [2, 4, 6])
+
+        self.assertEqual(os.getcwd(), cwd)
+        self.assertEqual(os.environ.get("ANTHROPIC_API_KEY"), key)
+        json.dumps(ttft)
+
+    def test_compare(self):
+        before = {"meta": {"turns": 10}, "a": {"x": 10.0, "y": [1]}, "b": 0}
+        after = {"meta": {"turns": 20}, "a": {"x": 15.0}, "b": 1}
+        self.assertEqual(flatten(before), {"meta.turns": 10, "a.x": 10.0, "b": 0})
+        self.assertEqual(
+            compare(before, after),
+            [
+                {"metric": "a.x", "before": 10.0, "after": 15.0, "change": 50.0},
+                {"metric": "b", "before": 0, "after": 1, "change": None},
+            ],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+import asyncio
+import json
+import threading
+import unittest
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import anthropic
+
+from hoshiri.client import ApiClient
+
+MESSAGE = {
+    "id": "msg_1",
+    "type": "message",
+    "role": "assistant",
+    "model": "model",
+    "content": [{"type": "text", "text": "hello"}],
+    "stop_reason": "end_turn",
+    "stop_sequence": None,
+    "usage": {"input_tokens": 5, "output_tokens": 1},
+}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.requests += 1
+        self.server.ports.add(self.client_address[1])
+        status, headers, body = self.server.replies.pop(0)
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def overloaded():
+    error = {"type": "overloaded_error", "message": "Overloaded"}
+    return 529, {}, {"type": "error", "error": error}
+
+
+class TestApiClient(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        self.server.replies = []
+        self.server.requests = 0
+        self.server.ports = set()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.loop = asyncio.new_event_loop()
+        self.api = ApiClient(
+            "test-key",
+            base_url=f"http://127.0.0.1:{self.server.server_port}",
+            max_retries=2,
+            base_delay=0,
+        )
+
+    def tearDown(self):
+        self.loop.run_until_complete(self.api.aclose())
+        self.loop.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def create(self):
+        async def send():
+            return await self.api.create(
+                model="model", max_tokens=10, messages=[{"role": "user", "content": "hi"}]
+            )
+
+        return self.loop.run_until_complete(send())
+
+    def test_overloaded_is_retried(self):
+        self.server.replies = [overloaded(), (200, {}, MESSAGE)]
+
+        message = self.create()
+
+        self.assertEqual(message.content[0].text, "hello")
+        self.assertEqual(self.server.requests, 2)
+        self.assertEqual(self.api.stats.last["retries"], 1)
+        self.assertEqual(self.api.stats.summary()["input_tokens"], 5)
+
+    def test_calls_are_found_by_message(self):
+        self.server.replies = [
+            (200, {}, MESSAGE),
+            overloaded(),
+            (200, {}, dict(MESSAGE, id="msg_2")),
+        ]
+        self.create()
+        self.create()
+
+        self.assertEqual(self.api.stats.find("msg_1")["retries"], 0)
+        self.assertEqual(self.api.stats.find("msg_2")["retries"], 1)
+        self.assertIsNone(self.api.stats.find("msg_3"))
+
+    def test_gives_up_after_max_retries(self):
+        self.server.replies = [overloaded() for _ in range(3)]
+
+        with self.assertRaises(anthropic.APIStatusError):
+            self.create()
+        self.assertEqual(self.server.requests, 3)
+        self.assertEqual(self.api.stats.summary()["errors"], 1)
+
+    def test_bad_request_is_not_retried(self):
+        error = {"type": "invalid_request_error", "message": "bad"}
+        self.server.replies = [(400, {}, {"type": "error", "error": error})]
+
+        with self.assertRaises(anthropic.BadRequestError):
+            self.create()
+        self.assertEqual(self.server.requests, 1)
+
+    def test_exhausted_limit_paces_next_request(self):
+        reset = datetime.now(timezone.utc) + timedelta(seconds=30)
+        headers = {
+            "anthropic-ratelimit-requests-limit": "50",
+            "anthropic-ratelimit-requests-remaining": "0",
+            "anthropic-ratelimit-requests-reset": reset.isoformat(),
+        }
+        self.server.replies = [(200, headers, MESSAGE)]
+
+        self.create()
+
+        self.assertEqual(self.api.limiter.limits["requests"]["remaining"], 0)
+        self.assertGreater(self.api.limiter.delay(), 25)
+
+    def test_connection_is_reused(self):
+        self.server.replies = [(200, {}, MESSAGE), (200, {}, MESSAGE)]
+
+        async def send_twice():
+            for _ in range(2):
+                await self.api.create(
+                    model="model",
+                    max_tokens=10,
+                    messages=[{"role": "user", "content": "hi"}],
+                )
+
+        self.loop.run_until_complete(send_twice())
+        self.assertEqual(len(self.server.ports), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
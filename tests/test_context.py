@@ -0,0 +1,61 @@
+import unittest
+from types import SimpleNamespace
+
+from hoshiri.context import ContextManager
+
+
+class FakeMessages:
+    def __init__(self):
+        self.calls = []
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        return SimpleNamespace(content=[SimpleNamespace(text="earlier notes")])
+
+
+def turn(role, text):
+    return {"role": role, "content": [{"type": "text", "text": text}]}
+
+
+class TestContextManager(unittest.TestCase):
+    def setUp(self):
+        self.client = SimpleNamespace(messages=FakeMessages())
+        self.context = ContextManager(
+            self.client, "model", budget=100, keep_recent=2, compact_at=0.5
+        )
+
+    def test_count_is_cached_on_entry(self):
+        entry = turn("user", "x" * 40)
+        self.assertEqual(self.context.count(entry), 10)
+        self.assertEqual(entry["tokens"], 10)
+
+    def test_under_budget_is_left_alone(self):
+        history = [turn("user", "hi"), turn("assistant", "hello")]
+        self.assertFalse(self.context.maybe_compact(history))
+        self.assertFalse(self.context.is_summarizing())
+        self.assertEqual(self.client.messages.calls, [])
+
+    def test_older_turns_are_replaced_by_summary(self):
+        history = [
+            turn("user", "a" * 100),
+            turn("assistant", "b" * 100),
+            turn("user", "c" * 40),
+            turn("assistant", "d" * 40),
+        ]
+        recent = history[2:]
+
+        self.assertFalse(self.context.maybe_compact(history))
+        self.context._worker.join()
+        self.assertTrue(self.context.maybe_compact(history))
+
+        self.assertEqual(len(history), 4)
+        self.assertIn("earlier notes", history[0]["content"][0]["text"])
+        self.assertEqual(history[0]["role"], "user")
+        self.assertEqual(history[1]["role"], "assistant")
+        self.assertIs(history[2], recent[0])
+        self.assertIs(history[3], recent[1])
+        self.assertEqual(self.context.usage(history)["compactions"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+
+from hoshiri.documents import DocumentCache, extract
+
+W = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+A = 'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main"'
+P = 'xmlns:p="http://schemas.openxmlformats.org/presentationml/2006/main"'
+S = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+R = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+RELS = 'xmlns="http://schemas.openxmlformats.org/package/2006/relationships"'
+
+
+def package(path, parts):
+    with zipfile.ZipFile(path, "w") as z:
+        for name, xml in parts.items():
+            z.writestr(name, xml)
+    return path
+
+
+def rels(*targets):
+    items = "".join(
+        f'<Relationship Id="rId{i}" Target="{target}"/>'
+        for i, target in enumerate(targets, 1)
+    )
+    return f"<Relationships {RELS}>{items}</Relationships>"
+
+
+def docx(path):
+    body = (
+        '<w:p><w:pPr><w:pStyle w:val="Heading1"/></w:pPr><w:r><w:t>Budget</w:t></w:r></w:p>'
+        "<w:p><w:r><w:t>Spend rose</w:t></w:r><w:r><w:t> in Q3.</w:t></w:r></w:p>"
+        "<w:p><w:pPr><w:numPr/></w:pPr><w:r><w:t>travel</w:t></w:r></w:p>"
+        "<w:tbl><w:tr><w:tc><w:p><w:r><w:t>Team</w:t></w:r></w:p></w:tc>"
+        "<w:tc><w:p><w:r><w:t>Cost</w:t></w:r></w:p></w:tc></w:tr>"
+        "<w:tr><w:tc><w:p><w:r><w:t>Ops</w:t></w:r></w:p></w:tc>"
+        "<w:tc><w:p><w:r><w:t>12</w:t></w:r></w:p></w:tc></w:tr></w:tbl>"
+    )
+    return package(
+        path,
+        {"word/document.xml": f"<w:document {W}><w:body>{body}</w:body></w:document>"},
+    )
+
+
+def pptx(path):
+    slide = (
+        f"<p:sld {P} {A}><p:cSld><p:spTree><p:sp><p:txBody>"
+        "<a:p><a:r><a:t>{}</a:t></a:r></a:p></p:txBody></p:sp></p:spTree></p:cSld></p:sld>"
+    )
+    return package(
+        path,
+        {
+            "ppt/presentation.xml": f"<p:presentation {P} {R}><p:sldIdLst>"
+            '<p:sldId id="256" r:id="rId2"/><p:sldId id="257" r:id="rId1"/>'
+            "</p:sldIdLst></p:presentation>",
+            "ppt/_rels/presentation.xml.rels": rels(
+                "slides/slide1.xml", "slides/slide2.xml"
+            ),
+            "ppt/slides/slide1.xml": slide.format("Second slide"),
+            "ppt/slides/slide2.xml": slide.format("Opening slide"),
+        },
+    )
+
+
+def xlsx(path, team="2"):
+    return package(
+        path,
+        {
+            "xl/workbook.xml": f"<workbook {S} {R}><sheets>"
+            '<sheet name="Costs" sheetId="1" r:id="rId1"/></sheets></workbook>',
+            "xl/_rels/workbook.xml.rels": rels("worksheets/sheet1.xml"),
+            "xl/sharedStrings.xml": f"<sst {S}><si><t>Team</t></si>"
+            "<si><r><t>Co</t></r><r><t>st</t></r></si><si><t>Ops, EU</t></si></sst>",
+            "xl/worksheets/sheet1.xml": f"<worksheet {S}><sheetData>"
+            '<row r="1"><c r="A1" t="s"><v>0</v></c><c r="C1" t="s"><v>1</v></c></row>'
+            f'<row r="2"><c r="A2" t="s"><v>{team}</v></c><c r="B2" t="b"><v>1</v></c>'
+            '<c r="C2"><f>SUM(1,2)</f><v>3</v></c></row>'
+            "</sheetData></worksheet>",
+        },
+    )
+
+
+class TestExtract(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_docx(self):
+        text = extract(docx(self.root / "report.docx"))
+        self.assertIn("# Budget\n\nSpend rose in Q3.\n\n- travel", text)
+        self.assertIn("| Team | Cost |\n| --- | --- |\n| Ops | 12 |", text)
+
+    def test_pptx_follows_presentation_order(self):
+        text = extract(pptx(self.root / "deck.pptx"))
+        self.assertLess(text.index("Opening slide"), text.index("Second slide"))
+        self.assertIn("## Slide 1\n\nOpening slide", text)
+
+    def test_xlsx_as_csv(self):
+        text = extract(xlsx(self.root / "costs.xlsx"))
+        self.assertIn('## Sheet: Costs\n\nTeam,,Cost\n"Ops, EU",TRUE,3', text)
+
+    def test_broken_file(self):
+        path = self.root / "broken.docx"
+        path.write_bytes(b"not a zip")
+        with self.assertRaisesRegex(ValueError, "Could not read broken.docx"):
+            extract(path)
+
+    def test_malformed_parts(self):
+        path = package(
+            self.root / "empty.docx",
+            {"word/document.xml": f"<w:document {W}></w:document>"},
+        )
+        with self.assertRaisesRegex(ValueError, "has no body"):
+            extract(path)
+
+        path = xlsx(self.root / "costs.xlsx", team="7")
+        with self.assertRaisesRegex(ValueError, "bad shared string '7'"):
+            extract(path)
+
+
+class TestDocumentCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.cache = DocumentCache(self.root / "extracted", workers=2)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_extracts_in_parallel_and_caches(self):
+        broken = self.root / "broken.xlsx"
+        broken.write_bytes(b"nope")
+        documents = [
+            (docx(self.root / "a.docx"), "d1"),
+            (xlsx(self.root / "b.xlsx"), "d2"),
+            (broken, "d3"),
+            (xlsx(self.root / "c.xlsx", team="x"), "d4"),
+        ]
+        results = self.cache.extract_many(documents)
+        self.assertEqual(results["d1"].name, "a.docx.md")
+        self.assertIn("Sheet: Costs", results["d2"].read_text())
+        self.assertIsInstance(results["d3"], ValueError)
+        self.assertIsInstance(results["d4"], ValueError)
+
+        # Cached by hash: the source is not read again
+        documents[0][0].unlink()
+        self.assertEqual(self.cache.get(self.root / "a.docx", "d1"), results["d1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import asyncio
+import threading
+import unittest
+import warnings
+from concurrent.futures import CancelledError
+
+from hoshiri.engine import AsyncEngine
+
+
+class FakeApi:
+    """Answers after `delay` seconds, or never while `hold` is set."""
+
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.hold = False
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.cancelled = 0
+        self.started = threading.Event()
+
+    async def create(self, **kwargs):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        self.started.set()
+        try:
+            if self.hold:
+                await asyncio.Event().wait()
+            await asyncio.sleep(self.delay)
+            return kwargs["messages"][0]["content"]
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    async def aclose(self):
+        pass
+
+
+def ask(text):
+    return {"messages": [{"role": "user", "content": text}]}
+
+
+class TestAsyncEngine(unittest.TestCase):
+    def setUp(self):
+        self.api = FakeApi()
+        self.engine = AsyncEngine(self.api, "mock", max_concurrency=2)
+
+    def tearDown(self):
+        self.engine.close()
+
+    def test_concurrency_cap(self):
+        requests = [ask(str(i)) for i in range(6)]
+        results = self.engine.submit(self.engine.ask_many(requests)).result(5)
+        self.assertEqual(results, [str(i) for i in range(6)])
+        self.assertEqual(self.api.max_in_flight, 2)
+
+    def test_cancel_through_submit(self):
+        self.api.hold = True
+        future = self.engine.submit(self.engine.ask(**ask("stuck")))
+        self.assertTrue(self.api.started.wait(5))
+        future.cancel()
+        with self.assertRaises(CancelledError):
+            future.result(5)
+
+        # The request was cancelled on the loop and gave its slot back
+        self.api.hold = False
+        self.api.max_in_flight = 0
+        answers = self.engine.submit(self.engine.ask_many([ask("a"), ask("b")]))
+        self.assertEqual(answers.result(5), ["a", "b"])
+        self.assertEqual(self.api.cancelled, 1)
+        self.assertEqual(self.api.max_in_flight, 2)
+
+    def test_close_cancels_pending_requests_and_closes_the_loop(self):
+        self.api.hold = True
+        future = self.engine.submit(self.engine.ask(**ask("stuck")))
+        self.assertTrue(self.api.started.wait(5))
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", ResourceWarning)
+            self.engine.close()
+        self.assertTrue(self.engine.loop.is_closed())
+        with self.assertRaises(CancelledError):
+            future.result(5)
+        # Closing twice is harmless
+        self.engine.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from hoshiri.executor import Executor
+
+
+class TestExecutor(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.executor = Executor(
+            workers=1, timeout=5, memory_mb=256, max_tasks=3, warm_imports=("json",)
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.executor.close()
+
+    def test_runs_module_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "greet.py"
+            path.write_text(
+                "def run_command(command):\n"
+                "    print('working')\n"
+                "    return {'echo': command}\n"
+            )
+            reply = self.executor.run(path, "hello")
+        self.assertTrue(reply["ok"], reply)
+        self.assertEqual(reply["result"], {"echo": "hello"})
+        self.assertEqual(reply["stdout"], "working\n")
+
+    def test_changed_module_is_picked_up(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "version.py"
+            for version in (1, 2):
+                path.write_text(f"def run_command(command):\n    return {version}\n")
+                os.utime(path, ns=(version * 10**9, version * 10**9))
+                self.assertEqual(self.executor.run(path)["result"], version)
+
+    def test_loader_stats_come_back_from_the_workers(self):
+        executor = Executor(workers=1, warm_imports=())
+        self.addCleanup(executor.close)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "counted.py"
+            path.write_text("def run_command(command):\n    return 1\n")
+            for _ in range(2):
+                self.assertTrue(executor.run(path)["ok"])
+        stats = executor.loader_stats
+        self.assertEqual((stats["compiles"], stats["hits"]), (1, 1))
+        self.assertGreater(stats["load_seconds"], 0)
+
+    def test_result_variable_and_errors(self):
+        self.assertEqual(self.executor.run(code="result = 6 * 7")["result"], 42)
+        reply = self.executor.run(code="1 / 0")
+        self.assertFalse(reply["ok"])
+        self.assertIn("ZeroDivisionError", reply["error"])
+
+    def test_timeout_replaces_worker(self):
+        reply = self.executor.run(code="while True: pass", timeout=0.5)
+        self.assertFalse(reply["ok"])
+        self.assertIn("Timed out", reply["error"])
+        self.assertEqual(self.executor.run(code="result = 'alive'")["result"], "alive")
+
+    def test_waiting_for_a_worker_counts_against_the_timeout(self):
+        busy = threading.Thread(
+            target=self.executor.run, kwargs={"code": "import time; time.sleep(1)"}
+        )
+        busy.start()
+        try:
+            # Give the sleeper the only worker
+            time.sleep(0.2)
+            reply = self.executor.run(code="result = 1", timeout=0.3)
+        finally:
+            busy.join()
+        self.assertFalse(reply["ok"])
+        self.assertIn("waiting for a worker", reply["error"])
+        self.assertLess(reply["seconds"], 0.8)
+
+    def test_memory_limit(self):
+        reply = self.executor.run(code="data = bytearray(1024 * 1024 * 1024)")
+        self.assertFalse(reply["ok"])
+        self.assertIn("MemoryError", reply["error"])
+        self.assertTrue(self.executor.run(code="result = 1")["ok"])
+
+    def test_workers_are_recycled(self):
+        code = "import os\nresult = os.getpid()"
+        pids = [self.executor.run(code=code)["result"] for _ in range(4)]
+        self.assertGreater(len(set(pids)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
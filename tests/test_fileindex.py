@@ -0,0 +1,71 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from hoshiri.fileindex import FileIndex, excerpt_block
+
+GUIDE = """# Setup
+
+Install the package with pip and create a virtual environment first.
+
+# Database
+
+Postgres credentials are rotated every month with the vault CLI.
+The rotation job runs at midnight.
+
+# Deployment
+
+Deploys go out through the blue-green pipeline on Fridays.
+"""
+
+
+class TestFileIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.index = FileIndex(self.root / "index.sqlite3", chunk_tokens=20)
+
+    def tearDown(self):
+        self.index.close()
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        path = self.root / name
+        path.write_text(text)
+        return path
+
+    def test_search_returns_matching_chunks(self):
+        guide = self.write("guide.md", GUIDE)
+        other = self.write("notes.txt", "Pasta recipe: boil water, add salt.\n" * 5)
+        chunks = self.index.add(guide, "g")
+        self.assertGreater(chunks, 1)
+        self.assertEqual(self.index.add(guide, "g"), chunks)
+        self.index.add(other, "o")
+
+        found = self.index.search("how do we rotate postgres credentials", ["g", "o"])
+        self.assertTrue(found)
+        self.assertIn("Postgres", found[0]["text"])
+        self.assertTrue(all(chunk["digest"] == "g" for chunk in found))
+        self.assertEqual(self.index.search("postgres", ["o"])[0]["part"], 1)
+
+    def test_outline_lists_structure(self):
+        self.index.add(self.write("guide.md", GUIDE), "g")
+        outline = self.index.outline("g")
+        self.assertTrue(outline.startswith("guide.md: 12 lines"))
+        self.assertIn("5: # Database", outline)
+
+        self.index.add(self.write("data.csv", "id,name\n1,a\n2,b\n"), "c")
+        self.assertIn("1: id,name", self.index.outline("c"))
+
+    def test_excerpts_in_file_order(self):
+        guide = self.write("guide.md", GUIDE)
+        self.index.add(guide, "g")
+        found = self.index.search("deploys postgres", ["g"], k=2)
+        text = excerpt_block("guide.md", self.index.outline("g"), found)["text"]
+        self.assertTrue(text.startswith("Excerpts from guide.md"))
+        self.assertLess(text.index("Postgres"), text.index("blue-green"))
+        self.assertIn("[lines ", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import io
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from hoshiri import images
+from hoshiri.images import ImageCache, target_size
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+class TestTargetSize(unittest.TestCase):
+    def test_limits(self):
+        # A 12 MP photo is bound by the pixel budget
+        width, height = target_size(4032, 3024)
+        self.assertLessEqual(width * height, 1_150_000)
+        self.assertAlmostEqual(width / height, 4032 / 3024, places=2)
+        # A long screenshot is bound by its long edge
+        self.assertEqual(target_size(800, 4000)[1], 1568)
+        self.assertEqual(target_size(640, 480), (640, 480))
+
+
+class TestImageCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.cache = ImageCache(self.root / "images")
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def save(self, name, image, format, **options):
+        path = self.root / name
+        image.save(path, format, **options)
+        return path
+
+    def test_without_pillow_images_pass_through(self):
+        path = self.root / "shot.png"
+        path.write_bytes(b"\x89PNG raw bytes")
+        with mock.patch.object(images, "Image", None):
+            cache = ImageCache(self.root / "other")
+            self.assertFalse(cache.available)
+            data, media = cache.get(path, "image/png", "abc")
+            cache.close()
+        self.assertEqual((data, media), (b"\x89PNG raw bytes", "image/png"))
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            ImageCache(self.root / "x", format="bmp")
+
+    @unittest.skipIf(Image is None, "Pillow is not installed")
+    def test_large_photo_is_shrunk_and_cached(self):
+        photo = Image.effect_noise((300, 200), 60).resize((3000, 2000))
+        path = self.save("photo.png", photo.convert("RGB"), "PNG")
+        data, media = self.cache.get(path, "image/png", "d1")
+
+        self.assertEqual(media, "image/jpeg")
+        self.assertLess(len(data), path.stat().st_size)
+        with Image.open(io.BytesIO(data)) as shrunk:
+            self.assertEqual(shrunk.size, target_size(3000, 2000))
+
+        # Another cache over the same directory finds the result on disk
+        path.unlink()
+        again = ImageCache(self.root / "images")
+        self.assertEqual(again.get(path, "image/png", "d1"), (data, media))
+        again.close()
+
+    @unittest.skipIf(Image is None, "Pillow is not installed")
+    def test_oversized_image_is_shrunk_even_if_it_compressed_well(self):
+        path = self.save("flat.png", Image.new("RGB", (4000, 3000), "blue"), "PNG")
+        data, media = self.cache.get(path, "image/png", "d6")
+        with Image.open(io.BytesIO(data)) as shrunk:
+            self.assertEqual(shrunk.size, target_size(4000, 3000))
+
+    @unittest.skipIf(Image is None, "Pillow is not installed")
+    def test_small_image_that_would_grow_is_kept(self):
+        path = self.save("icon.png", Image.new("RGB", (32, 32), "red"), "PNG")
+        data, media = self.cache.get(path, "image/png", "d2")
+        self.assertEqual((data, media), (path.read_bytes(), "image/png"))
+
+    @unittest.skipIf(Image is None, "Pillow is not installed")
+    def test_transparency_and_orientation(self):
+        image = Image.new("RGBA", (2000, 1000), (0, 0, 0, 0))
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Rotated 90° clockwise
+        path = self.save("shot.png", image, "PNG", exif=exif)
+        data, media = self.cache.get(path, "image/png", "d3")
+        with Image.open(io.BytesIO(data)) as shrunk:
+            self.assertEqual(shrunk.mode, "RGB")
+            self.assertGreater(shrunk.height, shrunk.width)
+            self.assertEqual(shrunk.getpixel((0, 0)), (255, 255, 255))
+
+    @unittest.skipIf(Image is None, "Pillow is not installed")
+    def test_unreadable_image(self):
+        path = self.root / "broken.bmp"
+        path.write_bytes(b"not an image")
+        with self.assertRaisesRegex(ValueError, "Could not read image broken.bmp"):
+            self.cache.get(path, "image/bmp", "d4")
+        path = self.root / "broken.png"
+        path.write_bytes(b"not an image")
+        self.assertEqual(self.cache.get(path, "image/png", "d5")[0], b"not an image")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+import asyncio
+import re
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+from hoshiri.largefile import LargeFile, MapReduce, chunk_spans, notes_block
+
+
+def reply(text):
+    return SimpleNamespace(
+        content=[SimpleNamespace(type="text", text=text)],
+        usage=SimpleNamespace(input_tokens=10, output_tokens=2),
+    )
+
+
+class FakeEngine:
+    """Answers map prompts with the ERROR lines of the part, or NONE."""
+
+    def __init__(self, fail_part=None):
+        self.fail_part = fail_part
+        self.prompts = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def ask(self, messages, **kwargs):
+        prompt = messages[0]["content"]
+        self.prompts.append(prompt)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0)
+            part = re.match(r"Below is part (\d+)", prompt)
+            if part is None:
+                return reply(f"merged {prompt.count('[part ')}")
+            if int(part.group(1)) == self.fail_part:
+                raise ValueError("overloaded")
+            errors = re.findall(r"^ERROR.*$", prompt, re.MULTILINE)
+            return reply("\n".join(errors) or "NONE")
+        finally:
+            self.in_flight -= 1
+
+
+class TestLargeFile(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "app.log"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_chunks_end_on_line_boundaries(self):
+        lines = [f"line {i} {'x' * (i % 7)}\n" for i in range(1, 200)]
+        self.path.write_text("".join(lines))
+        with LargeFile(self.path, chunk_tokens=25) as large:
+            chunks = list(large.chunks())
+            self.assertEqual(len(large), len(chunks))
+            self.assertTrue(all(end - start <= 100 for start, end in large.spans))
+
+        self.assertEqual("".join(c["text"] for c in chunks), "".join(lines))
+        for chunk in chunks:
+            self.assertTrue(chunk["text"].endswith("\n"))
+            first = chunk["text"].split()[1]
+            self.assertEqual(int(first), chunk["first_line"])
+        self.assertEqual(chunks[-1]["last_line"], 199)
+
+    def test_long_lines_split_between_characters(self):
+        data = "é" * 100
+        spans = list(chunk_spans(data.encode(), 15))
+        self.assertTrue(all(end - start <= 15 for start, end in spans))
+        raw = data.encode()
+        self.assertEqual("".join(raw[s:e].decode() for s, e in spans), data)
+
+    def test_invalid_utf8_and_empty_files(self):
+        self.path.write_bytes(b"ok\n\xff\xfe bad bytes\n")
+        with LargeFile(self.path) as large:
+            text = next(large.chunks())["text"]
+        self.assertIn("�", text)
+
+        self.path.write_bytes(b"")
+        with LargeFile(self.path) as large:
+            self.assertEqual(list(large.chunks()), [])
+
+
+class TestMapReduce(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "app.log"
+        lines = [f"INFO request {i} served\n" for i in range(400)]
+        lines[50] = "ERROR disk full\n"
+        lines[390] = "ERROR timeout\n"
+        self.path.write_text("".join(lines))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_map_keeps_relevant_parts_in_order(self):
+        engine = FakeEngine()
+        reader = MapReduce(engine, concurrency=3, chunk_tokens=250)
+        progress = []
+        result = asyncio.run(
+            reader.notes(self.path, "Which errors?", lambda d, t: progress.append(d))
+        )
+
+        self.assertEqual(result["parts"], len(engine.prompts))
+        self.assertEqual(result["relevant"], 2)
+        self.assertEqual(result["merges"], 0)
+        self.assertLess(
+            result["text"].index("disk full"), result["text"].index("timeout")
+        )
+        self.assertIn("lines ", result["text"])
+        self.assertEqual(progress, list(range(1, result["parts"] + 1)))
+        self.assertLessEqual(engine.max_in_flight, 3)
+
+    def test_failed_parts_are_counted(self):
+        engine = FakeEngine(fail_part=1)
+        reader = MapReduce(engine, chunk_tokens=250)
+        result = asyncio.run(reader.notes(self.path, "Which errors?"))
+        self.assertEqual(result["failed"], 1)
+        self.assertIn(
+            "1 parts could not be read", notes_block("app.log", result)["text"]
+        )
+
+    def test_notes_over_budget_are_merged(self):
+        self.path.write_text("ERROR something broke\n" * 400)
+        engine = FakeEngine()
+        usage = []
+        reader = MapReduce(
+            engine, chunk_tokens=250, notes_tokens=600, on_usage=usage.append
+        )
+        result = asyncio.run(reader.notes(self.path, "Which errors?"))
+
+        self.assertGreater(result["merges"], 0)
+        # Every map and merge response is reported
+        self.assertEqual(len(usage), len(engine.prompts))
+        self.assertLessEqual(len(result["text"]), 600 * 4)
+        self.assertTrue(result["text"].startswith("merged"))
+
+    def test_answer_asks_once_more_over_the_notes(self):
+        engine = FakeEngine()
+        reader = MapReduce(engine, chunk_tokens=250)
+        asyncio.run(reader.answer(self.path, "Which errors?"))
+        final = engine.prompts[-1]
+        self.assertTrue(final.startswith("The file app.log is too large"))
+        self.assertTrue(final.endswith("Which errors?"))
+
+
+if __name__ == "__main__":
+    unittest.main()
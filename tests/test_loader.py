@@ -0,0 +1,55 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from hoshiri.loader import ModuleLoader
+
+
+class TestModuleLoader(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "generated.py"
+        self.loader = ModuleLoader()
+
+    def tearDown(self):
+        self.loader.invalidate(self.path)
+        self.tmp.cleanup()
+
+    def write(self, value, mtime_ns):
+        self.path.write_text(f"def run_command(command):\n    return {value!r}\n")
+        os.utime(self.path, ns=(mtime_ns, mtime_ns))
+
+    def test_unchanged_module_is_reused(self):
+        self.write("one", 1_000_000_000)
+        first = self.loader.load(self.path)
+        self.assertIs(self.loader.load(self.path), first)
+        self.assertEqual(self.loader.stats["compiles"], 1)
+        self.assertIs(sys.modules[ModuleLoader.module_name(self.path)], first)
+
+    def test_regenerated_module_is_reloaded(self):
+        self.write("one", 1_000_000_000)
+        self.assertEqual(self.loader.load(self.path).run_command(""), "one")
+        self.write("two", 2_000_000_000)
+        module = self.loader.load(self.path)
+        self.assertEqual(module.run_command(""), "two")
+        self.assertEqual(self.loader.stats["reloads"], 1)
+        self.assertIs(sys.modules[ModuleLoader.module_name(self.path)], module)
+
+    def test_touch_without_edit_skips_recompile(self):
+        self.write("one", 1_000_000_000)
+        first = self.loader.load(self.path)
+        os.utime(self.path, ns=(3_000_000_000, 3_000_000_000))
+        self.assertIs(self.loader.load(self.path), first)
+        self.assertEqual(self.loader.stats["compiles"], 1)
+
+    def test_precompile_writes_bytecode(self):
+        self.write("one", 1_000_000_000)
+        pyc = ModuleLoader.precompile(self.path)
+        self.assertTrue(pyc.exists())
+        self.assertEqual(pyc.parent.name, "__pycache__")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import copy
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+from main import CACHE_MIN_CHARS, MAX_CACHE_BREAKPOINTS, HoshiriChat
+
+
+def breakpoints(system, messages):
+    blocks = system + [block for m in messages for block in m["content"]]
+    return sum("cache_control" in block for block in blocks)
+
+
+def text(size, label="x"):
+    return {"type": "text", "text": label * size}
+
+
+class TestBuildMessages(unittest.TestCase):
+    def setUp(self):
+        # Only the state build_system and build_messages read
+        self.chat = HoshiriChat.__new__(HoshiriChat)
+        self.chat.system_prompt = "You are Hoshiri."
+        self.chat.conversation_history = []
+        self.attachment = {
+            "type": "document",
+            "source": {"type": "base64", "data": "d" * CACHE_MIN_CHARS * 2},
+        }
+        self.chat.uploads = SimpleNamespace(find=lambda digest: Path(digest))
+        self.chat.attachments = SimpleNamespace(remember=lambda path, digest: None)
+        self.chat.prepare_file_message = lambda path: self.attachment
+
+    def turn(self, role, *blocks):
+        self.chat.conversation_history.append({"role": role, "content": list(blocks)})
+
+    def test_short_system_prompt_has_no_breakpoint(self):
+        self.assertNotIn("cache_control", self.chat.build_system()[0])
+        self.chat.system_prompt = "x" * CACHE_MIN_CHARS
+        self.assertIn("cache_control", self.chat.build_system()[0])
+
+    def test_at_most_four_breakpoints(self):
+        for long_system in (False, True):
+            if long_system:
+                self.chat.system_prompt = "x" * CACHE_MIN_CHARS
+            self.chat.conversation_history = []
+            self.turn("user", text(10, "q"))
+            self.turn("assistant", text(10, "a"))
+            self.turn(
+                "user",
+                *[text(CACHE_MIN_CHARS + i) for i in range(6)],
+                text(10, "q"),
+            )
+            messages = self.chat.build_messages(memory=text(10, "m"))
+            self.assertEqual(
+                breakpoints(self.chat.build_system(), messages), MAX_CACHE_BREAKPOINTS
+            )
+            # The largest attachments get the breakpoints left over
+            marked = [b for b in messages[-1]["content"] if "cache_control" in b]
+            self.assertEqual(len(marked[-1]["text"]), CACHE_MIN_CHARS + 5)
+
+    def test_history_and_cached_blocks_are_not_mutated(self):
+        reference = {"type": "attachment", "digest": "abc", "path": "report.pdf"}
+        self.turn("user", reference, text(10, "q"))
+        self.turn("assistant", text(10, "a"))
+        self.turn("user", reference, text(10, "q"))
+        history = copy.deepcopy(self.chat.conversation_history)
+        attachment = copy.deepcopy(self.attachment)
+
+        messages = self.chat.build_messages(memory=text(10, "m"))
+
+        self.assertIn("cache_control", messages[-2]["content"][-1])
+        self.assertIn("cache_control", messages[-1]["content"][0])
+        self.assertEqual(self.chat.conversation_history, history)
+        self.assertEqual(self.attachment, attachment)
+
+
+if __name__ == "__main__":
+    unittest.main()
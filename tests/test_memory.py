@@ -0,0 +1,88 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from hoshiri.memory import MemoryIndex
+from hoshiri.text import match_expression
+from hoshiri.sessions import SessionLog
+
+
+def turn(role, text):
+    return {
+        "role": role,
+        "content": [{"type": "text", "text": text}],
+        "timestamp": "2026-01-02T10:00:00",
+    }
+
+
+class TestMemoryIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.memory = MemoryIndex(self.root / "memory.sqlite3", chunk_chars=100)
+
+    def tearDown(self):
+        self.memory.close()
+        self.tmp.cleanup()
+
+    def log(self, session_id, *entries):
+        log = SessionLog(self.root, session_id)
+        for entry in entries:
+            log.append(entry)
+        log.close()
+        return log.path
+
+    def test_search_ranks_matching_turns(self):
+        path = self.log(
+            "old",
+            turn("user", "How do I rotate the Postgres credentials?"),
+            turn("assistant", "Use the vault CLI to rotate Postgres passwords."),
+            turn("user", "What is a good pasta recipe?"),
+        )
+        self.assertEqual(self.memory.index_session(path), 3)
+
+        results = self.memory.search("remind me how we rotated postgres", k=2)
+        self.assertEqual(len(results), 2)
+        self.assertTrue(all("Postgres" in r["text"] for r in results))
+        self.assertEqual(results[0]["session"], "old")
+        self.assertEqual(self.memory.search("postgres", exclude_session="old"), [])
+
+    def test_only_new_lines_are_indexed(self):
+        log = SessionLog(self.root, "live")
+        log.append(turn("user", "first question about kubernetes"))
+        self.memory.index_session(log.path)
+        log.append(turn("assistant", "an answer about kubernetes"))
+        self.assertEqual(self.memory.index_session(log.path), 1)
+        self.assertEqual(self.memory.index_session(log.path), 0)
+        log.close()
+        self.assertEqual(self.memory.count(), 2)
+
+    def test_bad_legacy_dumps_raise_value_error(self):
+        good = self.root / "hoshiri_chat_good.json"
+        good.write_text(json.dumps([turn("user", "notes on terraform state")]))
+        self.assertEqual(self.memory.index_legacy(good), 1)
+
+        for name, data in [
+            ("truncated", '[{"role": "user"'),
+            ("object", '{"role": "user"}'),
+            ("strings", '[{"role": "user", "content": "plain text"}]'),
+        ]:
+            path = self.root / f"hoshiri_chat_{name}.json"
+            path.write_text(data)
+            with self.assertRaises(ValueError):
+                self.memory.index_legacy(path)
+        self.assertEqual(self.memory.count(), 1)
+
+    def test_long_text_is_chunked(self):
+        text = "\n\n".join(f"paragraph {i} " + "x" * 30 for i in range(6))
+        chunks = list(self.memory.chunks(text))
+        self.assertEqual(len(chunks), 3)
+        self.assertTrue(all(len(chunk) <= 100 for chunk in chunks))
+
+    def test_stopwords_only_query_matches_nothing(self):
+        self.assertIsNone(match_expression("what can you do?"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import json
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+from hoshiri.metrics import Metrics, cost
+
+MODEL = "claude-3-5-sonnet-20241022"
+
+
+def usage(input_tokens, output_tokens, cache_write=0, cache_read=0):
+    return SimpleNamespace(
+        input_tokens=input_tokens,
+        output_tokens=output_tokens,
+        cache_creation_input_tokens=cache_write,
+        cache_read_input_tokens=cache_read,
+    )
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_cost(self):
+        tokens = {"input": 1_000_000, "output": 100_000, "cache_read": 1_000_000}
+        self.assertAlmostEqual(cost(MODEL, tokens), 3.0 + 1.5 + 0.3)
+        self.assertIsNone(cost("some-other-model", tokens))
+
+    def test_turn_spans_and_usage(self):
+        metrics = Metrics(MODEL, export_path=self.root / "turns.jsonl")
+        metrics.start_turn(files=1)
+        with metrics.span("prepare"):
+            time.sleep(0.01)
+        metrics.add("render", 0.002)
+        metrics.add("render", 0.003)
+        spent = metrics.record_usage(usage(1000, 200, cache_write=500))
+        turn = metrics.end_turn()
+
+        self.assertGreaterEqual(turn["spans"]["prepare"], 0.01)
+        self.assertAlmostEqual(turn["spans"]["render"], 0.005)
+        self.assertEqual(turn["tokens"]["cache_write"], 500)
+        self.assertAlmostEqual(spent["cost"], (3000 + 3000 + 1875) / 1_000_000)
+        self.assertEqual(turn["files"], 1)
+        self.assertIsNone(turn["error"])
+
+        # Turns are appended to the export file as they finish
+        metrics.start_turn()
+        metrics.end_turn(error="cancelled")
+        lines = (self.root / "turns.jsonl").read_text().splitlines()
+        self.assertEqual(
+            [json.loads(line)["error"] for line in lines], [None, "cancelled"]
+        )
+
+        summary = metrics.summary()
+        self.assertEqual(summary["turns"], 2)
+        self.assertEqual(summary["stages"]["render"]["count"], 2)
+        self.assertEqual(summary["tokens"]["input"], 1000)
+
+    def test_export(self):
+        metrics = Metrics(MODEL)
+        metrics.start_turn()
+        metrics.add("api", 1.5)
+        metrics.record_usage(usage(10, 20))
+        metrics.end_turn()
+
+        text = metrics.export(self.root / "metrics.prom").read_text()
+        self.assertIn("hoshiri_turns_total 1", text)
+        self.assertIn('hoshiri_stage_seconds_sum{stage="api"} 1.500000', text)
+        self.assertIn('hoshiri_tokens_total{kind="output"} 20', text)
+
+        lines = metrics.export(self.root / "turns.jsonl").read_text().splitlines()
+        self.assertEqual(json.loads(lines[0])["spans"], {"api": 1.5})
+
+
+if __name__ == "__main__":
+    unittest.main()
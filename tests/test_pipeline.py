@@ -0,0 +1,163 @@
+import asyncio
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from hoshiri.executor import Executor
+from hoshiri.pipeline import ModuleRunner, Pipeline, StepCache, extract_plan
+from hoshiri.registry import Registry
+
+
+def steps(*specs):
+    return [
+        {"id": step_id, "command": command, "after": list(after)}
+        for step_id, command, after in specs
+    ]
+
+
+class Runner:
+    """Step functions by command name; records which steps ran."""
+
+    def __init__(self):
+        self.ran = []
+        self.lock = threading.Lock()
+
+    def __call__(self, step, inputs):
+        with self.lock:
+            self.ran.append(step["id"])
+        return getattr(self, step["command"])(inputs)
+
+    def numbers(self, inputs):
+        for i in range(5):
+            yield i
+
+    def slow(self, inputs):
+        time.sleep(0.2)
+        yield "slow"
+
+    def double(self, inputs):
+        for item in inputs["source"]:
+            yield item * 2
+
+    def merge(self, inputs):
+        return [sorted(item for items in inputs.values() for item in items)]
+
+    def fail(self, inputs):
+        raise ValueError("boom")
+
+
+class TestPipeline(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = StepCache(Path(self.tmp.name) / "steps")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_items_stream_through_the_dag(self):
+        plan = steps(
+            ("source", "numbers", []),
+            ("a", "double", ["source"]),
+            ("b", "double", ["source"]),
+            ("end", "merge", ["a", "b"]),
+        )
+        results = asyncio.run(Pipeline(plan, Runner()).run())
+        self.assertEqual(results, {"end": [[0, 0, 2, 2, 4, 4, 6, 6, 8, 8]]})
+
+    def test_independent_branches_run_in_parallel(self):
+        plan = steps(
+            ("one", "slow", []),
+            ("two", "slow", []),
+            ("three", "slow", []),
+            ("end", "merge", ["one", "two", "three"]),
+        )
+        started = time.monotonic()
+        asyncio.run(Pipeline(plan, Runner()).run())
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    def test_rerun_replays_cached_steps(self):
+        plan = steps(("source", "numbers", []), ("double", "double", ["source"]))
+        asyncio.run(Pipeline(plan, Runner(), cache=self.cache).run())
+
+        runner = Runner()
+        pipeline = Pipeline(plan, runner, cache=self.cache)
+        results = asyncio.run(pipeline.run())
+        self.assertEqual(results, {"double": [0, 2, 4, 6, 8]})
+        self.assertEqual(runner.ran, [])
+        self.assertEqual(pipeline.stats["skipped"], ["source"])
+
+    def test_volatile_steps_always_run(self):
+        plan = steps(("source", "numbers", []), ("double", "double", ["source"]))
+        plan[0]["volatile"] = True
+        asyncio.run(Pipeline(plan, Runner(), cache=self.cache).run())
+
+        runner = Runner()
+        asyncio.run(Pipeline(plan, runner, cache=self.cache).run())
+        self.assertEqual(sorted(runner.ran), ["double", "source"])
+
+    def test_failure_reports_the_first_failing_step(self):
+        plan = steps(("source", "fail", []), ("double", "double", ["source"]))
+        with self.assertRaisesRegex(RuntimeError, "Step source failed: boom"):
+            asyncio.run(Pipeline(plan, Runner()).run())
+
+    def test_cycles_are_rejected(self):
+        plan = steps(("a", "double", ["b"]), ("b", "double", ["a"]))
+        with self.assertRaisesRegex(ValueError, "cycle"):
+            Pipeline(plan, Runner())
+
+    def test_module_runner(self):
+        registry = Registry(Path(self.tmp.name) / "registry.sqlite3", legacy_path=None)
+        self.addCleanup(registry.close)
+        executor = Executor(workers=2, timeout=5, warm_imports=())
+        self.addCleanup(executor.close)
+        for name, source in [
+            (
+                "count",
+                "def run_step(command, inputs):\n"
+                "    for i in range(int(command)):\n"
+                "        yield i\n",
+            ),
+            (
+                "total",
+                "def run_step(command, inputs):\n"
+                "    return [sum(inputs['count'])]\n",
+            ),
+            ("hang", "def run_command(command):\n    while True: pass\n"),
+        ]:
+            path = Path(self.tmp.name) / f"{name}.py"
+            path.write_text(source)
+            registry.add_module({"name": name, "file_path": str(path)})
+        runner = ModuleRunner(registry, executor, timeout=1)
+
+        plan = [
+            {"id": "count", "module": "count", "command": "4", "after": []},
+            {"id": "total", "module": "total", "command": "", "after": ["count"]},
+        ]
+        results = asyncio.run(Pipeline(plan, runner).run())
+        self.assertEqual(results, {"total": [6]})
+
+        # A hanging module is killed at the step timeout
+        plan = [{"id": "hang", "module": "hang", "command": "", "after": []}]
+        with self.assertRaisesRegex(RuntimeError, "Step hang failed: Timed out"):
+            asyncio.run(Pipeline(plan, runner).run())
+
+    def test_extract_plan(self):
+        reply = 'Plan:\n```json\n[{"id": "a", "module": "m", "command": "x"}]\n```'
+        self.assertEqual(
+            extract_plan(reply),
+            [{"id": "a", "module": "m", "command": "x", "after": []}],
+        )
+        for plan, error in [
+            ('["a"]', "Step 1 of the plan is not an object"),
+            ('[{"module": "m"}]', "Step 1 of the plan has no id"),
+            ('[{"id": "a", "module": 3}]', "Step 1 of the plan has no module"),
+            ('[{"id": "a", "module": "m", "after": "b"}]', "invalid 'after'"),
+        ]:
+            with self.assertRaisesRegex(ValueError, error):
+                extract_plan(plan)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import json
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from hoshiri.registry import Registry
+
+
+class TestRegistry(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.registry = Registry(self.dir / "registry.sqlite3", legacy_path=None)
+        self.registry.add_module(
+            {
+                "name": "list_unread_emails",
+                "description": "Fetch unread emails from Gmail and list their subjects",
+                "file_path": "modules/list_unread_emails.py",
+                "tags": ["gmail", "email"],
+            }
+        )
+        self.registry.add_module(
+            {
+                "name": "weekly_meetings",
+                "description": "List calendar meetings for the coming week",
+                "file_path": "modules/weekly_meetings.py",
+                "tags": ["calendar"],
+            }
+        )
+
+    def tearDown(self):
+        self.registry.close()
+        self.tmp.cleanup()
+
+    def test_exact_name_wins(self):
+        module = self.registry.find_compatible_module({"module_name": "weekly_meetings"})
+        self.assertEqual(module["file_path"], "modules/weekly_meetings.py")
+
+    def test_command_matches_by_description_and_tags(self):
+        module = self.registry.find_compatible_module(
+            {"command": "list my unread gmail emails"}
+        )
+        self.assertEqual(module["name"], "list_unread_emails")
+        self.assertEqual(module["tags"], ["email", "gmail"])
+
+    def test_weak_match_is_rejected(self):
+        self.assertIsNone(
+            self.registry.find_compatible_module(
+                {"command": "summarize unread slack threads about fundraising"}
+            )
+        )
+
+    def test_add_replaces_module_with_same_name(self):
+        self.registry.add_module(
+            {
+                "name": "weekly_meetings",
+                "description": "Meetings for the next seven days",
+                "file_path": "modules/weekly_meetings_v2.py",
+                "tags": ["calendar", "meetings"],
+            }
+        )
+        self.assertEqual(len(self.registry), 2)
+        self.assertEqual(
+            [m["name"] for m in self.registry.with_tags(["calendar", "meetings"])],
+            ["weekly_meetings"],
+        )
+        module = self.registry.find_compatible_module({"command": "seven days meetings"})
+        self.assertEqual(module["file_path"], "modules/weekly_meetings_v2.py")
+
+    def test_legacy_json_is_imported(self):
+        legacy = self.dir / "registry.json"
+        legacy.write_text(
+            json.dumps(
+                {"modules": [{"name": "demo_module", "file_path": "modules/demo.py"}]}
+            )
+        )
+        registry = Registry(self.dir / "other.sqlite3", legacy_path=legacy)
+        self.assertEqual([m["name"] for m in registry.modules], ["demo_module"])
+        registry.close()
+
+    def test_lookup_is_fast(self):
+        for i in range(2000):
+            self.registry.add_module(
+                {
+                    "name": f"task_{i}",
+                    "description": f"Generated helper number {i} for report {i % 50}",
+                    "file_path": f"modules/task_{i}.py",
+                    "tags": [f"group{i % 20}"],
+                }
+            )
+        command = {"command": "list my unread gmail emails"}
+        self.registry.find_compatible_module(command)
+        started = time.perf_counter()
+        for _ in range(100):
+            self.registry.find_compatible_module(command)
+        self.assertLess((time.perf_counter() - started) / 100, 0.005)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import io
+import unittest
+
+from rich.console import Console
+from rich.markdown import Markdown
+
+from hoshiri.render import IncrementalMarkdown
+
+REPLY = (
+    "# Title\n\nSome *para* text\nmore text.\n\n- a\n- b\n\n"
+    "```python\nx = 1\n\ny = 2\n```\nAfter code.\n\n3. three\n4. four\n\n## Sub\n\nend"
+)
+
+
+INSTALL = (
+    "1. Install:\n\n   ```bash\n   pip install x\n\n   ```\n\n2. Run it\n\nDone.\n"
+)
+LOOSE = "1. a\n\n2. b\n\n   more about b\n"
+INDENTED = "Code:\n\n    a = 1\n\n    b = 2\n\nAfter.\n"
+
+
+def render(renderable) -> str:
+    console = Console(width=60, record=True, file=io.StringIO())
+    console.print(renderable)
+    return console.export_text()
+
+
+class TestIncrementalMarkdown(unittest.TestCase):
+    def test_blocks(self):
+        markdown = IncrementalMarkdown(REPLY)
+        self.assertEqual(
+            markdown.blocks,
+            [
+                "# Title\n",
+                "Some *para* text\nmore text.\n",
+                "- a\n- b\n",
+                "```python\nx = 1\n\ny = 2\n```\n",
+                "After code.\n",
+                "3. three\n4. four\n",
+                "## Sub\n",
+            ],
+        )
+        markdown.finish()
+        self.assertEqual(markdown.blocks[-1], "end")
+
+    def test_streamed_output_matches_full_render(self):
+        markdown = IncrementalMarkdown(min_interval=0)
+        for i in range(0, len(REPLY), 3):
+            markdown.feed(REPLY[i : i + 3])
+            render(markdown)
+        markdown.finish()
+        self.assertEqual(render(markdown), render(Markdown(REPLY)))
+
+    def test_lists_and_indented_code_span_blank_lines(self):
+        markdown = IncrementalMarkdown(INSTALL)
+        markdown.finish()
+        self.assertEqual(markdown.blocks, [INSTALL[:-7], "Done.\n"])
+        self.assertEqual(IncrementalMarkdown(LOOSE).blocks, [])
+        self.assertEqual(
+            IncrementalMarkdown(INDENTED).blocks,
+            ["Code:\n", "    a = 1\n\n    b = 2\n"],
+        )
+
+        for source in (INSTALL, LOOSE, INDENTED):
+            markdown = IncrementalMarkdown(min_interval=0)
+            for i in range(0, len(source), 2):
+                markdown.feed(source[i : i + 2])
+                render(markdown)
+            markdown.finish()
+            # Less the blank line rich puts before a list that opens the text
+            expected = render(Markdown(source)).lstrip("\n")
+            self.assertEqual(render(markdown), expected, source)
+
+    def test_finished_blocks_render_once(self):
+        markdown = IncrementalMarkdown("First paragraph.\n\nSecond", min_interval=0)
+        render(markdown)
+        markdown.feed(" paragraph grows")
+        render(markdown)
+        self.assertEqual(markdown.stats["block_renders"], 1)
+        self.assertEqual(markdown.stats["tail_renders"], 2)
+
+        # A new width invalidates the cached lines
+        Console(width=30, file=io.StringIO()).print(markdown)
+        self.assertEqual(markdown.stats["block_renders"], 2)
+
+    def test_rate_limit_shows_last_frame(self):
+        markdown = IncrementalMarkdown("Growing", min_interval=60)
+        first = render(markdown)
+        markdown.feed(" text")
+        self.assertEqual(render(markdown), first)
+        self.assertEqual(markdown.stats["stale"], 1)
+
+        # The closed reply always renders in full
+        markdown.finish()
+        self.assertIn("Growing text", render(markdown))
+
+
+if __name__ == "__main__":
+    unittest.main()
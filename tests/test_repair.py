@@ -0,0 +1,115 @@
+import asyncio
+import time
+import unittest
+from types import SimpleNamespace
+
+from hoshiri.repair import RepairEngine, extract_code
+
+
+class FakeEngine:
+    """Hands out scripted fixes; each reply takes `delay` seconds."""
+
+    def __init__(self, fixes, delays=None):
+        self.fixes = list(fixes)
+        self.delays = list(delays or [0] * len(fixes))
+        self.prompts = []
+
+    async def ask(self, messages, **kwargs):
+        self.prompts.append(messages[0]["content"])
+        fix, delay = self.fixes.pop(0), self.delays.pop(0)
+        await asyncio.sleep(delay)
+        if isinstance(fix, Exception):
+            raise fix
+        return SimpleNamespace(content=[SimpleNamespace(text=f"```python\n{fix}\n```")])
+
+
+class FakeExecutor:
+    """Scripts containing 'ok' pass; anything else fails with its own text."""
+
+    timeout = 30.0
+
+    def __init__(self):
+        self.ran = []
+        self.timeouts = []
+
+    def run(self, code, command="", timeout=None):
+        self.ran.append(code.strip())
+        self.timeouts.append(timeout)
+        if "ok" in code:
+            return {"ok": True, "result": code.strip(), "stdout": ""}
+        return {"ok": False, "error": f"failed: {code.strip()}", "stdout": ""}
+
+
+class TestRepairEngine(unittest.TestCase):
+    def test_first_passing_candidate_wins(self):
+        engine = FakeEngine(["bad", "ok fast", "ok slow"], delays=[0, 0.01, 0.5])
+        repair = RepairEngine(engine, FakeExecutor(), candidates=3)
+
+        started = time.monotonic()
+        outcome = asyncio.run(repair.repair("broken", "NameError"))
+
+        self.assertTrue(outcome["ok"])
+        self.assertEqual(outcome["result"], "ok fast")
+        self.assertEqual(outcome["attempts"], 3)
+        self.assertLess(time.monotonic() - started, 0.4)
+
+    def test_next_round_builds_on_last_failure(self):
+        engine = FakeEngine(["bad one", "bad two", "ok"])
+        repair = RepairEngine(engine, FakeExecutor(), candidates=2, max_attempts=4)
+
+        outcome = asyncio.run(repair.repair("broken", "NameError"))
+
+        self.assertTrue(outcome["ok"])
+        self.assertEqual(outcome["attempts"], 4)
+        self.assertIn("failed: bad two", engine.prompts[2])
+
+    def test_attempt_budget(self):
+        engine = FakeEngine(["bad"] * 5)
+        repair = RepairEngine(engine, FakeExecutor(), candidates=2, max_attempts=3)
+
+        outcome = asyncio.run(repair.repair("broken", "NameError"))
+
+        self.assertFalse(outcome["ok"])
+        self.assertEqual(outcome["attempts"], 3)
+        self.assertEqual(len(engine.prompts), 3)
+
+    def test_deadline(self):
+        engine = FakeEngine(["ok"], delays=[5])
+        repair = RepairEngine(engine, FakeExecutor(), candidates=1, deadline=0.1)
+
+        outcome = asyncio.run(repair.repair("broken", "NameError"))
+
+        self.assertFalse(outcome["ok"])
+        self.assertIn("Gave up", outcome["error"])
+        self.assertLess(outcome["seconds"], 1)
+
+    def test_api_errors(self):
+        engine = FakeEngine([ValueError("overloaded"), "ok"])
+        repair = RepairEngine(engine, FakeExecutor(), candidates=2)
+        outcome = asyncio.run(repair.repair("broken", "NameError"))
+        self.assertTrue(outcome["ok"])
+
+        engine = FakeEngine([ValueError("overloaded"), "bad", "ok"])
+        repair = RepairEngine(engine, FakeExecutor(), candidates=2, max_attempts=3)
+        outcome = asyncio.run(repair.repair("broken", "NameError"))
+        self.assertEqual(outcome["api_error"], "overloaded")
+
+        # When every call of a round fails, the error is raised
+        engine = FakeEngine([ValueError("bad key")] * 2)
+        repair = RepairEngine(engine, FakeExecutor(), candidates=2)
+        with self.assertRaisesRegex(ValueError, "bad key"):
+            asyncio.run(repair.repair("broken", "NameError"))
+
+    def test_runs_end_by_the_deadline(self):
+        executor = FakeExecutor()
+        repair = RepairEngine(FakeEngine(["ok"]), executor, candidates=1, deadline=5)
+        asyncio.run(repair.repair("broken", "NameError"))
+        self.assertLessEqual(executor.timeouts[0], 5)
+
+    def test_extract_code(self):
+        self.assertEqual(extract_code("Here:\n```python\nx = 1\n```\nDone"), "x = 1\n")
+        self.assertEqual(extract_code("x = 2"), "x = 2\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
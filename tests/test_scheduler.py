@@ -0,0 +1,174 @@
+import asyncio
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+from hoshiri.engine import AsyncEngine
+from hoshiri.scheduler import CronTrigger, Scheduler, parse_trigger
+
+
+def at(*args) -> float:
+    return datetime(*args).timestamp()
+
+
+class TestTriggers(unittest.TestCase):
+    def test_cron_next_after(self):
+        weekdays_at_nine = CronTrigger("0 9 * * 1-5")
+        # Friday 2024-03-01 10:00 -> Monday 09:00
+        self.assertEqual(
+            weekdays_at_nine.next_after(at(2024, 3, 1, 10, 0)), at(2024, 3, 4, 9, 0)
+        )
+        every_quarter = CronTrigger("*/15 * * * *")
+        self.assertEqual(
+            every_quarter.next_after(at(2024, 3, 1, 10, 14, 30)), at(2024, 3, 1, 10, 15)
+        )
+        self.assertEqual(
+            CronTrigger("30 0 29 2 *").next_after(at(2024, 3, 1)),
+            at(2028, 2, 29, 0, 30),
+        )
+
+    def test_cron_either_day_field(self):
+        # The 1st of the month or any Sunday
+        trigger = CronTrigger("0 0 1 * 0")
+        self.assertEqual(trigger.next_after(at(2024, 3, 1, 12)), at(2024, 3, 3))
+
+    def test_bad_specs(self):
+        for spec in ("cron:* * *", "cron:61 * * * *", "every:0", "every:5x", "daily"):
+            with self.assertRaises(ValueError):
+                parse_trigger(spec)
+        self.assertEqual(parse_trigger("every:2m").next_after(100), 220)
+
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "jobs.sqlite3"
+        self.ran = []
+        self.release = threading.Event()
+        self.release.set()
+        self.finished = threading.Semaphore(0)
+
+    def tearDown(self):
+        self.release.set()
+        self.tmp.cleanup()
+
+    def run_job(self, target):
+        self.ran.append(target["prompt"])
+        self.release.wait(5)
+        return target["prompt"].upper()
+
+    def scheduler(self) -> Scheduler:
+        scheduler = Scheduler(
+            self.run_job, self.path, on_finish=lambda run: self.finished.release()
+        )
+        self.addCleanup(scheduler.close)
+        return scheduler
+
+    def test_missed_runs_coalesce(self):
+        scheduler = self.scheduler()
+        job_id = scheduler.add("every:1m", {"prompt": "hello"})
+
+        # Ten intervals passed while nothing was running
+        later = time.time() + 600
+        self.assertEqual(scheduler.run_pending(later), [job_id])
+        self.assertEqual(scheduler.run_pending(later), [])
+        self.assertTrue(self.finished.acquire(timeout=5))
+
+        job = scheduler.jobs()[0]
+        self.assertEqual(self.ran, ["hello"])
+        self.assertEqual(job["runs"], 1)
+        self.assertEqual(job["last_result"], "HELLO")
+        self.assertAlmostEqual(job["next_run"], later + 60, delta=1)
+
+    def test_max_instances(self):
+        scheduler = self.scheduler()
+        scheduler.add("every:1s", {"prompt": "slow"}, max_instances=1)
+        self.release.clear()
+
+        now = time.time() + 1
+        self.assertEqual(len(scheduler.run_pending(now)), 1)
+        self.assertEqual(scheduler.run_pending(now + 1), [])
+        self.assertEqual(scheduler.jobs()[0]["missed"], 1)
+
+        self.release.set()
+        self.assertTrue(self.finished.acquire(timeout=5))
+        self.assertEqual(len(scheduler.run_pending(now + 2)), 1)
+
+    def test_jobs_persist(self):
+        scheduler = Scheduler(self.run_job, self.path)
+        job_id = scheduler.add("cron:0 9 * * *", {"prompt": "news"}, jitter=30)
+        scheduler.close()
+
+        scheduler = self.scheduler()
+        (job,) = scheduler.jobs()
+        self.assertEqual(job["id"], job_id)
+        self.assertEqual(job["target"], {"prompt": "news"})
+        self.assertTrue(scheduler.remove(job_id))
+        self.assertEqual(scheduler.jobs(), [])
+
+    def test_background_thread_runs_due_jobs(self):
+        scheduler = self.scheduler()
+        scheduler.start()
+        scheduler.add("every:0.2", {"prompt": "tick"})
+        self.assertTrue(self.finished.acquire(timeout=5))
+        self.assertEqual(self.ran[0], "tick")
+
+    def test_background_thread_survives_a_failed_pass(self):
+        scheduler = self.scheduler()
+        run_pending = scheduler.run_pending
+        failures = [sqlite3.OperationalError("database is locked")]
+
+        def flaky(now=None):
+            if failures:
+                raise failures.pop()
+            return run_pending(now)
+
+        scheduler.add("every:0.2", {"prompt": "tick"})
+        with (
+            mock.patch.object(scheduler, "run_pending", flaky),
+            mock.patch("hoshiri.scheduler.RETRY_SECONDS", 0.1),
+            self.assertLogs("hoshiri.scheduler", "ERROR"),
+        ):
+            scheduler.start()
+            self.assertTrue(self.finished.acquire(timeout=5))
+        self.assertEqual(self.ran[0], "tick")
+
+    def test_close_with_a_run_waiting_on_the_engine(self):
+        class Api:
+            async def aclose(self):
+                pass
+
+        engine = AsyncEngine(Api(), "model")
+        waiting = threading.Event()
+        failures = []
+
+        def run_job(target):
+            async def never_answers():
+                waiting.set()
+                await asyncio.sleep(3600)
+
+            return engine.submit(never_answers()).result()
+
+        scheduler = Scheduler(
+            run_job, self.path, on_finish=lambda run: failures.append(run)
+        )
+        scheduler.add("every:1m", {"prompt": "stuck"})
+        scheduler.run_pending(time.time() + 60)
+        self.assertTrue(waiting.wait(5))
+
+        # The order HoshiriChat.close uses; the run is cancelled, not awaited
+        started = time.monotonic()
+        scheduler.stop()
+        engine.close()
+        scheduler.close()
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(failures, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from hoshiri.scripts import ScriptCache, normalize
+
+CODE = "def run_command(command):\n    return 'ok'\n"
+
+
+class TestScriptCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ScriptCache(Path(self.tmp.name) / "scripts.sqlite3", max_entries=3)
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def test_normalize(self):
+        self.assertEqual(normalize("List my unread emails!"), "list unread email")
+        self.assertEqual(normalize("list the unread email"), "list unread email")
+        # Arguments and their order are part of the intent
+        self.assertNotEqual(
+            normalize("delete files older than 30 days"),
+            normalize("delete files older than 7 days"),
+        )
+        self.assertNotEqual(
+            normalize("move report.pdf to archive"),
+            normalize("move archive to report.pdf"),
+        )
+
+    def test_only_exact_intents_are_reused(self):
+        self.cache.store("list my unread emails", CODE)
+
+        entry = self.cache.lookup("List the unread emails")
+        self.assertEqual(entry["code"], CODE)
+        self.assertEqual(entry["hits"], 1)
+        self.assertIsNone(self.cache.lookup("list unread emails from alice"))
+
+        self.cache.store("email alice about the meeting tomorrow", CODE)
+        self.assertIsNone(self.cache.lookup("email bob about the meeting tomorrow"))
+
+    def test_similar_scripts_seed_generation(self):
+        self.cache.store("email alice about the meeting tomorrow", CODE)
+        entry = self.cache.similar("email bob about the meeting tomorrow")
+        self.assertEqual(entry["code"], CODE)
+        self.assertGreaterEqual(entry["similarity"], 0.8)
+        self.assertIsNone(self.cache.similar("resize images in downloads"))
+
+    def test_failing_entry_is_evicted(self):
+        script_id = self.cache.store("list my unread emails", CODE)
+        self.cache.record(script_id, ok=True)
+        self.cache.record(script_id, ok=False)
+        self.cache.record(script_id, ok=False)
+        self.assertIsNotNone(self.cache.lookup("list my unread emails"))
+
+        self.cache.record(script_id, ok=False)
+        self.assertIsNone(self.cache.lookup("list my unread emails"))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_least_recently_used_is_evicted(self):
+        for command in ("fetch weather", "count words", "resize images"):
+            self.cache.store(command, CODE)
+        self.cache.lookup("fetch weather")
+        self.cache.store("convert currency", CODE)
+
+        self.assertEqual(len(self.cache), 3)
+        self.assertIsNone(self.cache.lookup("count words"))
+        self.assertIsNotNone(self.cache.lookup("fetch weather"))
+
+
+if __name__ == "__main__":
+    unittest.main()
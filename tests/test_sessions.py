@@ -0,0 +1,73 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from hoshiri.sessions import SessionLog
+
+
+def turn(role, text, **extra):
+    return {"role": role, "content": [{"type": "text", "text": text}], **extra}
+
+
+class TestSessionLog(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name) / "sessions"
+        self.log = SessionLog(self.root, "test")
+
+    def tearDown(self):
+        self.log.close()
+        self.tmp.cleanup()
+
+    def test_attachments_are_stored_by_reference(self):
+        pdf = {
+            "type": "document",
+            "source": {
+                "type": "base64",
+                "media_type": "application/pdf",
+                "data": "QUJD" * 1000,
+            },
+        }
+        entry = {
+            "role": "user",
+            "content": [pdf, {"type": "text", "text": "summarize"}],
+            "files": [{"path": "uploads/abc/report.pdf", "digest": "abc"}],
+        }
+        self.log.append(entry)
+        self.log.append(turn("assistant", "done"))
+
+        self.assertNotIn("QUJD", self.log.path.read_text())
+        history = self.log.load()
+        self.assertEqual(
+            history[0]["content"][0],
+            {"type": "attachment", "digest": "abc", "path": "uploads/abc/report.pdf"},
+        )
+        self.assertEqual(history[0]["content"][1]["text"], "summarize")
+        # The live entry is left untouched
+        self.assertIs(entry["content"][0], pdf)
+
+    def test_compaction_is_replayed(self):
+        for i in range(3):
+            self.log.append(turn("user", f"q{i}"))
+            self.log.append(turn("assistant", f"a{i}"))
+        summary = [turn("user", "summary"), turn("assistant", "ok")]
+        self.log.compact(4, summary)
+        self.log.append(turn("user", "q3"))
+
+        texts = [entry["content"][0]["text"] for entry in self.log.load()]
+        self.assertEqual(texts, ["summary", "ok", "q2", "a2", "q3"])
+
+    def test_log_is_append_only_and_survives_a_torn_line(self):
+        self.log.append(turn("user", "hi"))
+        first = self.log.path.read_text()
+        self.log.append(turn("assistant", "hello"))
+        self.assertTrue(self.log.path.read_text().startswith(first))
+
+        with open(self.log.path, "a") as f:
+            f.write('{"op": "turn", "entry": {"ro')
+        self.assertEqual(len(self.log.load()), 2)
+        self.assertEqual(SessionLog.sessions(self.root), [self.log.path])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from hoshiri.startup import by_package, parse_importtime, profile_startup
+
+ROOT = Path(__file__).resolve().parent.parent
+
+SAMPLE = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |     _json
+import time:       300 |        420 |   json.decoder
+import time:       200 |        620 | json
+import time:      5000 |       5000 | rich.console
+"""
+
+
+class TestStartup(unittest.TestCase):
+    def test_parse_importtime(self):
+        imports = parse_importtime(SAMPLE)
+        self.assertEqual(
+            [r["module"] for r in imports][:3], ["_json", "json.decoder", "json"]
+        )
+        self.assertEqual(
+            imports[2], {"module": "json", "self": 200, "cumulative": 620, "depth": 0}
+        )
+        self.assertEqual(imports[0]["depth"], 2)
+        self.assertEqual(by_package(imports), {"rich": 5000, "json": 500, "_json": 120})
+
+    def test_main_defers_the_sdk(self):
+        probe = "import sys, main; print('anthropic' in sys.modules, 'rich.markdown' in sys.modules)"
+        proc = subprocess.run(
+            [sys.executable, "-c", probe],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        self.assertEqual(proc.stdout.split(), ["False", "False"])
+
+    def test_probe_runs_in_a_scratch_directory(self):
+        with tempfile.TemporaryDirectory() as cwd:
+            previous = os.getcwd()
+            os.chdir(cwd)
+            try:
+                profile = profile_startup(str(ROOT))
+            finally:
+                os.chdir(previous)
+            self.assertEqual(os.listdir(cwd), [])
+        self.assertIsNone(profile["error"])
+        self.assertIn("main", profile["packages"])
+
+
+if __name__ == "__main__":
+    unittest.main()
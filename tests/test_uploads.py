@@ -0,0 +1,42 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from hoshiri.uploads import UploadStore
+
+
+class TestUploadStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.store = UploadStore(self.dir / "uploads", max_bytes=1024)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_duplicate_uploads_share_one_copy(self):
+        first = self.dir / "report.log"
+        first.write_text("same content")
+        second = self.dir / "copy.log"
+        second.write_text("same content")
+
+        path, digest = self.store.add(first)
+        again, again_digest = self.store.add(second)
+
+        self.assertEqual(path, again)
+        self.assertEqual(digest, again_digest)
+        self.assertEqual(path.name, "report.log")
+        self.assertEqual(path.read_text(), "same content")
+        self.assertEqual(len(list((self.dir / "uploads").iterdir())), 1)
+
+    def test_size_limit_is_checked_before_copying(self):
+        big = self.dir / "big.csv"
+        big.write_bytes(b"x" * 2048)
+
+        with self.assertRaises(ValueError):
+            self.store.add(big)
+        self.assertEqual(list((self.dir / "uploads").iterdir()), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
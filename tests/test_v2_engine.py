@@ -0,0 +1,44 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+V2 = Path(__file__).resolve().parent.parent / "old" / "hoshiri_v2"
+
+
+class TestV2Engine(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # The v2 folder is run as a flat script directory
+        sys.path.insert(0, str(V2))
+        cls.addClassCleanup(sys.path.remove, str(V2))
+        from engine import HoshiriEngine
+
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(cls.tmp.cleanup)
+        cwd = os.getcwd()
+        os.chdir(cls.tmp.name)
+        cls.addClassCleanup(os.chdir, cwd)
+        Path("hoshiri/modules").mkdir(parents=True)
+        cls.engine = HoshiriEngine()
+        cls.addClassCleanup(cls.engine.close)
+        cls.addClassCleanup(cls.engine.registry.close)
+
+    def test_generated_module_runs(self):
+        module_info = self.engine.generate_script({"module_name": "echo"})
+        self.assertEqual(
+            self.engine.registry.get("echo")["file_path"], module_info["file_path"]
+        )
+        self.assertEqual(self.engine.execute_module(module_info, "hi"), "Executing: hi")
+
+    def test_chat_reply(self):
+        reply = SimpleNamespace(content=[SimpleNamespace(text=" Hello! ")])
+        messages = SimpleNamespace(create=lambda **kwargs: reply)
+        self.engine.ai_client.client = SimpleNamespace(messages=messages)
+        self.assertEqual(self.engine.handle_command("hello"), "Hello!")
+
+
+if __name__ == "__main__":
+    unittest.main()